@@ -1,35 +1,130 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import cv2
-import numpy as np
-from PIL import Image, ImageTk
+import importlib
+import json
+import multiprocessing
 import os
 from pathlib import Path
 import threading
 import time
 
+# How often the UI refreshes the job list from the jobs' progress snapshots
+PROGRESS_POLL_MS = 100
+
+# How often the area selection window checks for a preview frame still being decoded
+PREVIEW_POLL_MS = 50
+
+# The processing engine (OpenCV, NumPy, PyAV) and Pillow are most of the startup time. They are
+# imported where they are used, and these are preloaded on a background thread once the window is up
+ENGINE_MODULES = ("dedupe_core.pipeline", "dedupe_core.jobs", "dedupe_core.preview", "PIL.ImageTk")
+
+# How often the main window checks whether the engine has finished loading
+ENGINE_POLL_MS = 50
+
+# If set, startup times are written to this JSON file and the app quits (see benchmarks/bench_startup.py)
+STARTUP_REPORT_ENV = "DEDUPE_STARTUP_REPORT"
+
 class DeDupeApp:
     def __init__(self, root):
         self.root = root
         self.root.title("DeDupe - Video Frame Deduplication Tool")
-        self.root.geometry("800x600")
+        self.root.geometry("800x760")
         
         # Video properties
         self.video_path = None
-        self.video_cap = None
+        self.video_source = None  # FrameSource shared by the info panel and the area preview
+        self.preview_index = None  # Preview frames for the area selection window, built in the background
         self.total_frames = 0
         self.fps = 30
         self.similarity_threshold = 95.0
+        self.sampling_strategy = None  # Set, with the other engine defaults, once the engine has loaded
+        self.hash_cache = None
         
         # Selective Area properties
         self.selective_area_enabled = False
         self.selected_region = None  # (x, y, width, height)
         
-        # Processing state
-        self.is_processing = False
-        self.processed_frames = 0
+        # Processing state: queued and running jobs, each with its own settings and cancel flag
+        self.scheduler = None  # Created once the engine has loaded
+        self.polling = False
+        self.default_output = None  # Output directory filled in for the loaded video, until the user picks one
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Draw the window now; it is usable while the engine loads, only processing waits for it
+        self.root.update()
+        self.window_shown = time.time()
+        self.engine_error = None
+        self.engine_thread = threading.Thread(target=self.load_engine, name="engine-loader", daemon=True)
+        self.engine_thread.start()
+        self.root.after(ENGINE_POLL_MS, self.poll_engine)
+        
+    def load_engine(self):
+        """Import the engine modules off the UI thread, so later imports of them are instant"""
+        try:
+            for module in ENGINE_MODULES:
+                importlib.import_module(module)
+        except Exception as e:
+            self.engine_error = e
+        
+    def poll_engine(self):
+        """Finish setting up once load_engine() is done; re-arms itself until then"""
+        if self.engine_thread.is_alive():
+            self.root.after(ENGINE_POLL_MS, self.poll_engine)
+            return
+        if self.engine_error is not None:
+            self.progress_label.config(text="Failed to load the processing engine")
+            messagebox.showerror("Error", f"Failed to load the processing engine: {self.engine_error}")
+            return
+        
+        from dedupe_core.frame_hash import DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS
+        from dedupe_core.hash_cache import HashCache
+        from dedupe_core.jobs import JobScheduler, default_concurrency
+        from dedupe_core.parallel import default_workers
+        from dedupe_core.sampling import STRATEGY_AUTO
+        from dedupe_core.writer import DEFAULT_OUTPUT_FORMAT, DEFAULT_QUALITY, OUTPUT_FORMATS
+        
+        self.sampling_strategy = STRATEGY_AUTO
+        self.hash_cache = HashCache()
+        self.workers_spinbox.config(to=default_workers())
+        self.scheduler = JobScheduler(default_concurrency())
+        self.concurrency_var.set(self.scheduler.concurrency)
+        self.concurrency_spinbox.config(to=default_workers())
+        self.format_var.set(DEFAULT_OUTPUT_FORMAT)
+        self.format_combo.config(values=OUTPUT_FORMATS)
+        self.quality_var.set(DEFAULT_QUALITY)
+        self.hash_algorithm_var.set(DEFAULT_HASH_ALGORITHM)
+        self.hash_combo.config(values=HASH_ALGORITHMS)
+        self.start_btn.config(state=tk.NORMAL)
+        self.progress_label.config(text="Ready")
+        
+        report = os.environ.get(STARTUP_REPORT_ENV)
+        if report:
+            self.report_startup(report)
+        
+    def report_startup(self, path):
+        """Write when the window was first drawn and when the engine was ready, then quit"""
+        self.root.update()
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"window_shown": self.window_shown, "engine_ready": time.time()}, handle)
+        self.on_close()
+        
+    def on_close(self):
+        if self.scheduler is not None:
+            # Running jobs stop at their next frame and checkpoint, so they resume when queued again
+            self.scheduler.cancel_all()
+        self.close_video_source()
+        self.root.destroy()
+        
+    def close_video_source(self):
+        if self.preview_index is not None:
+            # Stops the background decoding before its handle goes away
+            self.preview_index.close()
+            self.preview_index = None
+        if self.video_source is not None:
+            self.video_source.close()
+            self.video_source = None
         
     def setup_ui(self):
         # Main frame
@@ -65,6 +160,44 @@ class DeDupeApp:
         fps_spinbox = ttk.Spinbox(settings_frame, from_=1, to=60, textvariable=self.fps_var, width=10)
         fps_spinbox.grid(row=0, column=1, sticky=tk.W, padx=(10, 0), pady=5)
         
+        # Worker processes (1 = decode on the processing thread)
+        ttk.Label(settings_frame, text="Worker processes:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.workers_var = tk.IntVar(value=1)
+        self.workers_spinbox = ttk.Spinbox(settings_frame, from_=1, to=1, textvariable=self.workers_var, width=10)
+        self.workers_spinbox.grid(row=5, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        
+        # Output image format and quality
+        ttk.Label(settings_frame, text="Output format:").grid(row=6, column=0, sticky=tk.W, pady=5)
+        format_frame = ttk.Frame(settings_frame)
+        format_frame.grid(row=6, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        self.format_var = tk.StringVar()
+        self.format_combo = ttk.Combobox(format_frame, textvariable=self.format_var, state="readonly", width=8)
+        self.format_combo.grid(row=0, column=0)
+        ttk.Label(format_frame, text="Quality:").grid(row=0, column=1, padx=(10, 0))
+        self.quality_var = tk.IntVar()
+        ttk.Spinbox(format_frame, from_=1, to=100, textvariable=self.quality_var,
+                    width=5).grid(row=0, column=2, padx=(5, 0))
+        
+        # Dry run: hash and dedup without writing frames
+        self.dry_run_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Dry run (count unique frames, don't save them)",
+                        variable=self.dry_run_var).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Hash cache: re-runs with only a different threshold or output skip decoding
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Cache frame hashes for faster re-runs",
+                        variable=self.use_cache_var).grid(row=8, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Scene pre-filter: frames that barely changed are skipped before hashing
+        self.prefilter_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Skip unchanged frames before hashing (faster on static footage)",
+                        variable=self.prefilter_var).grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        # Best-frame selection: each group of duplicates is saved as its sharpest frame, not its first
+        self.best_frame_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="Keep the sharpest frame of each duplicate group",
+                        variable=self.best_frame_var).grid(row=10, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
         # Similarity threshold
         ttk.Label(settings_frame, text="Similarity threshold (%):").grid(row=1, column=0, sticky=tk.W, pady=5)
         self.similarity_var = tk.DoubleVar(value=95.0)
@@ -101,6 +234,45 @@ class DeDupeApp:
         output_btn = ttk.Button(settings_frame, text="Browse", command=self.browse_output)
         output_btn.grid(row=3, column=2, padx=(5, 0), pady=5)
         
+        # Hash algorithm
+        ttk.Label(settings_frame, text="Hash algorithm:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.hash_algorithm_var = tk.StringVar()
+        self.hash_combo = ttk.Combobox(settings_frame, textvariable=self.hash_algorithm_var,
+                                       state="readonly", width=10)
+        self.hash_combo.grid(row=4, column=1, sticky=tk.W, padx=(10, 0), pady=5)
+        
+        # Job queue: every video added keeps the settings it was added with
+        jobs_frame = ttk.LabelFrame(main_frame, text="Jobs", padding="10")
+        jobs_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("status", "progress", "speed"), height=5)
+        self.jobs_tree.heading("#0", text="Video")
+        self.jobs_tree.heading("status", text="Status")
+        self.jobs_tree.heading("progress", text="Progress")
+        self.jobs_tree.heading("speed", text="Frames/s")
+        self.jobs_tree.column("#0", width=220)
+        self.jobs_tree.column("status", width=300)
+        self.jobs_tree.column("progress", width=70, anchor=tk.E)
+        self.jobs_tree.column("speed", width=70, anchor=tk.E)
+        self.jobs_tree.grid(row=0, column=0, columnspan=4, sticky=(tk.W, tk.E))
+        jobs_scrollbar = ttk.Scrollbar(jobs_frame, orient=tk.VERTICAL, command=self.jobs_tree.yview)
+        jobs_scrollbar.grid(row=0, column=4, sticky=(tk.N, tk.S))
+        self.jobs_tree.configure(yscrollcommand=jobs_scrollbar.set)
+        self.jobs = {}  # Tree item -> Job
+        self.reported_errors = set()  # Tree items of failed jobs whose error has been shown
+        
+        ttk.Button(jobs_frame, text="Cancel Selected",
+                   command=self.cancel_selected).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Button(jobs_frame, text="Clear Finished",
+                   command=self.clear_finished).grid(row=1, column=1, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        ttk.Label(jobs_frame, text="Concurrent jobs:").grid(row=1, column=2, sticky=tk.E, pady=(5, 0))
+        self.concurrency_var = tk.IntVar(value=1)
+        self.concurrency_spinbox = ttk.Spinbox(jobs_frame, from_=1, to=1, textvariable=self.concurrency_var, width=5,
+                                               command=self.update_concurrency)
+        self.concurrency_spinbox.grid(row=1, column=3, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        self.concurrency_spinbox.bind("<FocusOut>", lambda event: self.update_concurrency())
+        jobs_frame.columnconfigure(2, weight=1)
+        
         # Progress frame
         progress_frame = ttk.LabelFrame(main_frame, text="Progress", padding="10")
         progress_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
@@ -109,17 +281,18 @@ class DeDupeApp:
         self.progress_bar = ttk.Progressbar(progress_frame, variable=self.progress_var, maximum=100)
         self.progress_bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         
-        self.progress_label = ttk.Label(progress_frame, text="Ready")
+        self.progress_label = ttk.Label(progress_frame, text="Loading the processing engine...")
         self.progress_label.grid(row=1, column=0, columnspan=2, pady=5)
         
         # Control buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=6, column=0, columnspan=3, pady=20)
         
-        self.start_btn = ttk.Button(button_frame, text="Start Processing", command=self.start_processing)
+        self.start_btn = ttk.Button(button_frame, text="Add to Queue", command=self.start_processing,
+                                    state=tk.DISABLED)
         self.start_btn.grid(row=0, column=0, padx=(0, 10))
         
-        self.stop_btn = ttk.Button(button_frame, text="Stop", command=self.stop_processing, state=tk.DISABLED)
+        self.stop_btn = ttk.Button(button_frame, text="Stop All", command=self.stop_processing, state=tk.DISABLED)
         self.stop_btn.grid(row=0, column=1)
         
         # Configure grid weights
@@ -144,12 +317,22 @@ class DeDupeApp:
             self.output_var.set(output_path)
             
     def load_video_info(self):
+        from dedupe_core.frame_source import FrameSource
+        from dedupe_core.preview import PreviewIndex
+        
         if self.video_path and os.path.exists(self.video_path):
-            self.video_cap = cv2.VideoCapture(self.video_path)
-            if self.video_cap.isOpened():
-                self.total_frames = int(self.video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                video_fps = self.video_cap.get(cv2.CAP_PROP_FPS)
-                duration = self.total_frames / video_fps if video_fps > 0 else 0
+            # One handle per loaded video, released when the next one is loaded or the app closes
+            self.close_video_source()
+            try:
+                self.video_source = FrameSource(self.video_path)
+            except IOError:
+                self.video_source = None
+            if self.video_source is not None:
+                # Preview frames are decoded now, so the area selection window opens instantly
+                self.preview_index = PreviewIndex(self.video_source)
+                self.total_frames = self.video_source.frame_count
+                video_fps = self.video_source.fps
+                duration = self.video_source.duration
                 
                 info_text = f"Total frames: {self.total_frames:,}\n"
                 info_text += f"Video FPS: {video_fps:.2f}\n"
@@ -158,11 +341,11 @@ class DeDupeApp:
                 
                 self.video_info_label.config(text=info_text)
                 
-                # Set default output directory
-                if not self.output_var.get():
-                    video_dir = Path(self.video_path).parent
-                    output_dir = video_dir / "DeDupe_Output"
-                    self.output_var.set(str(output_dir))
+                # Default output directory, one per video so queued videos never share one
+                if not self.output_var.get() or self.output_var.get() == self.default_output:
+                    video_path = Path(self.video_path)
+                    self.default_output = str(video_path.parent / "DeDupe_Output" / video_path.stem)
+                    self.output_var.set(self.default_output)
                 
                 # Reset selective area when new video is loaded
                 if self.selective_area_enabled:
@@ -198,7 +381,7 @@ class DeDupeApp:
                 )
             else:
                 self.selective_area_status.config(
-                    text="Click 'Start Processing' to select area", 
+                    text="Click 'Add to Queue' to select area", 
                     foreground="blue"
                 )
         else:
@@ -217,7 +400,7 @@ class DeDupeApp:
     
     def show_area_selection_window(self):
         """Show the area selection window"""
-        AreaSelectionWindow(self.root, self.video_path, self.on_area_selected)
+        AreaSelectionWindow(self.root, self.preview_index, self.on_area_selected)
     
     def on_area_selected(self, selected_region):
         """Callback when area is selected"""
@@ -249,122 +432,133 @@ class DeDupeApp:
                 if not result:
                     return
         
-        self.is_processing = True
-        self.start_btn.config(state=tk.DISABLED)
-        self.stop_btn.config(state=tk.NORMAL)
+        from dedupe_core.jobs import Job
         
-        # Start processing in separate thread
-        self.processing_thread = threading.Thread(target=self.process_video)
-        self.processing_thread.start()
+        job = Job(self.video_path, Path(self.output_var.get()), self.build_options())
+        try:
+            self.scheduler.submit(job)
+        except ValueError as e:
+            messagebox.showerror("Error", f"{e}; choose another output directory for this video.")
+            return
+        item = self.jobs_tree.insert("", tk.END, text=job.label, values=("Queued", "0%", ""))
+        self.jobs[item] = job
+        self.stop_btn.config(state=tk.NORMAL)
+        if not self.polling:
+            self.polling = True
+            self.poll_jobs()
+        
+    def build_options(self):
+        """Options for a new job, from the settings as they are now"""
+        from dedupe_core.pipeline import ProcessingOptions
+        from dedupe_core.prefilter import PrefilterOptions
+        
+        return ProcessingOptions(
+            fps=self.fps_var.get(),
+            similarity=self.similarity_threshold,
+            region=self.selected_region if self.selective_area_enabled else None,
+            hash_algorithm=self.hash_algorithm_var.get(),
+            workers=self.workers_var.get(),
+            sampling_strategy=self.sampling_strategy,
+            image_format=self.format_var.get(),
+            quality=self.quality_var.get(),
+            dry_run=self.dry_run_var.get(),
+            hash_cache=self.hash_cache if self.use_cache_var.get() else None,
+            prefilter=PrefilterOptions() if self.prefilter_var.get() else None,
+            best_frame=self.best_frame_var.get(),
+        )
         
     def stop_processing(self):
-        self.is_processing = False
-        self.start_btn.config(state=tk.NORMAL)
-        self.stop_btn.config(state=tk.DISABLED)
-        
-    def process_video(self):
+        self.scheduler.cancel_all()
+        
+    def cancel_selected(self):
+        for item in self.jobs_tree.selection():
+            self.scheduler.cancel(self.jobs[item])
+        
+    def clear_finished(self):
+        for item, job in list(self.jobs.items()):
+            if job.done:
+                self.jobs_tree.delete(item)
+                del self.jobs[item]
+                self.reported_errors.discard(item)
+        self.scheduler.clear_finished()
+        
+    def update_concurrency(self):
+        if self.scheduler is None:
+            return
         try:
-            output_dir = Path(self.output_var.get())
-            output_dir.mkdir(exist_ok=True)
-            
-            # Calculate frame interval
-            video_fps = self.video_cap.get(cv2.CAP_PROP_FPS)
-            frame_interval = int(video_fps / self.fps_var.get())
-            
-            frames_to_process = self.total_frames // frame_interval
-            processed_frames = 0
-            saved_frames = 0
-            
-            # Store frame hashes for duplicate detection
-            frame_hashes = set()
-            
-            self.root.after(0, lambda: self.progress_label.config(text="Starting frame extraction..."))
-            
-            for frame_idx in range(0, self.total_frames, frame_interval):
-                if not self.is_processing:
-                    break
-                    
-                self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = self.video_cap.read()
-                
-                if ret:
-                    # Apply selective area if enabled
-                    if self.selective_area_enabled and self.selected_region:
-                        x, y, w, h = self.selected_region
-                        # Ensure coordinates are within frame bounds
-                        x = max(0, min(x, frame.shape[1] - 1))
-                        y = max(0, min(y, frame.shape[0] - 1))
-                        w = min(w, frame.shape[1] - x)
-                        h = min(h, frame.shape[0] - y)
-                        
-                        if w > 0 and h > 0:
-                            frame = frame[y:y+h, x:x+w]
-                        else:
-                            continue  # Skip invalid region
-                    
-                    # Calculate frame hash for duplicate detection
-                    frame_hash = self.calculate_frame_hash(frame)
-                    
-                    if frame_hash not in frame_hashes:
-                        frame_hashes.add(frame_hash)
-                        
-                        # Save frame
-                        frame_filename = output_dir / f"frame_{saved_frames:06d}.jpg"
-                        cv2.imwrite(str(frame_filename), frame)
-                        saved_frames += 1
-                    
-                    processed_frames += 1
-                    
-                    # Update progress
-                    progress = (processed_frames / frames_to_process) * 100
-                    self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                    
-                    status_text = f"Processed: {processed_frames}/{frames_to_process} | Saved: {saved_frames} | Duplicates removed: {processed_frames - saved_frames}"
-                    self.root.after(0, lambda t=status_text: self.progress_label.config(text=t))
-                    
-                    # Small delay to prevent UI freezing
-                    time.sleep(0.01)
-            
-            if self.is_processing:
-                self.root.after(0, lambda: self.progress_label.config(text=f"Completed! Saved {saved_frames} frames, removed {processed_frames - saved_frames} duplicates"))
-                messagebox.showinfo("Success", f"Processing completed!\n\nSaved frames: {saved_frames}\nDuplicates removed: {processed_frames - saved_frames}\nOutput directory: {output_dir}")
+            self.scheduler.set_concurrency(self.concurrency_var.get())
+        except (tk.TclError, ValueError):
+            self.concurrency_var.set(self.scheduler.concurrency)
+        
+    def poll_jobs(self):
+        """Refresh the job list and the aggregate progress; re-arms itself while any job is unfinished"""
+        from dedupe_core.jobs import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_STOPPED
+        from dedupe_core.pipeline import PHASE_SAVING
+        from dedupe_core.progress import format_stages
+        
+        for item, job in self.jobs.items():
+            event = job.last_event
+            if job.status == JOB_RUNNING and event is not None:
+                if event["phase"] == PHASE_SAVING:
+                    status = f"Saving {event['saved_frames']} unique frames..."
+                else:
+                    status = (f"Processed: {event['processed_frames']}/{event['frames_to_process']} | "
+                              f"Saved: {event['saved_frames']} | Duplicates: {event['duplicates_removed']}")
+                    if event["busiest_stages"]:
+                        status += f" | Time in {format_stages(event['busiest_stages'])}"
+            elif job.status == JOB_DONE and job.options.dry_run:
+                status = (f"Dry run: {job.stats.saved_frames} unique frames, "
+                          f"{job.stats.duplicates_removed} duplicates (nothing saved)")
+            elif job.status == JOB_DONE:
+                status = (f"Completed: saved {job.stats.saved_frames} frames, "
+                          f"removed {job.stats.duplicates_removed} duplicates")
+            elif job.status == JOB_STOPPED:
+                status = "Stopped; add it again with the same settings to resume"
+            elif job.status == JOB_FAILED:
+                status = f"Error: {job.error}"
             else:
-                self.root.after(0, lambda: self.progress_label.config(text="Processing stopped by user"))
-                
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"An error occurred: {str(e)}"))
-            self.root.after(0, lambda: self.progress_label.config(text="Error occurred"))
-        finally:
-            self.is_processing = False
-            self.root.after(0, lambda: self.start_btn.config(state=tk.NORMAL))
-            self.root.after(0, lambda: self.stop_btn.config(state=tk.DISABLED))
-            
-    def calculate_frame_hash(self, frame):
-        # Convert to grayscale and resize for faster hashing
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        resized = cv2.resize(gray, (8, 8))
-        
-        # Calculate average pixel value
-        avg = resized.mean()
-        
-        # Create binary hash based on threshold
-        hash_value = 0
-        for i in range(8):
-            for j in range(8):
-                if resized[i, j] > avg:
-                    hash_value |= 1 << (i * 8 + j)
-                    
-        return hash_value
+                status = job.status.capitalize()
+            speed = f"{job.frames_per_second:.0f}" if job.status == JOB_RUNNING else ""
+            self.jobs_tree.item(item, values=(status, f"{job.progress:.0f}%", speed))
+            if job.status == JOB_FAILED and item not in self.reported_errors:
+                self.reported_errors.add(item)
+                messagebox.showerror("Error", f"An error occurred processing {job.label}: {job.error}")
+        
+        counts = self.scheduler.counts()
+        jobs = list(self.jobs.values())
+        self.progress_var.set(sum(job.progress for job in jobs) / len(jobs) if jobs else 0.0)
+        if self.scheduler.busy():
+            self.progress_label.config(text=f"Running: {counts[JOB_RUNNING]} | Queued: {counts[JOB_QUEUED]} | "
+                                            f"Finished: {len(jobs) - counts[JOB_RUNNING] - counts[JOB_QUEUED]} | "
+                                            f"{self.scheduler.frames_per_second():.0f} frames/s in total")
+            self.root.after(PROGRESS_POLL_MS, self.poll_jobs)
+            return
+        
+        self.polling = False
+        self.stop_btn.config(state=tk.DISABLED)
+        completed = [job for job in jobs if job.status == JOB_DONE]
+        saved_frames = sum(job.stats.saved_frames for job in completed)
+        duplicates = sum(job.stats.duplicates_removed for job in completed)
+        self.progress_label.config(text=f"Queue finished: {len(completed)} of {len(jobs)} videos completed, "
+                                        f"{saved_frames} frames saved, {duplicates} duplicates removed")
+        if any(not job.options.dry_run for job in completed):
+            messagebox.showinfo("Success", f"Processing completed!\n\nVideos completed: {len(completed)}\n"
+                                           f"Saved frames: {saved_frames}\nDuplicates removed: {duplicates}")
 
 class AreaSelectionWindow:
     """Window for selecting a region of interest in the video frame"""
     
-    def __init__(self, parent, video_path, callback):
+    def __init__(self, parent, preview_index, callback):
         self.parent = parent
-        self.video_path = video_path
+        self.preview_index = preview_index
         self.callback = callback
         self.selected_region = None
         
+        # Displayed preview
+        self.current_preview = None
+        self.frame_item = None
+        self.sized = False
+        
         # Create window
         self.window = tk.Toplevel(parent)
         self.window.title("Select Area of Interest")
@@ -377,8 +571,9 @@ class AreaSelectionWindow:
         self.window.grab_set()
         
         self.setup_ui()
-        self.load_frame()
         self.center_window()
+        # Start on the middle of the video, as before
+        self.show_preview(self.preview_index.middle if self.preview_index is not None else 0)
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -419,6 +614,17 @@ class AreaSelectionWindow:
         self.selection_info = ttk.Label(info_frame, text="No area selected")
         self.selection_info.grid(row=0, column=0, sticky=tk.W)
         
+        # Scrub between the preview frames; the selection stays in place
+        preview_count = len(self.preview_index) if self.preview_index is not None else 1
+        self.frame_info = ttk.Label(info_frame, text="")
+        self.frame_info.grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        if preview_count > 1:
+            self.preview_scale = ttk.Scale(info_frame, from_=0, to=preview_count - 1, orient=tk.HORIZONTAL,
+                                           length=300, command=self.on_scrub)
+            self.preview_scale.set(preview_count // 2)
+            self.preview_scale.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(10, 0), pady=(5, 0))
+            info_frame.columnconfigure(1, weight=1)
+        
         # Buttons
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, columnspan=2, pady=20)
@@ -443,73 +649,79 @@ class AreaSelectionWindow:
         self.start_y = None
         self.selection_rect = None
         
-    def load_frame(self):
-        """Load and display a frame from the video"""
+    def show_preview(self, index):
+        """Display one of the cached preview frames, waiting for it if it's still being decoded"""
+        self.current_preview = index
+        if self.preview_index is None:
+            messagebox.showerror("Error", "Failed to load video frame: the video could not be opened")
+            self.window.destroy()
+            return
+        
+        preview = self.preview_index.get(index)
+        if preview is None:
+            if self.preview_index.failed(index):
+                self.frame_info.config(text="This frame could not be decoded")
+            else:
+                self.frame_info.config(text="Loading preview...")
+                self.window.after(PREVIEW_POLL_MS, lambda: self.poll_preview(index))
+            return
+        
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            if cap.isOpened():
-                # Get a frame from the middle of the video
-                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                middle_frame = total_frames // 2
-                cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
-                ret, frame = cap.read()
-                cap.release()
+            # Already scaled to display size and converted to RGB in the background
+            from PIL import Image, ImageTk
+            self.photo_image = ImageTk.PhotoImage(Image.fromarray(preview.rgb))
+            if self.frame_item is None:
+                self.frame_item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_image, tags="frame")
+            else:
+                self.canvas.itemconfig(self.frame_item, image=self.photo_image)
+            if self.selection_rect:
+                self.canvas.tag_raise(self.selection_rect)
+            
+            # Store original frame dimensions for coordinate conversion
+            self.original_size = preview.original_size
+            self.display_size = preview.display_size
+            orig_width, orig_height = self.original_size
+            display_width, display_height = self.display_size
+            
+            minutes, seconds = divmod(int(preview.timestamp), 60)
+            self.frame_info.config(text=f"Frame {preview.frame_idx:,} ({minutes}:{seconds:02d}) | "
+                                        f"preview {index + 1} of {len(self.preview_index)}")
+            
+            if not self.sized:
+                self.sized = True
+                # Update canvas size and scroll region
+                self.canvas.config(scrollregion=(0, 0, display_width, display_height))
+                
+                # Update window size to accommodate the frame
+                # Add some padding for UI elements
+                window_width = min(display_width + 50, 1400)  # Max window width
+                window_height = min(display_height + 250, 1000)  # Max window height
+                self.window.geometry(f"{window_width}x{window_height}")
+                self.center_window()
+                
+                # Update instructions with video dimensions
+                scale = preview.scale
+                scale_text = f" (scale: {scale:.2f}x)" if scale < 1.0 else " (full size)"
+                self.instructions.config(
+                    text=f"Click and drag to select an area of interest. Only this area will be processed.\n"
+                         f"Video dimensions: {orig_width}×{orig_height} pixels | Display: {display_width}×{display_height} pixels{scale_text}"
+                )
                 
-                if ret:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Convert to PIL Image
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    # Store original frame dimensions for coordinate conversion
-                    self.original_frame = frame
-                    self.display_frame = pil_image
-                    
-                    # Get original dimensions
-                    orig_width, orig_height = pil_image.size
-                    
-                    # Calculate optimal display size while maintaining aspect ratio
-                    # Target maximum dimensions for good usability
-                    max_width, max_height = 1200, 800
-                    
-                    # Calculate scale factor to fit within max dimensions
-                    scale_x = max_width / orig_width
-                    scale_y = max_height / orig_height
-                    scale = min(scale_x, scale_y, 1.0)  # Don't scale up, only down
-                    
-                    # Calculate display dimensions
-                    display_width = int(orig_width * scale)
-                    display_height = int(orig_height * scale)
-                    
-                    # Resize for display if needed
-                    if scale < 1.0:
-                        pil_image = pil_image.resize((display_width, display_height), Image.Resampling.LANCZOS)
-                    
-                    # Convert to PhotoImage
-                    self.photo_image = ImageTk.PhotoImage(pil_image)
-                    
-                    # Update canvas size and scroll region
-                    self.canvas.config(scrollregion=(0, 0, self.photo_image.width(), self.photo_image.height()))
-                    self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo_image, tags="frame")
-                    
-                    # Update window size to accommodate the frame
-                    # Add some padding for UI elements
-                    window_width = min(display_width + 50, 1400)  # Max window width
-                    window_height = min(display_height + 200, 1000)  # Max window height
-                    self.window.geometry(f"{window_width}x{window_height}")
-                    
-                    # Update instructions with video dimensions
-                    scale_text = f" (scale: {scale:.2f}x)" if scale < 1.0 else " (full size)"
-                    self.instructions.config(
-                        text=f"Click and drag to select an area of interest. Only this area will be processed.\n"
-                             f"Video dimensions: {orig_width}×{orig_height} pixels | Display: {display_width}×{display_height} pixels{scale_text}"
-                    )
-                    
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load video frame: {str(e)}")
             self.window.destroy()
     
+    def poll_preview(self, index):
+        """Show a preview once it's decoded, unless the user has moved on or closed the window"""
+        if self.window.winfo_exists() and self.current_preview == index:
+            self.show_preview(index)
+    
+    def on_scrub(self, value):
+        """Handle the preview slider"""
+        index = int(round(float(value)))
+        if index != self.current_preview:
+            self.show_preview(index)
+    
     def on_mouse_down(self, event):
         """Handle mouse button press"""
         self.start_x = self.canvas.canvasx(event.x)
@@ -549,12 +761,10 @@ class AreaSelectionWindow:
             x2, y2 = max(self.start_x, end_x), max(self.start_y, end_y)
             
             # Convert display coordinates to original frame coordinates
-            if hasattr(self, 'original_frame') and hasattr(self, 'display_frame'):
+            if hasattr(self, 'original_size') and hasattr(self, 'display_size'):
                 # Calculate scale factors (handle case where display = original size)
-                orig_width = self.original_frame.shape[1]
-                orig_height = self.original_frame.shape[0]
-                display_width = self.display_frame.width
-                display_height = self.display_frame.height
+                orig_width, orig_height = self.original_size
+                display_width, display_height = self.display_size
                 
                 # Calculate scale factors
                 scale_x = orig_width / display_width
@@ -612,4 +822,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Worker processes re-import this module when frozen by PyInstaller
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,7 +1,13 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
 block_cipher = None
 
+# DEDUPE_ONEDIR=1 builds dist/DeDupe/ (an exe next to its libraries) instead of a single exe.
+# A one-file exe unpacks everything to a temporary folder on every launch; a one-dir build starts
+# straight away. Its libraries are not UPX-compressed either, so they needn't be decompressed on load.
+onedir = os.environ.get('DEDUPE_ONEDIR') == '1'
+
 a = Analysis(
     ['DeDupe.py'],
     pathex=[],
@@ -40,18 +46,19 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+if onedir:
+    exe_contents = (pyz, a.scripts, [])
+else:
+    exe_contents = (pyz, a.scripts, a.binaries, a.zipfiles, a.datas, [])
+
 exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
+    *exe_contents,
+    exclude_binaries=onedir,
     name='DeDupe',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=not onedir,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
@@ -63,3 +70,15 @@ exe = EXE(
     icon='icon.ico',
     version_file=None,
 )
+
+if onedir:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='DeDupe',
+    )
@@ -0,0 +1,133 @@
+"""Which frame of each duplicate group gets saved: first occurrence vs. best-frame selection
+
+Writes a synthetic video of detailed shots held for --hold frames, where
+one frame per shot (at a random position) is sharp and the others are
+blurred by a random amount, as in a camera settling or a pan coming to
+rest. Every frame is sampled, so each shot is one group of duplicates.
+Both modes run on it, saving PNGs, and each saved frame is traced back to
+the video frame it came from. Reports how many groups were saved as their
+sharp frame, the mean sharpness of the saved frames, run time and the
+tracemalloc peak.
+
+Usage: python benchmarks/bench_best_frame.py [--shots 40] [--hold 8] [--width 1280 --height 720]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import render_content  # noqa: E402
+from dedupe_core.best_frame import frame_quality  # noqa: E402
+from dedupe_core.frame_source import iter_frames, open_source  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions, process_video  # noqa: E402
+
+# Gaussian blur sigmas of the frames around each shot's sharp one
+BLUR_SIGMAS = (1.0, 3.0)
+
+
+def render_detailed(content_id, width, height):
+    """render_content() with fine lines and circles drawn over it, so blur shows"""
+    image = render_content(content_id, width, height)
+    rng = np.random.default_rng(content_id)
+    for _ in range(60):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        x1, x2 = (int(v) for v in rng.integers(0, width, 2))
+        y1, y2 = (int(v) for v in rng.integers(0, height, 2))
+        if rng.random() < 0.5:
+            cv2.line(image, (x1, y1), (x2, y2), color, 1)
+        else:
+            cv2.circle(image, (x1, y1), int(rng.integers(3, 40)), color, 1)
+    return image
+
+
+def write_video(path, shots, hold, width, height, seed=0):
+    """Write the video; return the index of each shot's sharp frame"""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    sharp = []
+    try:
+        for shot in range(shots):
+            image = render_detailed(seed * 1000003 + shot, width, height)
+            sharp_at = int(rng.integers(0, hold))
+            sharp.append(shot * hold + sharp_at)
+            for position in range(hold):
+                frame = image
+                if position != sharp_at:
+                    frame = cv2.GaussianBlur(image, (0, 0), float(rng.uniform(*BLUR_SIGMAS)))
+                writer.write(frame)
+    finally:
+        writer.release()
+    return sharp
+
+
+def thumbnail(frame):
+    return cv2.resize(frame, (32, 18), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def source_frames(frames, thumbnails, output_dir, hold):
+    """Index of the video frame each saved PNG is, in output order"""
+    found = []
+    for path in sorted(Path(output_dir).glob("frame_*.png")):
+        saved = cv2.imread(str(path))
+        # Thumbnails find the shot, whose frames differ only in blur; pixels then find the frame
+        small = thumbnail(saved)
+        shot = min(range(len(frames)), key=lambda i: float(cv2.norm(thumbnails[i], small, cv2.NORM_L1))) // hold
+        candidates = range(shot * hold, min(len(frames), (shot + 1) * hold))
+        found.append(min(candidates, key=lambda i: float(cv2.norm(frames[i], saved, cv2.NORM_L1))))
+    return found
+
+
+def run(video_path, output_dir, best_frame):
+    options = ProcessingOptions(fps=30, image_format="png", best_frame=best_frame, checkpoint_interval=0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = process_video(video_path, output_dir, options)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return stats, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shots", type=int, default=40)
+    parser.add_argument("--hold", type=int, default=8, help="frames per shot (default: 8)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "shots.avi")
+        sharp = write_video(video_path, args.shots, args.hold, args.width, args.height)
+        cap = open_source(video_path)
+        try:
+            frames = [frame for _, _, frame in iter_frames(cap, range(args.shots * args.hold))]
+        finally:
+            cap.release()
+        thumbnails = [thumbnail(frame) for frame in frames]
+
+        print(f"{args.shots} shots of {args.hold} frames at {args.width}x{args.height}, one sharp frame per shot")
+        print(f"{'mode':<18} {'saved':>5} {'sharp':>7} {'mean quality':>12} {'seconds':>8} {'peak MB':>8}")
+        for label, best_frame in (("first occurrence", False), ("best frame", True)):
+            output_dir = os.path.join(tmp, label.replace(" ", "_"))
+            stats, seconds, peak = run(video_path, output_dir, best_frame)
+            found = source_frames(frames, thumbnails, output_dir, args.hold)
+            hits = len(set(found) & set(sharp))
+            quality = np.mean([frame_quality(frames[frame_idx]) for frame_idx in found]) if found else 0.0
+            print(f"{label:<18} {stats.saved_frames:>5} {hits:>3}/{len(found):<3} {quality:>12.1f} {seconds:>8.2f} "
+                  f"{peak / (1024 * 1024):>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Per-frame allocations and peak memory with and without the frame buffer pool
+
+Two measurements per resolution, each with the pool off (a new array per
+decoded frame, as before) and on:
+
+- decode + hash: iter_frames() over every frame, counting how many new
+  frame arrays were allocated and the tracemalloc peak
+- full run: process_video() writing PNGs (slow to encode, so the writer
+  queue fills up) in a fresh subprocess, reporting run time, the
+  tracemalloc peak and the process's peak RSS
+
+Usage: python benchmarks/bench_buffer_pool.py [--resolutions 1920x1080,3840x2160] [--frames 120]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import weakref
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_global_index import peak_rss_mb  # noqa: E402
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.buffer_pool import DEFAULT_POOL_BYTES, BufferPool  # noqa: E402
+from dedupe_core.frame_hash import hash_frame  # noqa: E402
+from dedupe_core.frame_source import iter_frames, open_source  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions, process_video  # noqa: E402
+from dedupe_core.sampling import STRATEGY_SEQUENTIAL  # noqa: E402
+
+
+def decode_pass(video_path, pool_bytes, prefetch):
+    """Return (frames, frame arrays allocated, tracemalloc peak MB, seconds) for decoding and hashing every frame"""
+    cap = open_source(str(video_path))
+    pool = BufferPool(pool_bytes) if pool_bytes else None
+    samples = range(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    # Only arrays still alive stay in here, so a frame not found in it is a fresh allocation
+    seen = weakref.WeakValueDictionary()
+    allocated = 0
+    frames = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for _, _, frame in iter_frames(cap, samples, STRATEGY_SEQUENTIAL, prefetch, pool):
+            if seen.get(id(frame)) is not frame:
+                seen[id(frame)] = frame
+                allocated += 1
+            hash_frame(frame)
+            frames += 1
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cap.release()
+    return frames, allocated, peak / (1024 * 1024), elapsed
+
+
+def run_child(video_path, pool_bytes):
+    """Full run in this (fresh) process; prints its measurements as JSON"""
+    options = ProcessingOptions(fps=1000, similarity=100.0, image_format="png", buffer_pool_bytes=pool_bytes)
+    with tempfile.TemporaryDirectory() as output_dir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        stats = process_video(video_path, output_dir, options)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(json.dumps({"saved": stats.saved_frames, "seconds": elapsed,
+                      "traced_mb": peak / (1024 * 1024), "rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default="1920x1080,3840x2160")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--pool-mb", type=int, default=DEFAULT_POOL_BYTES // (1024 * 1024))
+    parser.add_argument("--child", nargs=2, metavar=("VIDEO", "POOL_BYTES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    pool_bytes = args.pool_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        for resolution in args.resolutions.split(","):
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            video_path = write_synthetic_video(Path(tmp) / f"{resolution}.mp4", width, height, args.frames)
+            frame_mb = width * height * 3 / (1024 * 1024)
+            print(f"{resolution}, {args.frames} frames, {frame_mb:.1f} MB per frame, pool ceiling {args.pool_mb} MB")
+
+            print(f"  decode + hash    {'prefetch':>8} {'arrays':>7} {'traced MB':>10} {'fps':>6}")
+            for label, size in (("no pool", 0), ("pool", pool_bytes)):
+                for prefetch in (0, 4):
+                    frames, arrays, traced, elapsed = decode_pass(video_path, size, prefetch)
+                    print(f"  {label:<16} {prefetch:>8} {arrays:>7} {traced:>10.1f} {frames / elapsed:>6.0f}")
+
+            print(f"  full run (png)   {'saved':>8} {'time s':>7} {'traced MB':>10} {'peak RSS MB':>12}")
+            for label, size in (("no pool", 0), ("pool", pool_bytes)):
+                output = subprocess.run([sys.executable, __file__, "--child", str(video_path), str(size)],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output)
+                print(f"  {label:<16} {result['saved']:>8} {result['seconds']:>7.2f} {result['traced_mb']:>10.1f} "
+                      f"{result['rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Decode throughput of each frame-source decoder per codec, with and without prefetch
+
+Writes synthetic videos in several codecs plus PNG and JPEG image
+sequences, then times a full sequential pass and a pass sampling every
+--interval-th frame (automatic strategy) through iter_frames() for every
+applicable decoder and prefetch depth. Each pass also hashes its frames,
+as the pipeline would, and the hashes are compared with the OpenCV (or
+first) decoder's; "same" is "no" where a decoder returns different pixels.
+
+Usage: python benchmarks/bench_decoders.py [--frames 600] [--width 1280] [--height 720]
+"""
+import argparse
+import importlib.util
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import render_frame, write_synthetic_video  # noqa: E402
+from dedupe_core.frame_hash import hash_frame  # noqa: E402
+from dedupe_core.frame_source import (  # noqa: E402
+    DECODER_IMAGES,
+    DECODER_OPENCV,
+    DECODER_PYAV,
+    iter_frames,
+    open_source,
+)
+from dedupe_core.sampling import STRATEGY_SEQUENTIAL, resolve_strategy  # noqa: E402
+
+# (label, fourcc, container); codecs the local OpenCV build can't write are skipped
+VIDEO_CODECS = (("mjpeg", "MJPG", "avi"), ("mpeg4", "mp4v", "mp4"), ("h264", "avc1", "mp4"))
+IMAGE_FORMATS = ("png", "jpg")
+PREFETCH_DEPTHS = (0, 4)
+
+
+def write_image_sequence(directory, width, height, frame_count, extension):
+    directory.mkdir()
+    for frame_idx in range(frame_count):
+        cv2.imwrite(str(directory / f"frame_{frame_idx:06d}.{extension}"), render_frame(frame_idx, width, height))
+    return directory
+
+
+def timed_pass(path, decoder, frame_interval, prefetch):
+    """Return (seconds, hashes) for one pass that decodes and hashes every sampled frame"""
+    cap = open_source(str(path), decoder)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    strategy = STRATEGY_SEQUENTIAL if frame_interval == 1 else resolve_strategy(cap, frame_interval)
+    start = time.perf_counter()
+    frames = iter_frames(cap, range(0, total_frames, frame_interval), strategy, prefetch)
+    hashes = [hash_frame(frame) for _, _, frame in frames]
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return elapsed, hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--interval", type=int, default=10, help="sampling interval of the second pass")
+    args = parser.parse_args()
+
+    video_decoders = [DECODER_OPENCV]
+    if importlib.util.find_spec("av") is not None:
+        video_decoders.append(DECODER_PYAV)
+    else:
+        print("PyAV is not installed (pip install av); only the OpenCV decoder is measured\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for label, fourcc, container in VIDEO_CODECS:
+            try:
+                path = write_synthetic_video(Path(tmp) / f"{label}.{container}", args.width, args.height,
+                                             args.frames, fourcc=fourcc)
+            except RuntimeError:
+                print(f"{label}: this OpenCV build can't encode {fourcc}, skipped")
+                continue
+            sources.append((label, path, video_decoders))
+        for extension in IMAGE_FORMATS:
+            path = write_image_sequence(Path(tmp) / extension, args.width, args.height, args.frames, extension)
+            sources.append((f"{extension} images", path, [DECODER_IMAGES]))
+
+        print(f"{args.width}x{args.height}, {args.frames} frames; video frames covered per second of decoding "
+              f"and hashing, every frame and every {args.interval}th")
+        print(f"{'source':<11} {'decoder':<7} {'prefetch':>8} {'all fps':>8} "
+              f"{f'1/{args.interval} fps':>9} {'same':>5}")
+        for label, path, decoders in sources:
+            reference = None
+            for decoder in decoders:
+                for prefetch in PREFETCH_DEPTHS:
+                    full_time, full_hashes = timed_pass(path, decoder, 1, prefetch)
+                    sampled_time, sampled_hashes = timed_pass(path, decoder, args.interval, prefetch)
+                    if reference is None:
+                        reference = (full_hashes, sampled_hashes)
+                    same = "yes" if (full_hashes, sampled_hashes) == reference else "no"
+                    print(f"{label:<11} {decoder:<7} {prefetch:>8} {len(full_hashes) / full_time:>8.0f} "
+                          f"{args.frames / sampled_time:>9.0f} {same:>5}")
+
+
+if __name__ == "__main__":
+    main()
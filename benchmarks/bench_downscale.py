@@ -0,0 +1,94 @@
+"""Per-frame hashing latency and memory: full-resolution frames vs. the decimated hash plane
+
+For each resolution and algorithm, reports the time to hash one decoded
+BGR frame, the peak memory allocated while doing so (numpy/OpenCV
+buffers, via tracemalloc), how many hash bits differ between the two
+paths, whether they keep the same frames at the default threshold, and
+the mean distance between repeats of one image vs. consecutive distinct
+images (dup/new) for each path; a larger gap separates duplicates better.
+
+Usage: python benchmarks/bench_downscale.py [--frames N] [--resolutions 1920x1080,3840x2160]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import render_frame  # noqa: E402
+from dedupe_core.frame_hash import HASH_ALGORITHMS, HASH_PLANE_SIZE, hash_frame  # noqa: E402
+from dedupe_core.hash_index import hamming_distance, select_unique, similarity_to_distance  # noqa: E402
+
+
+def make_frames(count, width, height, repeats=4):
+    """Noisy frames in which every distinct image appears `repeats` times"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = render_frame((i // repeats) * 5, width, height)
+        noise = rng.integers(0, 6, size=frame.shape, dtype=np.uint8)
+        frames.append(cv2.add(frame, noise))
+    return frames
+
+
+def separation(hashes, repeats=4):
+    """Mean Hamming distance between neighbouring repeats and between neighbouring distinct images"""
+    dup = []
+    new = []
+    for i in range(len(hashes) - 1):
+        distance = hamming_distance(hashes[i], hashes[i + 1])
+        (dup if i // repeats == (i + 1) // repeats else new).append(distance)
+    return f"{np.mean(dup):.2f}/{np.mean(new):.1f}"
+
+
+def measure(frames, algorithm, plane_size):
+    """Return (ms per frame, peak bytes allocated per frame, hashes)"""
+    hash_frame(frames[0], algorithm, plane_size)  # Warm up
+    start = time.perf_counter()
+    hashes = [hash_frame(frame, algorithm, plane_size) for frame in frames]
+    latency = (time.perf_counter() - start) / len(frames) * 1000
+
+    tracemalloc.start()
+    hash_frame(frames[0], algorithm, plane_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, peak, hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=48)
+    parser.add_argument("--resolutions", default="1920x1080,3840x2160")
+    parser.add_argument("--threshold", type=float, default=95.0)
+    args = parser.parse_args()
+
+    max_distance = similarity_to_distance(args.threshold)
+    print(f"{args.frames} frames per resolution, hash plane >= {HASH_PLANE_SIZE} px short side, "
+          f"threshold {args.threshold}%")
+    print(f"{'resolution':>10} {'algorithm':>9} {'full ms':>8} {'plane ms':>9} {'speedup':>8} "
+          f"{'full KB':>8} {'plane KB':>9} {'bits diff':>10} {'same kept':>10} "
+          f"{'full dup/new':>13} {'plane dup/new':>14}")
+
+    for resolution in args.resolutions.split(","):
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        frames = make_frames(args.frames, width, height)
+        for algorithm in HASH_ALGORITHMS:
+            full_ms, full_peak, full_hashes = measure(frames, algorithm, 0)
+            plane_ms, plane_peak, plane_hashes = measure(frames, algorithm, HASH_PLANE_SIZE)
+            bits = np.mean([hamming_distance(a, b) for a, b in zip(full_hashes, plane_hashes)])
+            full_kept = [m is None for m in select_unique(np.array(full_hashes, dtype=np.uint64), max_distance)]
+            plane_kept = [m is None for m in select_unique(np.array(plane_hashes, dtype=np.uint64), max_distance)]
+            same = sum(a == b for a, b in zip(full_kept, plane_kept)) / len(frames) * 100
+            print(f"{resolution:>10} {algorithm:>9} {full_ms:>8.2f} {plane_ms:>9.2f} "
+                  f"{full_ms / plane_ms:>7.1f}x {full_peak / 1024:>8.0f} {plane_peak / 1024:>9.0f} "
+                  f"{bits:>10.2f} {same:>9.0f}% {separation(full_hashes):>13} {separation(plane_hashes):>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
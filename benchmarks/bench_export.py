@@ -0,0 +1,83 @@
+"""Wall time and bytes written of saving an image per unique frame vs. hash-only exports
+
+Writes a synthetic video of short shots (--hold frames each, a third of
+them repeats of earlier shots) and samples every frame, so most shots
+give one unique frame. The same run then saves JPEGs, PNGs, an ffmpeg
+select script, an ffconcat list and one packed video, and reports wall
+time, files and bytes written for each. Runs use one process and no hash
+cache, so every mode decodes the video the same way. Exports are handed
+to ffmpeg jobs that may run as another user, so the run fails if an
+export file doesn't get the permissions open() gives any new file (0644
+under umask 022).
+
+Usage: python benchmarks/bench_export.py [--frames 900] [--hold 2] [--width 1920 --height 1080]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_dedup_video  # noqa: E402
+from dedupe_core.export import EXPORT_FORMATS, export_path  # noqa: E402
+from dedupe_core.manifest import MANIFEST_FILENAME  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions, process_video  # noqa: E402
+
+MODES = [("jpg files", {"image_format": "jpg"}), ("png files", {"image_format": "png"})] + [
+    (f"export {export}", {"export": export}) for export in EXPORT_FORMATS]
+
+
+def folder_size(path):
+    """(files, bytes) in a folder, leaving out the manifest every mode writes"""
+    entries = [entry for entry in os.scandir(path) if entry.name != MANIFEST_FILENAME]
+    return len(entries), sum(entry.stat().st_size for entry in entries)
+
+
+def new_file_mode(folder):
+    """Permission bits of a file created the usual way in folder"""
+    path = os.path.join(folder, "mode_probe")
+    with open(path, "wb"):
+        pass
+    mode = os.stat(path).st_mode & 0o777
+    os.remove(path)
+    return mode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--hold", type=int, default=2, help="frames per shot (default: 2)")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "shots.mp4")
+        write_dedup_video(video_path, args.width, args.height, args.frames, duplicate_ratio=0.3,
+                          hold_frames=args.hold)
+        print(f"{args.frames} frames at {args.width}x{args.height}, shots of {args.hold} frames")
+        print(f"{'mode':<16} {'unique':>6} {'seconds':>8} {'files':>6} {'MB written':>11} {'perms':>6}")
+        expected_mode = new_file_mode(tmp)
+        failed = False
+        for label, settings in MODES:
+            output_dir = os.path.join(tmp, label.replace(" ", "_"))
+            options = ProcessingOptions(fps=30, checkpoint_interval=0, **settings)
+            start = time.perf_counter()
+            stats = process_video(video_path, output_dir, options)
+            seconds = time.perf_counter() - start
+            files, size = folder_size(output_dir)
+            mode = ""
+            if "export" in settings:
+                mode = oct(os.stat(export_path(output_dir, settings["export"])).st_mode & 0o777)[2:]
+                failed = failed or int(mode, 8) != expected_mode
+            print(f"{label:<16} {stats.saved_frames:>6} {seconds:>8.2f} {files:>6} {size / 1e6:>11.2f} {mode:>6}")
+    if failed:
+        print(f"An export file's permissions differ from a new file's ({oct(expected_mode)[2:]})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Sampling accuracy of timestamp-based sampling vs. the old whole-frame interval, at common frame rates
+
+Writes a synthetic video at each --video-fps and samples it sequentially
+at each --fps with a FrameSampler, reading every sampled frame's
+timestamp. The whole-frame interval (video fps // fps frames, as before)
+is worked out from the frame count. Reports samples taken, the rate they
+amount to, and the drift of the last sample from the time it stands for
+(negative when sampling runs ahead of it). Fails if the frames sampled
+ever differ from the count the sampler predicts.
+
+Usage: python benchmarks/bench_frame_rate.py [--seconds 60] [--video-fps 29.97 25 59.94] [--fps 1 10 24]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2  # noqa: E402
+
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.frame_source import iter_frames  # noqa: E402
+from dedupe_core.sampling import STRATEGY_SEQUENTIAL, FrameSampler  # noqa: E402
+
+# Broadcast rates are 1000/1001 of the whole number they are named after
+NTSC_RATES = {29.97: 30000 / 1001, 59.94: 60000 / 1001, 23.976: 24000 / 1001}
+
+
+def sample(video_path, fps):
+    """(frames sampled, frames predicted, timestamp of each sample) with a FrameSampler"""
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        sampler = FrameSampler(fps, cap.get(cv2.CAP_PROP_FPS), 0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        predicted = len(sampler)
+        timestamps = [timestamp for _, timestamp, _ in iter_frames(cap, sampler, STRATEGY_SEQUENTIAL)]
+    finally:
+        cap.release()
+    return len(timestamps), predicted, timestamps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--video-fps", type=float, nargs="+", default=[29.97, 25.0, 59.94])
+    parser.add_argument("--fps", type=float, nargs="+", default=[1.0, 7.0, 10.0, 24.0])
+    args = parser.parse_args()
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'video':>7} {'fps':>5} | {'interval':>8} {'samples':>7} {'rate':>7} {'drift s':>7} | "
+              f"{'samples':>7} {'rate':>7} {'drift s':>7}")
+        for video_fps in args.video_fps:
+            rate = NTSC_RATES.get(video_fps, video_fps)
+            frame_count = int(args.seconds * rate)
+            video_path = os.path.join(tmp, f"{video_fps:g}.mp4")
+            write_synthetic_video(video_path, 320, 180, frame_count, rate)
+            duration = frame_count / rate
+            for fps in args.fps:
+                interval = max(1, int(rate / fps))
+                old_samples = -(-frame_count // interval)
+                # Sample k stands for time k / fps; the whole-frame interval reaches it at k * interval / rate
+                old_drift = (old_samples - 1) * (interval / rate - 1 / fps)
+                taken, predicted, timestamps = sample(video_path, fps)
+                mismatches += taken != predicted
+                drift = timestamps[-1] - (len(timestamps) - 1) / fps if timestamps else 0.0
+                print(f"{video_fps:>7g} {fps:>5g} | {interval:>8} {old_samples:>7} {old_samples / duration:>7.3f} "
+                      f"{old_drift:>7.2f} | {taken:>7} {taken / duration:>7.3f} {drift:>7.3f}")
+    if mismatches:
+        print(f"{mismatches} runs sampled a different number of frames than predicted")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Insert and query rates of the SQLite global hash index as it grows
+
+Fills a fresh index with clustered hashes spread over many videos, then
+times exact and near-duplicate queries from a new video at each size and
+checks their answers against a linear scan of everything inserted (exits
+with status 1 on a mismatch). Also reports database size and peak RSS.
+
+Then --writers processes check and add a video of --writer-frames new
+hashes each into the full index at once, as batch workers do, with a
+lock timeout of --writer-timeout seconds; each should finish without
+"database is locked" however long its batch takes (status 1 otherwise).
+Last, two writers add the same hashes while another process keeps adding
+a video and re-registering it, which deletes the newest rows; no hash
+may be kept by both writers (status 1 otherwise).
+
+Usage: python benchmarks/bench_global_index.py [--sizes 100000,1000000] [--per-video 5000] [--writers 2]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_hash_index import clustered_hashes  # noqa: E402
+from dedupe_core.global_index import GlobalHashIndex  # noqa: E402
+from dedupe_core.hash_index import hamming_distance  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def near(value, rng, flips):
+    for bit in rng.sample(range(64), flips):
+        value ^= 1 << bit
+    return value
+
+
+def concurrent_writer(path, video, hashes, radius, timeout):
+    """Worker: check and add one video's hashes
+
+    Returns (seconds, error message or None, positions of the hashes kept).
+    """
+    index = GlobalHashIndex(path, timeout)
+    start = time.perf_counter()
+    kept = set()
+    try:
+        matches = index.check_and_add_many(index.source(video), hashes, range(len(hashes)), radius)
+        kept = {i for i, match in enumerate(matches) if match is None}
+        error = None
+    except sqlite3.OperationalError as e:
+        error = str(e)
+    finally:
+        index.close()
+    return time.perf_counter() - start, error, kept
+
+
+def churn_source(path, hashes, seconds):
+    """Worker: add a video, then re-register it (deleting its rows, the newest), over and over; returns cycles"""
+    index = GlobalHashIndex(path)
+    end = time.perf_counter() + seconds
+    cycles = 0
+    try:
+        while time.perf_counter() < end:
+            index.add_many(index.source("churn.mp4"), hashes, range(len(hashes)))
+            index.source("churn.mp4")
+            cycles += 1
+            time.sleep(0.01)
+    finally:
+        index.close()
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="20000,100000,300000")
+    parser.add_argument("--per-video", type=int, default=5000, help="hashes added per video")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radii", default="0,3,7")
+    parser.add_argument("--verify", type=int, default=300000,
+                        help="check query answers by linear scan up to this size (default: 300000)")
+    parser.add_argument("--writers", type=int, default=2, help="concurrent writer processes (default: 2)")
+    parser.add_argument("--writer-frames", type=int, default=3000)
+    parser.add_argument("--writer-timeout", type=float, default=1.0,
+                        help="seconds each writer waits for the lock (default: 1)")
+    parser.add_argument("--churn-seconds", type=float, default=3.0,
+                        help="how long a video is replaced over and over during the last check (default: 3)")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    radii = [int(r) for r in args.radii.split(",")]
+    rng = random.Random(1)
+    failures = 0
+    lock_failures = 0
+    duplicate_failures = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.sqlite")
+        index = GlobalHashIndex(path)
+        inserted = []  # (hash, video) pairs, for verification
+        video = 0
+        header = " ".join(f"{f'r={r} ms':>9}" for r in radii)
+        print(f"{'size':>9} {'insert/s':>9} {header} {'DB MB':>7} {'RSS MB':>7}")
+
+        for size in sizes:
+            start = time.perf_counter()
+            added = 0
+            while len(inserted) < size:
+                count = min(args.per_video, size - len(inserted))
+                hashes = clustered_hashes(count, seed=video)
+                source = index.source(f"video_{video:06d}.mp4")
+                # Radius 0: every hash is added, so the index grows to exactly `size`
+                index.check_and_add_many(source, hashes, range(count), 0)
+                inserted.extend((h, source.video) for h in hashes)
+                added += count
+                video += 1
+            insert_rate = added / (time.perf_counter() - start)
+
+            query_source = index.source("new_video.mp4", replace=False)
+            timings = []
+            for radius in radii:
+                targets = [near(rng.choice(inserted)[0], rng, rng.randint(0, radius))
+                           for _ in range(args.queries // 2)]
+                targets += [rng.getrandbits(64) for _ in range(args.queries - len(targets))]
+                start = time.perf_counter()
+                results = [index.find(query_source, target, radius) for target in targets]
+                timings.append((time.perf_counter() - start) / len(targets) * 1000)
+
+                if size <= args.verify:
+                    for target, result in zip(targets[:50], results[:50]):
+                        expected = min((hamming_distance(target, h) for h, _ in inserted), default=None)
+                        found = None if result is None else result[0]
+                        if (expected if expected is not None and expected <= radius else None) != found:
+                            failures += 1
+
+            db_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+            times = " ".join(f"{t:>9.3f}" for t in timings)
+            print(f"{size:>9} {insert_rate:>9.0f} {times} {db_mb:>7.1f} {peak_rss_mb():>7.1f}")
+        index.close()
+
+        if args.writers > 0:
+            radius = max(radii)
+            print(f"{args.writers} writers adding {args.writer_frames} hashes each at r={radius}, "
+                  f"lock timeout {args.writer_timeout:g} s")
+            with ProcessPoolExecutor(max_workers=args.writers) as executor:
+                futures = [executor.submit(concurrent_writer, path, f"writer_{i}.mp4",
+                                           clustered_hashes(args.writer_frames, seed=video + i), radius,
+                                           args.writer_timeout)
+                           for i in range(args.writers)]
+                for i, future in enumerate(futures):
+                    seconds, error, _ = future.result()
+                    lock_failures += error is not None
+                    print(f"  writer {i}: {seconds:.2f} s, {error or 'ok'}")
+
+            print("2 writers adding the same hashes while a video is replaced over and over")
+            hashes = clustered_hashes(args.writer_frames, seed=video + args.writers)
+            with ProcessPoolExecutor(max_workers=3) as executor:
+                churn = executor.submit(churn_source, path, clustered_hashes(100, seed=video + args.writers + 1),
+                                        args.churn_seconds)
+                futures = [executor.submit(concurrent_writer, path, f"same_{i}.mp4", hashes, radius,
+                                           args.writer_timeout) for i in range(2)]
+                results = [future.result() for future in futures]
+                cycles = churn.result()
+            for i, (seconds, error, kept) in enumerate(results):
+                lock_failures += error is not None
+                print(f"  writer {i}: {seconds:.2f} s, {error or 'ok'}, kept {len(kept)}")
+            twice = len(results[0][2] & results[1][2])
+            duplicate_failures += twice
+            print(f"  {cycles} replacements, {twice} hashes kept by both writers")
+
+    if failures:
+        print(f"MISMATCH: {failures} queries differ from a linear scan")
+    else:
+        print("query results match a linear scan")
+    if lock_failures:
+        print(f"LOCKED: {lock_failures} writers timed out waiting for the write lock")
+    if duplicate_failures:
+        print(f"RACE: {duplicate_failures} hashes were kept by two writers")
+    return 1 if failures or lock_failures or duplicate_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
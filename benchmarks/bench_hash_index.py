@@ -0,0 +1,93 @@
+"""Check the multi-index hash table against brute force and time both
+
+Exits with status 1 if any dedup decision or matched frame differs from a
+linear scan over the kept hashes.
+
+Usage: python benchmarks/bench_hash_index.py [--sizes 1000,10000] [--threshold 95]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dedupe_core.hash_index import HashIndex, hamming_distance, similarity_to_distance  # noqa: E402
+
+
+def clustered_hashes(count, seed=0, cluster_size=8, max_flips=8):
+    """Hashes in clusters of near-duplicates, like consecutive frames of a shot"""
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        center = rng.getrandbits(64)
+        for _ in range(rng.randint(1, cluster_size)):
+            value = center
+            for bit in rng.sample(range(64), rng.randint(0, max_flips)):
+                value ^= 1 << bit
+            hashes.append(value)
+    return hashes[:count]
+
+
+def brute_force(hashes, max_distance):
+    """Reference dedup: nearest earlier kept hash by linear scan"""
+    kept = []
+    decisions = []
+    for frame_idx, value in enumerate(hashes):
+        best = None
+        for kept_hash, kept_idx in kept:
+            distance = hamming_distance(value, kept_hash)
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, kept_idx)
+        if best is None:
+            kept.append((value, frame_idx))
+            decisions.append(None)
+        else:
+            decisions.append(best[1])
+    return decisions
+
+
+def indexed(hashes, max_distance):
+    index = HashIndex(max_distance)
+    decisions = []
+    for frame_idx, value in enumerate(hashes):
+        match = index.check_and_add(value, frame_idx)
+        decisions.append(None if match is None else match[2])
+    return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,5000,20000")
+    parser.add_argument("--threshold", type=float, default=95.0)
+    args = parser.parse_args()
+
+    max_distance = similarity_to_distance(args.threshold)
+    print(f"threshold {args.threshold}% -> max Hamming distance {max_distance}")
+    print(f"{'hashes':>8} {'kept':>8} {'brute (s)':>10} {'index (s)':>10} {'speedup':>8}")
+
+    failed = False
+    for size in (int(s) for s in args.sizes.split(",")):
+        hashes = clustered_hashes(size)
+
+        start = time.perf_counter()
+        expected = brute_force(hashes, max_distance)
+        brute_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = indexed(hashes, max_distance)
+        index_time = time.perf_counter() - start
+
+        kept = sum(1 for d in actual if d is None)
+        print(f"{size:>8} {kept:>8} {brute_time:>10.3f} {index_time:>10.3f} {brute_time / index_time:>7.1f}x")
+        if actual != expected:
+            mismatches = sum(1 for a, b in zip(actual, expected) if a != b)
+            print(f"  MISMATCH: {mismatches} decisions differ from brute force")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Hashes/second for each frame hash algorithm, against the original per-pixel loop
+
+Also checks that the batched average hash of full-resolution frames
+(plane_size=0) matches the original calculate_frame_hash bit for bit;
+exits with status 1 if it does not.
+
+Usage: python benchmarks/bench_hashing.py [--frames N] [--width W] [--height H]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import render_frame  # noqa: E402
+from dedupe_core.frame_hash import HASH_ALGORITHMS, hash_frames  # noqa: E402
+
+
+def legacy_frame_hash(frame):
+    """The original DeDupeApp.calculate_frame_hash implementation"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    resized = cv2.resize(gray, (8, 8))
+    avg = resized.mean()
+    hash_value = 0
+    for i in range(8):
+        for j in range(8):
+            if resized[i, j] > avg:
+                hash_value |= 1 << (i * 8 + j)
+    return hash_value
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = np.stack([render_frame(i * 7, args.width, args.height) for i in range(args.frames)])
+    noise = rng.integers(0, 8, size=frames.shape, dtype=np.uint8)
+    frames = cv2.add(frames.reshape(-1, args.width, 3), noise.reshape(-1, args.width, 3)).reshape(frames.shape)
+    small = np.stack([cv2.resize(f, (8, 8)) for f in frames])
+
+    print(f"{args.frames} frames at {args.width}x{args.height}, best of {args.repeat}")
+    print(f"{'algorithm':>16} {'full frame (h/s)':>17} {'8x8 input (h/s)':>16}")
+
+    def best_time(function, data):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            function(data)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    legacy = lambda data: [legacy_frame_hash(f) for f in data]  # noqa: E731
+    print(f"{'legacy loop':>16} {rate(len(frames), best_time(legacy, frames)):>17.0f} "
+          f"{rate(len(small), best_time(legacy, small)):>16.0f}")
+    for algorithm in HASH_ALGORITHMS:
+        batched = lambda data: hash_frames(data, algorithm)  # noqa: E731
+        print(f"{algorithm:>16} {rate(len(frames), best_time(batched, frames)):>17.0f} "
+              f"{rate(len(small), best_time(batched, small)):>16.0f}")
+
+    expected = [legacy_frame_hash(f) for f in frames]
+    actual = [int(h) for h in hash_frames(frames, plane_size=0)]
+    if actual != expected:
+        print("MISMATCH: batched average hash differs from the original implementation")
+        return 1
+    print("average hash matches the original implementation for every frame")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Throughput of the GUI's job queue by concurrency, and the idle time between queued jobs
+
+Writes --videos short synthetic videos and queues them all on a
+JobScheduler, once per --concurrency value, dry-running so that disk
+speed doesn't skew the numbers. Reports wall time, aggregate frames/s
+and the gap between a job ending and the next queued one starting
+(the time the queue sat idle).
+
+Usage: python benchmarks/bench_jobs.py [--videos 8] [--frames 300] [--concurrency 1 2 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.jobs import JOB_DONE, Job, JobScheduler  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions  # noqa: E402
+
+# How often the benchmark checks whether the queue is done; the scheduler itself never waits on this
+POLL_SECONDS = 0.01
+
+
+def idle_gaps(jobs, concurrency):
+    """Seconds between each job that had to wait and the end of the job that made room for it"""
+    finishes = sorted(job.finished for job in jobs)
+    gaps = []
+    for job in sorted(jobs, key=lambda job: job.started)[concurrency:]:
+        before = [finished for finished in finishes if finished <= job.started]
+        if before:
+            gaps.append(job.started - before[-1])
+    return gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = [str(write_synthetic_video(Path(tmp) / f"video_{i}.mp4", args.width, args.height, args.frames))
+                  for i in range(args.videos)]
+        print(f"{args.videos} videos of {args.frames} frames at {args.width}x{args.height}, {os.cpu_count()} CPUs")
+        print(f"{'jobs':>5} {'time (s)':>9} {'frames/s':>9} {'mean gap ms':>12} {'max gap ms':>11}")
+        failed = False
+        for concurrency in args.concurrency:
+            # A budget of one core per job, so the setting alone decides how many run
+            scheduler = JobScheduler(concurrency, cpu_budget=concurrency)
+            jobs = [Job(video, os.path.join(tmp, f"out_{concurrency}_{i}"), ProcessingOptions(fps=30, dry_run=True))
+                    for i, video in enumerate(videos)]
+            start = time.time()
+            for job in jobs:
+                scheduler.submit(job)
+            while scheduler.busy():
+                time.sleep(POLL_SECONDS)
+            elapsed = max(job.finished for job in jobs) - start
+            failed = failed or any(job.status != JOB_DONE for job in jobs)
+            frames = sum(job.stats.processed_frames for job in jobs if job.stats is not None)
+            gaps = idle_gaps(jobs, concurrency) or [0.0]
+            print(f"{concurrency:>5} {elapsed:>9.2f} {frames / elapsed:>9.0f} {sum(gaps) / len(gaps) * 1000:>12.2f} "
+                  f"{max(gaps) * 1000:>11.2f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
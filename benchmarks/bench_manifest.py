@@ -0,0 +1,98 @@
+"""Size, write time and query speed of run manifests as they grow to millions of frames
+
+Builds manifests of --rows synthetic hashed frames (a kept frame every
+few rows, the rest linked to it), then times saving, opening with and
+without memory mapping, and the queries downstream tools make: looking up
+a frame, listing the saved files and finding a kept frame's duplicates.
+Also reports the tracemalloc peak of opening each way.
+
+Usage: python benchmarks/bench_manifest.py [--rows 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dedupe_core.manifest import KEPT, build_manifest, load_manifest, manifest_path, save_manifest  # noqa: E402
+
+# One frame in this many starts a new group of duplicates
+GROUP_SIZE = 8
+
+QUERIES = 1000
+
+
+def synthetic_manifest(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame_indices = np.arange(rows, dtype=np.int64) * 3
+    hashes = rng.integers(0, 2 ** 63, rows, dtype=np.int64).astype(np.uint64)
+    anchors = frame_indices[(np.arange(rows) // GROUP_SIZE) * GROUP_SIZE]
+    duplicate_of = np.where(anchors == frame_indices, KEPT, anchors)
+    kept = frame_indices[duplicate_of == KEPT]
+    outputs = dict(enumerate(kept.tolist()))
+    meta = {"video_path": "synthetic.mp4", "region": None, "video_fps": 30.0, "image_format": "jpg"}
+    return build_manifest(frame_indices, hashes, duplicate_of, outputs, meta)
+
+
+def timed(function, repeat=1):
+    """(result, seconds per call) of the fastest of repeat calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def open_peak(output_dir, mmap):
+    """(seconds, tracemalloc peak) of opening a manifest and reading its metadata"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    manifest = load_manifest(output_dir, mmap=mmap)
+    len(manifest)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'MB':>6} {'save ms':>8} {'open ms':>8} {'open MB':>8} {'mmap ms':>8} {'mmap MB':>8} "
+          f"{'lookup us':>9} {'saved ms':>8} {'dups ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            # A folder per size; Windows can't replace a file that is still mapped
+            output_dir = os.path.join(tmp, str(rows))
+            os.mkdir(output_dir)
+            manifest = synthetic_manifest(rows)
+            _, save_seconds = timed(lambda: save_manifest(output_dir, manifest))
+            size = os.path.getsize(manifest_path(output_dir))
+            open_seconds, open_bytes = open_peak(output_dir, mmap=False)
+            mmap_seconds, mmap_bytes = open_peak(output_dir, mmap=True)
+
+            loaded = load_manifest(output_dir)
+            rng = np.random.default_rng(1)
+            frames = rng.integers(0, rows, QUERIES) * 3
+            _, lookup_seconds = timed(lambda: [loaded.row(int(frame_idx)) for frame_idx in frames], 3)
+            _, saved_seconds = timed(lambda: loaded.saved(), 3)
+            _, duplicates_seconds = timed(lambda: loaded.duplicates(int(frames[0]) // 24 * 24), 3)
+            print(f"{rows:>9} {size / 1e6:>6.1f} {save_seconds * 1000:>8.1f} {open_seconds * 1000:>8.1f} "
+                  f"{open_bytes / 1e6:>8.1f} {mmap_seconds * 1000:>8.1f} {mmap_bytes / 1e6:>8.1f} "
+                  f"{lookup_seconds / QUERIES * 1e6:>9.2f} {saved_seconds * 1000:>8.1f} "
+                  f"{duplicates_seconds * 1000:>8.1f}")
+            loaded = None  # Unmapped before the folder is deleted
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
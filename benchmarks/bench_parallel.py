@@ -0,0 +1,71 @@
+"""Scaling of the multi-process segment decoder with worker count
+
+Reports wall time, speedup and speedup per core for each worker count, and
+checks that every run produces the same hash stream as one worker; exits
+with status 1 if any run differs.
+
+Usage: python benchmarks/bench_parallel.py [--frames N] [--interval K] [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.parallel import hash_video_parallel  # noqa: E402
+
+
+def default_worker_counts():
+    counts = []
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return ",".join(str(c) for c in counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--interval", type=int, default=2)
+    parser.add_argument("--workers", default=default_worker_counts())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = str(write_synthetic_video(Path(tmp) / "synthetic.mp4", args.width, args.height,
+                                               args.frames))
+        print(f"{args.frames} frames at {args.width}x{args.height}, sampling every {args.interval} frames, "
+              f"{os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8} {'per core':>9}")
+
+        reference = None
+        baseline = None
+        failed = False
+        for workers in (int(w) for w in args.workers.split(",")):
+            start = time.perf_counter()
+            indices, hashes, _ = hash_video_parallel(video_path, args.interval, workers)
+            elapsed = time.perf_counter() - start
+
+            if reference is None:
+                reference = (indices, hashes)
+                baseline = elapsed
+            elif not (np.array_equal(indices, reference[0]) and np.array_equal(hashes, reference[1])):
+                print(f"  MISMATCH: {workers} workers produced a different hash stream")
+                failed = True
+
+            speedup = baseline / elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {speedup:>7.2f}x {speedup / workers:>8.2f}x")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Frames pruned by each stage, and run time, with and without the scene pre-filter
+
+Writes a synthetic video of alternating static and moving shots, then runs
+the pipeline (dry run, no cache) plainly, with the pre-filter, and with
+the pre-filter plus adaptive sampling. For each run it reports decoded,
+hashed and kept frames, what each stage pruned, and how many shots still
+have at least one kept frame compared with the plain run (exits with
+status 1 if the pre-filter alone loses a shot).
+
+Usage: python benchmarks/bench_prefilter.py [--shots 12] [--fps 10] [--resolution 1280x720]
+"""
+import argparse
+import bisect
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_shot_video  # noqa: E402
+from dedupe_core.hash_cache import HashCache  # noqa: E402
+from dedupe_core.hash_index import select_unique  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions, process_video  # noqa: E402
+from dedupe_core.prefilter import PrefilterOptions  # noqa: E402
+
+
+class RecordingCache(HashCache):
+    """Hash cache that also keeps the last stream stored, to see which frames were hashed"""
+
+    def store(self, key, frame_indices, hashes):
+        self.stream = (list(frame_indices), hashes)
+        super().store(key, frame_indices, hashes)
+
+
+def shot_plan(count):
+    """Long static shots (slides, idle camera) broken up by short moving ones"""
+    return [("moving", 2.0) if i % 3 == 2 else ("static", 8.0 + 4.0 * (i % 2)) for i in range(count)]
+
+
+def run(video_path, tmp, name, fps, prefilter):
+    """Return (stats, seconds, frame indices of kept frames)"""
+    cache = RecordingCache(os.path.join(tmp, f"cache_{name}"))
+    options = ProcessingOptions(fps=fps, dry_run=True, hash_cache=cache, prefilter=prefilter)
+    start = time.perf_counter()
+    stats = process_video(video_path, os.path.join(tmp, name), options)
+    seconds = time.perf_counter() - start
+    # Nothing is written in a dry run; the kept frames follow from the hashed stream
+    indices, hashes = cache.stream
+    matches = select_unique(hashes, options.max_distance)
+    return stats, seconds, [idx for idx, match in zip(indices, matches) if match is None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shots", type=int, default=12)
+    parser.add_argument("--fps", type=float, default=10, help="sampling rate (default: 10)")
+    parser.add_argument("--resolution", default="1280x720")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "shots.mp4")
+        starts = write_shot_video(video_path, shot_plan(args.shots), width, height)
+        print(f"{args.shots} shots, {width}x{height}, sampling {args.fps:g} fps")
+        print(f"{'mode':<18} {'seconds':>8} {'decoded':>8} {'hashed':>7} {'kept':>5} "
+              f"{'sampling':>9} {'prefilter':>9} {'hash':>5} {'shots':>6}")
+
+        modes = [
+            ("plain", None),
+            ("prefilter", PrefilterOptions()),
+            ("prefilter+adaptive", PrefilterOptions(adaptive=True)),
+        ]
+        baseline_shots = None
+        failures = 0
+        for name, prefilter in modes:
+            stats, seconds, kept = run(video_path, tmp, name, args.fps, prefilter)
+            shots = {bisect.bisect_right(starts, frame_idx) - 1 for frame_idx in kept}
+            if baseline_shots is None:
+                baseline_shots = shots
+            covered = len(shots & baseline_shots)
+            if prefilter is not None and not prefilter.adaptive and covered < len(baseline_shots):
+                failures += 1
+            pruned = stats.pruned()
+            print(f"{name:<18} {seconds:>8.2f} {stats.processed_frames:>8} "
+                  f"{stats.processed_frames - stats.prefiltered_frames:>7} {stats.saved_frames:>5} "
+                  f"{pruned['sampling']:>9} {pruned['prefilter']:>9} {pruned['hash_index']:>5} "
+                  f"{covered:>3}/{len(baseline_shots):<2}")
+
+    if failures:
+        print("MISMATCH: the pre-filter lost shots the plain run kept")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Time until the area selection window has a frame to show: one-off decode vs. the background preview index
+
+The old dialog opened a fresh capture, seeked to the middle frame, converted
+it to RGB at full resolution and resized it with PIL's LANCZOS filter. The
+preview index decodes its frames in the background as soon as a video is
+loaded; the dialog then only wraps a cached display-sized array. Reports,
+per resolution, the old path's latency, the index's time to its middle
+frame and to all frames, and the cost of showing (or scrubbing to) a
+cached preview.
+
+Usage: python benchmarks/bench_preview.py [--resolutions 1920x1080,3840x2160] [--frames 300]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.frame_source import FrameSource  # noqa: E402
+from dedupe_core.preview import PREVIEW_MAX_SIZE, PreviewIndex, display_scale  # noqa: E402
+
+
+def legacy_preview(video_path):
+    """The dialog's original load path, up to the image handed to Tk"""
+    cap = cv2.VideoCapture(str(video_path))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // 2)
+    ret, frame = cap.read()
+    cap.release()
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    scale = display_scale(image.width, image.height, PREVIEW_MAX_SIZE)
+    if scale < 1.0:
+        image = image.resize((int(image.width * scale), int(image.height * scale)), Image.LANCZOS)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolutions", default="1920x1080,3840x2160")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'resolution':>10} {'old ms':>8} {'middle ms':>10} {'all ms':>8} {'show ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for resolution in args.resolutions.split(","):
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            video_path = write_synthetic_video(Path(tmp) / f"{resolution}.mp4", width, height, args.frames)
+
+            start = time.perf_counter()
+            legacy_preview(video_path)
+            legacy_ms = (time.perf_counter() - start) * 1000
+
+            # Timed from loading the video, as the GUI starts building right after load_video_info
+            start = time.perf_counter()
+            source = FrameSource(video_path)
+            index = PreviewIndex(source)
+            while index.get(index.middle) is None and not index.failed(index.middle):
+                time.sleep(0.001)
+            middle_ms = (time.perf_counter() - start) * 1000
+            index.wait()
+            all_ms = (time.perf_counter() - start) * 1000
+
+            # What the dialog does per displayed or scrubbed-to frame, minus the Tk PhotoImage copy
+            start = time.perf_counter()
+            for i in range(len(index)):
+                Image.fromarray(index.get(i).rgb)
+            show_ms = (time.perf_counter() - start) * 1000 / len(index)
+            index.close()
+            source.close()
+
+            print(f"{resolution:>10} {legacy_ms:>8.1f} {middle_ms:>10.1f} {all_ms:>8.1f} {show_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
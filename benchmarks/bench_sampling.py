@@ -0,0 +1,69 @@
+"""Compare seek-per-sample and sequential grab()/retrieve() decoding
+
+Usage: python benchmarks/bench_sampling.py [--frames N] [--width W] [--height H]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import write_synthetic_video  # noqa: E402
+from dedupe_core.sampling import (  # noqa: E402
+    STRATEGY_SEEK,
+    STRATEGY_SEQUENTIAL,
+    choose_strategy,
+    estimate_keyframe_interval,
+    iter_sampled_frames,
+)
+
+CODECS = ("MJPG", "mp4v")
+INTERVALS = (1, 2, 5, 10, 30, 60)
+
+
+def time_strategy(video_path, frame_interval, strategy):
+    """Return (seconds, frames returned) for one pass over the video"""
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    start = time.perf_counter()
+    count = sum(1 for _ in iter_sampled_frames(cap, range(0, total_frames, frame_interval), strategy))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in CODECS:
+            ext = "avi" if codec == "MJPG" else "mp4"
+            video_path = write_synthetic_video(Path(tmp) / f"synthetic_{codec}.{ext}", args.width,
+                                               args.height, args.frames, fourcc=codec)
+            cap = cv2.VideoCapture(str(video_path))
+            keyframe_interval = estimate_keyframe_interval(cap)
+            cap.release()
+
+            print(f"{codec}: {args.width}x{args.height}, {args.frames} frames, keyframe interval {keyframe_interval}")
+            print(f"{'interval':>8} {'seek (s)':>10} {'sequential (s)':>15} {'speedup':>8} {'auto':>11}")
+            for frame_interval in INTERVALS:
+                seek_time, seek_count = time_strategy(video_path, frame_interval, STRATEGY_SEEK)
+                seq_time, seq_count = time_strategy(video_path, frame_interval, STRATEGY_SEQUENTIAL)
+                if seek_count != seq_count:
+                    print(f"  warning: seek returned {seek_count} frames, sequential {seq_count}")
+                auto = choose_strategy(frame_interval, keyframe_interval)
+                print(f"{frame_interval:>8} {seek_time:>10.3f} {seq_time:>15.3f} "
+                      f"{seek_time / seq_time:>7.2f}x {auto:>11}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
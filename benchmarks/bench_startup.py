@@ -0,0 +1,108 @@
+"""Startup time of the GUI: until the window is drawn and until the engine is ready
+
+Two measurements, each over --runs fresh processes (the first run is
+reported separately, as the OS file cache is coldest then):
+
+- imports: the time to import what DeDupe.py imports before drawing its
+  window, against the engine modules it loads afterwards in the
+  background (which used to be imported before the window appeared).
+  Needs no display.
+- launch: starts the app with DEDUPE_STARTUP_REPORT set, which makes it
+  record when its window was drawn and when the engine had loaded, then
+  quit. Runs `python DeDupe.py`, plus every --exe given, e.g. the
+  one-file dist/DeDupe.exe and the one-dir dist/DeDupe/DeDupe.exe. Needs
+  a display; skipped with --imports-only.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--exe dist/DeDupe.exe] [--exe dist/DeDupe/DeDupe.exe]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT))
+
+from DeDupe import ENGINE_MODULES, STARTUP_REPORT_ENV  # noqa: E402
+
+# Longest a launched app may take to report before the run counts as failed
+LAUNCH_TIMEOUT = 120
+
+
+def import_seconds(modules):
+    """Seconds a fresh interpreter takes to import modules, excluding interpreter start-up"""
+    code = ("import importlib, time\n"
+            "start = time.perf_counter()\n"
+            f"for name in {list(modules)!r}:\n"
+            "    importlib.import_module(name)\n"
+            "print(time.perf_counter() - start)\n")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True,
+                            text=True).stdout
+    return float(output)
+
+
+def launch_seconds(command, report_path):
+    """(seconds until the window was drawn, seconds until the engine was ready) for one launch"""
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    env = dict(os.environ, **{STARTUP_REPORT_ENV: report_path})
+    start = time.time()
+    subprocess.run(command, cwd=ROOT, env=env, check=True, timeout=LAUNCH_TIMEOUT, capture_output=True)
+    with open(report_path, encoding="utf-8") as handle:
+        report = json.load(handle)
+    return report["window_shown"] - start, report["engine_ready"] - start
+
+
+def describe(values):
+    """First run, then the median and minimum of the rest"""
+    text = f"first {values[0] * 1000:7.0f} ms"
+    if len(values) > 1:
+        rest = values[1:]
+        text += f"   median {statistics.median(rest) * 1000:7.0f} ms   min {min(rest) * 1000:7.0f} ms"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (default: 5)")
+    parser.add_argument("--exe", action="append", default=[], help="built executable to launch as well")
+    parser.add_argument("--imports-only", action="store_true", help="skip launching the app (no display needed)")
+    args = parser.parse_args()
+    runs = max(1, args.runs)
+
+    print("imports")
+    before_window = [import_seconds(["DeDupe"]) for _ in range(runs)]
+    engine = [import_seconds(ENGINE_MODULES) for _ in range(runs)]
+    print(f"  {'before the window':<28} {describe(before_window)}")
+    print(f"  {'engine (background)':<28} {describe(engine)}")
+    if args.imports_only:
+        return 0
+
+    commands = [("python DeDupe.py", [sys.executable, str(ROOT / "DeDupe.py")])]
+    commands += [(exe, [str(Path(exe).resolve())]) for exe in args.exe]
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, "startup.json")
+        for label, command in commands:
+            print(label)
+            try:
+                times = [launch_seconds(command, report_path) for _ in range(runs)]
+            except (OSError, subprocess.SubprocessError, ValueError) as e:
+                # The app's own error (e.g. no display) says more than the exit status
+                stderr = getattr(e, "stderr", None)
+                print(f"  failed: {stderr.decode(errors='replace').strip().splitlines()[-1] if stderr else e}")
+                failed = True
+                continue
+            print(f"  {'window drawn':<28} {describe([window for window, _ in times])}")
+            print(f"  {'engine ready':<28} {describe([ready for _, ready in times])}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Sustained throughput and memory of streaming dedup over hours of synthetic live input
+
+Feeds a test-pattern capture (no frame count, like a camera) through
+process_stream() and samples resident memory every --checkpoint-minutes
+of stream time; memory should stay flat however long the stream runs.
+
+Usage: python benchmarks/bench_streaming.py [--hours 2] [--fps 1] [--window-frames 100] [--write]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import TestPatternCapture  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions  # noqa: E402
+from dedupe_core.streaming import process_stream  # noqa: E402
+
+
+def current_rss_mb():
+    """Resident set size now (Linux), or the peak where that isn't available"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=2.0, help="stream time to simulate (default: 2)")
+    parser.add_argument("--source-fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--fps", type=float, default=1.0, help="frames sampled per second of stream")
+    parser.add_argument("--window-frames", type=int, default=100)
+    parser.add_argument("--window-seconds", type=float)
+    parser.add_argument("--checkpoint-minutes", type=float, default=15.0)
+    parser.add_argument("--write", action="store_true", help="save kept frames to a temporary folder")
+    args = parser.parse_args()
+
+    capture = TestPatternCapture(args.width, args.height, args.source_fps, duration_seconds=args.hours * 3600)
+    options = ProcessingOptions(fps=args.fps, dry_run=not args.write)
+    checkpoint_frames = int(args.checkpoint_minutes * 60 * args.source_fps)
+    start = time.perf_counter()
+    next_checkpoint = [checkpoint_frames]
+
+    print(f"{args.hours} h of {args.width}x{args.height} at {args.source_fps} fps, sampling {args.fps} fps, "
+          f"window {args.window_frames} frames / {args.window_seconds} s")
+    print(f"{'stream min':>10} {'wall s':>8} {'kept':>7} {'samples/s':>10} {'realtime x':>11} {'RSS MB':>8}")
+
+    def report(stats):
+        if stats.total_frames < next_checkpoint[0]:
+            return
+        next_checkpoint[0] += checkpoint_frames
+        wall = time.perf_counter() - start
+        stream_seconds = stats.total_frames / args.source_fps
+        print(f"{stream_seconds / 60:>10.0f} {wall:>8.1f} {stats.saved_frames:>7} "
+              f"{stats.processed_frames / max(wall, 1e-9):>10.0f} {stream_seconds / max(wall, 1e-9):>11.0f} "
+              f"{current_rss_mb():>8.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = process_stream(capture, tmp, options, args.window_frames, args.window_seconds, progress=report)
+    wall = time.perf_counter() - start
+    print(f"{stats.processed_frames} samples of {stats.total_frames} frames in {wall:.1f} s: "
+          f"{stats.processed_frames / wall:.0f} samples/s sustained, {stats.total_frames / wall:.0f} source frames/s, "
+          f"{stats.saved_frames} kept")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Reproducible end-to-end benchmark of the dedup pipeline, with results saved for comparison
+
+Generates deterministic synthetic videos with known duplicates
+(synthetic.write_dedup_video) for a baseline scenario and variants that
+change one of resolution, duplicate ratio, noise level or GOP size. Each
+video is run through process_video() headless, writing JPEGs, and the
+suite records:
+
+- throughput: sampled frames and video frames per second of the run, and
+  hash_frame() calls per second on the same frames, each the best of
+  --repeat runs
+- memory: tracemalloc peak of the run
+- dedup quality: precision and recall of the kept frames against ground
+  truth, where a sampled frame should be kept if no earlier sampled frame
+  shows the same image
+- the p50 of every pipeline stage from the run's metrics
+
+Results are written to a JSON file with the environment they came from.
+--compare OLD.json prints the change per scenario and exits with status 1
+if throughput dropped or precision/recall fell by more than --tolerance.
+
+Usage: python benchmarks/bench_suite.py [--frames 300] [--output results.json] [--compare old.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.bench_prefilter import RecordingCache  # noqa: E402
+from benchmarks.synthetic import write_dedup_video  # noqa: E402
+from dedupe_core.frame_hash import hash_frame  # noqa: E402
+from dedupe_core.frame_source import iter_frames, open_source  # noqa: E402
+from dedupe_core.hash_index import select_unique  # noqa: E402
+from dedupe_core.pipeline import ProcessingOptions, process_video  # noqa: E402
+
+# Every scenario is the baseline with at most one setting changed
+BASELINE = {"width": 1280, "height": 720, "duplicate_ratio": 0.5, "noise_level": 4, "key_interval": 30,
+            "hold_frames": 6}
+VARIANTS = (
+    ("baseline", {}),
+    ("1080p", {"width": 1920, "height": 1080}),
+    ("few-duplicates", {"duplicate_ratio": 0.1}),
+    ("many-duplicates", {"duplicate_ratio": 0.9}),
+    ("clean", {"noise_level": 0}),
+    ("noisy", {"noise_level": 48}),
+    ("intra-only", {"key_interval": 1}),
+    ("long-gop", {"key_interval": 250}),
+)
+
+# Shortest timed pass of hash_rate()
+MIN_HASH_SECONDS = 0.5
+
+# Results compared by --compare; higher is better for all of them
+COMPARED = ("frames_per_second", "hashes_per_second", "precision", "recall")
+
+
+def ground_truth(contents, sampled):
+    """Sampled frame indices that show an image no earlier sampled frame showed"""
+    seen = set()
+    keep = set()
+    for frame_idx in sampled:
+        if contents[frame_idx] not in seen:
+            seen.add(contents[frame_idx])
+            keep.add(frame_idx)
+    return keep
+
+
+def hash_rate(video_path, sampled, repeat):
+    """hash_frame() calls per second over the decoded sampled frames, best of repeat passes"""
+    cap = open_source(str(video_path))
+    try:
+        frames = [frame for _, _, frame in iter_frames(cap, sampled)]
+    finally:
+        cap.release()
+    best = 0.0
+    for _ in range(repeat):
+        # Long enough passes that timer and scheduler noise don't dominate
+        hashed = 0
+        start = time.perf_counter()
+        while hashed == 0 or time.perf_counter() - start < MIN_HASH_SECONDS:
+            for frame in frames:
+                hash_frame(frame)
+            hashed += len(frames)
+        best = max(best, hashed / (time.perf_counter() - start))
+    return best
+
+
+def run_scenario(tmp, name, settings, frame_count, fps, similarity, repeat):
+    video_path = os.path.join(tmp, f"{name}.mp4")
+    contents = write_dedup_video(video_path, settings["width"], settings["height"], frame_count,
+                                 duplicate_ratio=settings["duplicate_ratio"], noise_level=settings["noise_level"],
+                                 key_interval=settings["key_interval"], hold_frames=settings["hold_frames"])
+
+    seconds = float("inf")
+    for attempt in range(repeat):
+        # A fresh cache each time, so every run decodes; memory is traced on the first run only
+        cache = RecordingCache(os.path.join(tmp, f"cache_{name}_{attempt}"))
+        options = ProcessingOptions(fps=fps, similarity=similarity, hash_cache=cache)
+        if attempt == 0:
+            tracemalloc.start()
+        start = time.perf_counter()
+        stats = process_video(video_path, os.path.join(tmp, f"{name}_{attempt}"), options)
+        seconds = min(seconds, time.perf_counter() - start)
+        if attempt == 0:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    # The kept frames follow from the hashed stream, exactly as the pipeline decided them
+    indices, hashes = cache.stream
+    matches = select_unique(hashes, options.max_distance)
+    kept = {idx for idx, match in zip(indices, matches) if match is None}
+    truth = ground_truth(contents, indices)
+    correct = len(kept & truth)
+    stages = stats.as_dict()["metrics"]["stages_ms"]
+    return {
+        "settings": dict(settings, frames=frame_count, fps=fps, similarity=similarity),
+        "seconds": round(seconds, 3),
+        "frames_per_second": round(stats.processed_frames / seconds, 1),
+        "video_frames_per_second": round(stats.total_frames / seconds, 1),
+        "hashes_per_second": round(hash_rate(video_path, indices, repeat), 1),
+        "traced_peak_mb": round(peak / (1024 * 1024), 1),
+        "processed_frames": stats.processed_frames,
+        "saved_frames": stats.saved_frames,
+        "expected_frames": len(truth),
+        "precision": round(correct / len(kept), 4) if kept else 1.0,
+        "recall": round(correct / len(truth), 4) if truth else 1.0,
+        "stage_p50_ms": {stage: values["p50"] for stage, values in stages.items()},
+    }
+
+
+def environment():
+    """Where the results came from, so runs on different machines aren't confused"""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, old, tolerance):
+    """Print the change of each compared value against an earlier results file; return the regressions"""
+    regressions = []
+    print(f"\nchange vs. {old['environment'].get('revision') or 'earlier run'} ({old['environment']['time']})")
+    for name, result in results.items():
+        before = old["scenarios"].get(name)
+        if before is None or before["settings"] != result["settings"]:
+            print(f"  {name:<16} not comparable (missing or different settings)")
+            continue
+        changes = []
+        for key in COMPARED:
+            if not before[key]:
+                continue
+            change = result[key] / before[key] - 1.0
+            changes.append(f"{key} {change * 100:+.1f}%")
+            if change < -tolerance:
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        print(f"  {name:<16} " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=300, help="frames per video (default: 300)")
+    parser.add_argument("--fps", type=float, default=10, help="sampling rate (default: 10)")
+    parser.add_argument("--similarity", type=float, default=95.0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario; the fastest counts (default: 3)")
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--output", help="results file (default: bench_suite_<time>.json in the current folder)")
+    parser.add_argument("--compare", metavar="OLD", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative drop treated as a regression by --compare (default: 0.15)")
+    args = parser.parse_args()
+
+    variants = VARIANTS
+    if args.only:
+        names = args.only.split(",")
+        variants = [variant for variant in VARIANTS if variant[0] in names]
+
+    print(f"{'scenario':<16} {'fps':>7} {'video fps':>9} {'hash/s':>8} {'peak MB':>8} "
+          f"{'kept':>5} {'truth':>5} {'precision':>9} {'recall':>7}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, changes in variants:
+            result = run_scenario(tmp, name, dict(BASELINE, **changes), args.frames, args.fps, args.similarity,
+                                  max(1, args.repeat))
+            results[name] = result
+            print(f"{name:<16} {result['frames_per_second']:>7.1f} {result['video_frames_per_second']:>9.1f} "
+                  f"{result['hashes_per_second']:>8.0f} {result['traced_peak_mb']:>8.1f} "
+                  f"{result['saved_frames']:>5} {result['expected_frames']:>5} "
+                  f"{result['precision']:>9.3f} {result['recall']:>7.3f}")
+
+    output = args.output or f"bench_suite_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump({"environment": environment(), "scenarios": results}, handle, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Inline cv2.imwrite vs. the threaded FrameWriter for saving unique frames
+
+Usage: python benchmarks/bench_writer.py [--frames N] [--width W] [--height H]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import render_frame  # noqa: E402
+from dedupe_core.writer import OUTPUT_FORMATS, FrameWriter, frame_path  # noqa: E402
+
+
+def run_inline(frames, output_dir, decode_cost):
+    for i, frame in enumerate(frames):
+        time.sleep(decode_cost)
+        cv2.imwrite(str(frame_path(output_dir, i)), frame)
+
+
+def run_writer(frames, output_dir, decode_cost, image_format, threads):
+    with FrameWriter(image_format, threads=threads) as writer:
+        for i, frame in enumerate(frames):
+            time.sleep(decode_cost)
+            writer.submit(frame_path(output_dir, i, image_format), frame)
+    return writer.bytes_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--decode-ms", type=float, default=5.0,
+                        help="simulated decode + hash time per frame (default: 5)")
+    parser.add_argument("--threads", default="1,2,4")
+    args = parser.parse_args()
+
+    frames = [render_frame(i * 11, args.width, args.height) for i in range(args.frames)]
+    decode_cost = args.decode_ms / 1000.0
+    print(f"{args.frames} unique frames at {args.width}x{args.height}, {args.decode_ms} ms simulated decode per frame")
+    print(f"{'mode':>16} {'time (s)':>9} {'frames/s':>9} {'MB written':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        run_inline(frames, tmp, decode_cost)
+        elapsed = time.perf_counter() - start
+        print(f"{'inline imwrite':>16} {elapsed:>9.2f} {args.frames / elapsed:>9.1f} {'-':>11}")
+
+        for image_format in OUTPUT_FORMATS:
+            for threads in (int(t) for t in args.threads.split(",")):
+                start = time.perf_counter()
+                written = run_writer(frames, tmp, decode_cost, image_format, threads)
+                elapsed = time.perf_counter() - start
+                label = f"{image_format} x{threads}"
+                print(f"{label:>16} {elapsed:>9.2f} {args.frames / elapsed:>9.1f} {written / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
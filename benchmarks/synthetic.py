@@ -0,0 +1,187 @@
+"""Deterministic synthetic test videos for the benchmarks"""
+import cv2
+import numpy as np
+
+
+def render_frame(frame_idx, width, height):
+    """Render one frame with a moving gradient and the frame number burned in"""
+    x = np.arange(width, dtype=np.uint16)
+    y = np.arange(height, dtype=np.uint16)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    # Offsets are reduced first so long streams don't overflow uint16
+    frame[:, :, 0] = ((x + frame_idx * 3 % 256) % 256).astype(np.uint8)
+    frame[:, :, 1] = ((y + frame_idx * 2 % 256) % 256).astype(np.uint8)
+    frame[:, :, 2] = ((x + y + frame_idx % 256) % 256).astype(np.uint8)
+    scale = max(1.0, height / 180.0)
+    cv2.putText(frame, f"{frame_idx:06d}", (int(20 * scale), int(90 * scale)),
+                cv2.FONT_HERSHEY_SIMPLEX, 2.0 * scale, (255, 255, 255), int(3 * scale))
+    return frame
+
+
+def write_synthetic_video(path, width=640, height=360, frame_count=600, fps=30.0,
+                          fourcc="mp4v", key_interval=None):
+    """Write a synthetic video and return its path
+
+    key_interval is passed to the encoder when the OpenCV build supports it;
+    use estimate_keyframe_interval() on the result to see what was produced.
+    """
+    params = []
+    key_prop = getattr(cv2, "VIDEOWRITER_PROP_KEY_INTERVAL", None)
+    if key_interval and key_prop is not None:
+        params = [key_prop, int(key_interval)]
+
+    writer = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc),
+                             fps, (width, height), params)
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path} ({fourcc})")
+    try:
+        for frame_idx in range(frame_count):
+            writer.write(render_frame(frame_idx, width, height))
+    finally:
+        writer.release()
+    return path
+
+
+class TestPatternCapture:
+    """Stand-in for a live cv2.VideoCapture that generates frames instead of decoding
+
+    Shows a new scene every scene_seconds, each repeated with fresh noise
+    on every frame, for duration_seconds (None runs forever). Like a camera
+    it reports no frame count. grab() is free and retrieve() costs about as
+    much as copying a frame, so benchmarks measure the pipeline, not this.
+    """
+
+    def __init__(self, width=640, height=360, fps=30.0, duration_seconds=None, scene_seconds=10.0,
+                 noise_levels=6, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.duration_seconds = duration_seconds
+        self.scene_seconds = scene_seconds
+        rng = np.random.default_rng(seed)
+        # A small bank of noise frames, cycled, keeps retrieve() cheap
+        self._noise = [rng.integers(0, noise_levels, size=(height, width, 3), dtype=np.uint8) for _ in range(7)]
+        self._position = -1
+        self._scene = None
+        self._scene_frame = None
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def grab(self):
+        if not self._open:
+            return False
+        if self.duration_seconds is not None and (self._position + 1) / self.fps >= self.duration_seconds:
+            return False
+        self._position += 1
+        return True
+
+    def retrieve(self, image=None):
+        if self._position < 0:
+            return False, None
+        scene = int(self._position / self.fps // self.scene_seconds)
+        if scene != self._scene:
+            self._scene = scene
+            self._scene_frame = render_frame(scene * 37, self.width, self.height)
+        if image is not None and image.shape != self._scene_frame.shape:
+            image = None
+        return True, cv2.add(self._scene_frame, self._noise[self._position % len(self._noise)], dst=image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(0, self._position) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self._position + 1
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return 0.0
+
+    def release(self):
+        self._open = False
+
+
+def write_shot_video(path, shots, width=640, height=360, fps=30.0, fourcc="mp4v", noise_levels=6, seed=0):
+    """Write a video made of shots and return the frame index at which each one starts
+
+    shots is a sequence of (kind, seconds): "static" holds one image with
+    fresh noise on every frame, like a slide or an idle camera; "moving"
+    plays the moving gradient of render_frame(). Every shot shows a
+    different image.
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path} ({fourcc})")
+    starts = []
+    frame_idx = 0
+    try:
+        for shot, (kind, seconds) in enumerate(shots):
+            starts.append(frame_idx)
+            for i in range(int(round(seconds * fps))):
+                # Shots are 1000 frames of animation apart, so no two start alike
+                frame = render_frame(shot * 1000 + (i if kind == "moving" else 0), width, height)
+                noise = rng.integers(0, noise_levels, size=frame.shape, dtype=np.uint8)
+                writer.write(cv2.add(frame, noise))
+                frame_idx += 1
+    finally:
+        writer.release()
+    return starts
+
+
+def render_content(content_id, width, height):
+    """A distinct image per content id: a smooth field of random colours, far apart in every hash"""
+    rng = np.random.default_rng(content_id)
+    coarse = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def write_dedup_video(path, width=640, height=360, frame_count=300, fps=30.0, duplicate_ratio=0.5,
+                      noise_level=0, key_interval=None, hold_frames=15, fourcc="mp4v", seed=0):
+    """Write a video with known duplicates and return the content id of every frame
+
+    The video is a run of shots of hold_frames frames, each showing one
+    image. A shot repeats the image of a random earlier shot with
+    probability duplicate_ratio, otherwise it shows a new one. noise_level
+    adds fresh uniform noise of that amplitude (0-255) to every frame, and
+    key_interval sets the GOP size where the OpenCV build supports it.
+    Frames with the same content id are duplicates; ids count up from 0 in
+    order of first appearance.
+    """
+    rng = np.random.default_rng(seed)
+    params = []
+    key_prop = getattr(cv2, "VIDEOWRITER_PROP_KEY_INTERVAL", None)
+    if key_interval and key_prop is not None:
+        params = [key_prop, int(key_interval)]
+    writer = cv2.VideoWriter(str(path), cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height), params)
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path} ({fourcc})")
+    contents = []
+    shown = 0  # Distinct images so far
+    try:
+        while len(contents) < frame_count:
+            if shown and rng.random() < duplicate_ratio:
+                content_id = int(rng.integers(0, shown))
+            else:
+                content_id = shown
+                shown += 1
+            # Images are seeded apart from the noise so the same id always renders the same picture
+            image = render_content(seed * 1000003 + content_id, width, height)
+            for _ in range(min(hold_frames, frame_count - len(contents))):
+                frame = image
+                if noise_level:
+                    frame = cv2.add(image, rng.integers(0, noise_level + 1, size=image.shape, dtype=np.uint8))
+                writer.write(frame)
+                contents.append(content_id)
+    finally:
+        writer.release()
+    return contents
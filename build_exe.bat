@@ -1,5 +1,14 @@
 @echo off
-echo Building DeDupe executable...
+setlocal
+REM Usage: build_exe.bat [onedir]
+REM   onedir: build dist\DeDupe\ (exe plus libraries), which starts faster than the single exe
+if /i "%~1"=="onedir" (
+    set DEDUPE_ONEDIR=1
+    echo Building DeDupe ^(one-folder^)...
+) else (
+    set DEDUPE_ONEDIR=
+    echo Building DeDupe executable...
+)
 echo.
 
 REM Clean previous builds
@@ -12,7 +21,12 @@ python -m PyInstaller --clean DeDupe.spec
 echo.
 echo Build completed!
 echo.
-echo The executable is located in the 'dist' folder.
-echo You can run 'DeDupe.exe' from there.
+if "%DEDUPE_ONEDIR%"=="1" (
+    echo The application is located in the 'dist\DeDupe' folder.
+    echo Run 'DeDupe.exe' from there; keep the folder's other files next to it.
+) else (
+    echo The executable is located in the 'dist' folder.
+    echo You can run 'DeDupe.exe' from there.
+)
 echo.
 pause
@@ -0,0 +1,62 @@
+"""Processing engine for DeDupe, usable without the Tk user interface
+
+The names below are imported from their submodules on first use, so
+importing one submodule (as the GUI and worker processes do) doesn't
+also load every other one.
+"""
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "frame_quality": "best_frame",
+    "BufferPool": "buffer_pool",
+    "EXPORT_FORMATS": "export",
+    "DEFAULT_HASH_ALGORITHM": "frame_hash",
+    "HASH_ALGORITHMS": "frame_hash",
+    "hash_frame": "frame_hash",
+    "hash_frames": "frame_hash",
+    "DECODERS": "frame_source",
+    "FrameSource": "frame_source",
+    "iter_frames": "frame_source",
+    "open_source": "frame_source",
+    "GlobalHashIndex": "global_index",
+    "HashCache": "hash_cache",
+    "HashIndex": "hash_index",
+    "RecentHashWindow": "hash_index",
+    "hamming_distance": "hash_index",
+    "similarity_to_distance": "hash_index",
+    "Job": "jobs",
+    "JobScheduler": "jobs",
+    "Manifest": "manifest",
+    "load_manifest": "manifest",
+    "RunMetrics": "metrics",
+    "ProcessingOptions": "pipeline",
+    "ProcessingStats": "pipeline",
+    "process_regions": "pipeline",
+    "process_video": "pipeline",
+    "PrefilterOptions": "prefilter",
+    "FrameSampler": "sampling",
+    "STRATEGY_AUTO": "sampling",
+    "STRATEGY_SEEK": "sampling",
+    "STRATEGY_SEQUENTIAL": "sampling",
+    "choose_strategy": "sampling",
+    "estimate_keyframe_interval": "sampling",
+    "iter_sampled_frames": "sampling",
+    "resolve_strategy": "sampling",
+    "process_stream": "streaming",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,147 @@
+"""Saving the best frame of each group of near-duplicates instead of the first
+
+A group starts at a frame that matches no kept frame, its anchor. The
+anchor's hash stays the one later frames are matched against, so groups
+and the number of saved frames are exactly those of first-occurrence
+dedup. Every later frame matching the anchor joins its group, and the
+member with the highest frame_quality() so far is held as the group's
+best. A group closes once no member has turned up for a while, or when
+too many are open, and only then is its best frame written, under the
+anchor's output number. Memory is one frame per open group, whatever the
+group's length.
+
+Fed without pixels, over a hash stream and its quality scores, the same
+GroupSelector picks the same frames; the two-pass paths use that to
+decode only the frames that will be saved.
+"""
+import cv2
+import numpy as np
+
+from .frame_hash import hash_plane
+
+# Short side of the plane quality is scored on; point-sampling keeps edges, so blur still shows
+QUALITY_PLANE_SIZE = 360
+
+# Gray levels at or beyond which a pixel counts as clipped to black or white
+CLIP_LOW = 8
+CLIP_HIGH = 247
+
+# Sample intervals without a new member after which a group closes
+DEFAULT_GROUP_GAP = 10
+
+# Groups held open at once; the one idle longest closes to make room
+MAX_OPEN_GROUPS = 16
+
+
+def frame_quality(frame):
+    """Sharpness (variance of the Laplacian) scaled down by the share of clipped pixels; higher is better
+
+    Scored on the same kind of decimated grayscale plane as hashes, in
+    this thread's scratch buffers, so the cost hardly grows with resolution.
+    """
+    gray = hash_plane(frame, QUALITY_PLANE_SIZE, reuse=True)
+    _, deviation = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    clipped = np.count_nonzero((gray <= CLIP_LOW) | (gray >= CLIP_HIGH)) / gray.size
+    return float(deviation[0, 0]) ** 2 * (1.0 - clipped)
+
+
+class _Group:
+    def __init__(self, ordinal, frame_idx, quality, frame):
+        self.ordinal = ordinal  # Output number, the anchor's place among the kept frames
+        self.last_seen = frame_idx
+        self.best_index = frame_idx
+        self.best_quality = quality
+        self.frame = frame  # Pixels of the best frame until they are written, else None
+        self.written_index = None  # Frame on disk under this group's number, if any
+
+
+class GroupSelector:
+    """The open groups of one hash stream, each emitting its best frame when it closes
+
+    Groups are keyed by their anchor's frame index, the payload the hash
+    index returns for matches, and close once gap frames pass without a
+    new member. emit(ordinal, frame_idx, frame) is called whenever a
+    group's best frame needs writing; frame is None when the selector is
+    fed without pixels. Frames offered are copied only if they become a
+    group's best, so the caller's buffers can be reused straight away.
+    """
+
+    def __init__(self, emit, gap, max_open=MAX_OPEN_GROUPS):
+        self.emit = emit
+        self.gap = gap
+        self.max_open = max_open
+        self._open = {}
+
+    def __len__(self):
+        return len(self._open)
+
+    def advance(self, frame_idx):
+        """Close the groups with no member within gap frames before frame_idx"""
+        for anchor in [anchor for anchor, group in self._open.items() if frame_idx - group.last_seen > self.gap]:
+            self._close(anchor)
+
+    def open(self, anchor, ordinal, quality, frame=None):
+        """Start a group at a newly kept frame"""
+        self._open[anchor] = _Group(ordinal, anchor, quality, frame.copy() if frame is not None else None)
+        if len(self._open) > self.max_open:
+            self._close(min(self._open, key=lambda key: self._open[key].last_seen))
+
+    def offer(self, anchor, frame_idx, quality, frame=None):
+        """A frame matching anchor, which becomes its group's best if it scores higher
+
+        Ties keep the earlier frame. Frames whose group has already closed,
+        or never opened here (a duplicate of another video), are ignored.
+        """
+        group = self._open.get(anchor)
+        if group is None:
+            return
+        group.last_seen = frame_idx
+        if quality > group.best_quality:
+            group.best_index = frame_idx
+            group.best_quality = quality
+            group.frame = frame.copy() if frame is not None else None
+
+    def write_open(self):
+        """Emit the open groups' best frames that aren't written yet; the groups stay open
+
+        Called before a checkpoint, so that the checkpoint's frames are all
+        on disk. A better frame turning up later overwrites the file.
+        """
+        for group in self._open.values():
+            self._write(group)
+
+    def close_all(self):
+        for anchor in list(self._open):
+            self._close(anchor)
+
+    def _close(self, anchor):
+        self._write(self._open.pop(anchor))
+
+    def _write(self, group):
+        if group.written_index == group.best_index:
+            return
+        group.written_index = group.best_index
+        frame, group.frame = group.frame, None
+        if self.emit is not None:
+            self.emit(group.ordinal, group.best_index, frame)
+
+
+def select_best(frame_indices, matches, qualities, kept, gap, max_open=MAX_OPEN_GROUPS):
+    """(output number, frame index) of the frame each group saves, for a hash stream already deduplicated
+
+    matches are select_unique()'s results with frame indices as payloads,
+    and kept the frames saved in first-occurrence mode, in order (the
+    unmatched ones, less any dropped as duplicates of other videos).
+    """
+    chosen = []
+    selector = GroupSelector(lambda ordinal, frame_idx, _: chosen.append((ordinal, frame_idx)), gap, max_open)
+    ordinals = {frame_idx: ordinal for ordinal, frame_idx in enumerate(kept)}
+    for frame_idx, match, quality in zip(frame_indices, matches, qualities):
+        selector.advance(frame_idx)
+        if match is None:
+            if frame_idx in ordinals:
+                selector.open(frame_idx, ordinals[frame_idx], quality)
+        else:
+            selector.offer(match, frame_idx, quality)
+    selector.close_all()
+    return chosen
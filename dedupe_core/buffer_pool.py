@@ -0,0 +1,151 @@
+"""Reusable frame buffers with a memory ceiling
+
+Decoding every sample into a fresh array churns through width x height x 3
+bytes per frame (25 MB at 4K), which shows up as allocator pressure and RSS
+spikes. Decoders instead write into buffers borrowed from a BufferPool
+(cv2.VideoCapture.read(image=...)), and a buffer returns to the pool once
+every stage holding it, such as a queued image writer, has released it.
+When the ceiling is reached, decoding waits for a buffer to come back
+instead of allocating, so memory stays bounded.
+"""
+import threading
+
+import numpy as np
+
+# Frame buffer memory allowed per pool; about ten 4K frames or forty 1080p frames
+DEFAULT_POOL_BYTES = 256 * 1024 * 1024
+
+# Buffers always allowed, whatever their size, so decoding can make progress
+MIN_POOL_BUFFERS = 2
+
+
+class FrameBuffer:
+    """An array and the number of stages still using it"""
+
+    def __init__(self, array, pool=None):
+        self.array = array
+        self._pool = pool
+        self._refs = 1
+
+    def retain(self):
+        """Take another reference for a stage that keeps the frame; returns its release callable"""
+        if self._pool is not None:
+            with self._pool._condition:
+                self._refs += 1
+        return self.release
+
+    def release(self):
+        if self._pool is not None:
+            self._pool._release(self)
+
+
+class BufferPool:
+    """Fixed-ceiling pool of same-shaped frame buffers shared by decoder, hasher and writers
+
+    acquire() hands out a free buffer, allocates one while under max_bytes,
+    and otherwise blocks until one is released. Buffers of another shape
+    are dropped when the frame size changes. Thread safe.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self.allocated_bytes = 0
+        self.peak_bytes = 0
+        self._buffers = 0
+        self._free = []
+        self._owners = {}  # id(array) -> FrameBuffer for buffers in use
+        self._condition = threading.Condition()
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A buffer of the given shape with one reference; release() it when done"""
+        shape = tuple(shape)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with self._condition:
+            while True:
+                for i, buffer in enumerate(self._free):
+                    if buffer.array.shape == shape and buffer.array.dtype == dtype:
+                        del self._free[i]
+                        return self._lend(buffer)
+                # Free buffers of another size are no use any more
+                while self._free:
+                    self._drop(self._free.pop())
+                if self._buffers < MIN_POOL_BUFFERS or self.allocated_bytes + nbytes <= self.max_bytes:
+                    self._buffers += 1
+                    self.allocated_bytes += nbytes
+                    self.peak_bytes = max(self.peak_bytes, self.allocated_bytes)
+                    return self._lend(FrameBuffer(np.empty(shape, dtype=dtype), self))
+                self._condition.wait()
+
+    def _lend(self, buffer):
+        buffer._refs = 1
+        self._owners[id(buffer.array)] = buffer
+        return buffer
+
+    def _drop(self, buffer):
+        self._buffers -= 1
+        self.allocated_bytes -= buffer.array.nbytes
+
+    def _release(self, buffer):
+        with self._condition:
+            buffer._refs -= 1
+            if buffer._refs > 0:
+                return
+            self._owners.pop(id(buffer.array), None)
+            self._free.append(buffer)
+            self._condition.notify()
+
+    def retain(self, array):
+        """Take a reference on the pooled buffer behind an array, returning its release callable
+
+        Crops (views) of a pooled array count as the array itself. Returns
+        None for arrays that don't come from this pool; they need no release.
+        """
+        with self._condition:
+            buffer = self._owners.get(id(array))
+            if buffer is None and array.base is not None:
+                buffer = self._owners.get(id(array.base))
+        if buffer is None:
+            return None
+        return buffer.retain()
+
+
+class PooledOutput:
+    """Hands pool buffers to a decoder as output arrays and matches up what comes back
+
+    Call it to get an array for read(image=...)/retrieve(image=...) (None
+    until the frame size is known), then claim() the decoded frame. A
+    decoder that ignores the array, on the first frame or after a size
+    change, gets its frame wrapped in an unpooled FrameBuffer.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.shape = None
+        self._pending = []
+
+    def __call__(self):
+        if self.shape is None:
+            return None
+        buffer = self.pool.acquire(self.shape)
+        self._pending.append(buffer)
+        return buffer.array
+
+    def claim(self, frame):
+        """The FrameBuffer holding a decoded frame; buffers that weren't filled go back to the pool"""
+        claimed = None
+        for buffer in self._pending:
+            if claimed is None and buffer.array is frame:
+                claimed = buffer
+            else:
+                buffer.release()
+        self._pending = []
+        if claimed is None:
+            self.shape = frame.shape  # First frame, or the size changed
+            claimed = FrameBuffer(frame)
+        return claimed
+
+    def discard(self):
+        """Release buffers handed out for reads that failed"""
+        for buffer in self._pending:
+            buffer.release()
+        self._pending = []
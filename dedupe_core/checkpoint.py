@@ -0,0 +1,115 @@
+"""Checkpoints that let an interrupted run carry on where it stopped
+
+While a run works through a video, each output folder periodically gets a
+checkpoint: the hash stream so far, which of its frames were kept, the
+output counters and the position in the video. It is written only after
+the frame writer has flushed, so every frame it counts is on disk, and
+replaced atomically, so a crash leaves the previous checkpoint intact. A
+later run with the same video and settings resumes from it without
+decoding the frames before it again, and ends with the same output as a
+run that was never interrupted. A finished run deletes its checkpoint.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .fileio import write_atomically
+from .hash_cache import content_fingerprint
+
+# Written to each output folder; the leading dot keeps it out of the way of the frames
+CHECKPOINT_FILENAME = ".dedupe_checkpoint.npz"
+
+# Seconds between checkpoints; each waits for the writer queue to drain
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+CHECKPOINT_VERSION = 1
+
+# Output counters restored on resume
+COUNTERS = ("processed_frames", "saved_frames", "prefiltered_frames", "global_duplicates", "bytes_written")
+
+
+def checkpoint_key(video_path, settings):
+    """Key tying a checkpoint to a video file and the settings that shape its output
+
+    None for sources that aren't local files or folders (streams, camera
+    indexes), which are never checkpointed.
+    """
+    try:
+        stat = os.stat(video_path)
+        fingerprint = content_fingerprint(video_path)
+    except (OSError, TypeError, ValueError):
+        return None
+    fields = dict(settings, version=CHECKPOINT_VERSION, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                  fingerprint=fingerprint)
+    encoded = json.dumps(fields, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+
+class Checkpoint:
+    """Where one output folder's run stood when it was last checkpointed
+
+    phase is the pipeline phase it stopped in. While hashing, the stream
+    covers the frames sampled before next_frame and kept flags which of
+    them were saved; schedule holds an adaptive schedule's (step, dense
+    samples left) and reference the pre-filter's last thumbnail. While
+    saving, the stream is complete and counters["saved_frames"] kept
+    frames have been written. qualities are the stream's frame_quality()
+    scores when the run saves the best frame of each group.
+    """
+
+    def __init__(self, key, phase, frame_indices, hashes, kept=None, next_frame=0, counters=None,
+                 schedule=None, reference=None, qualities=None):
+        self.key = key
+        self.phase = phase
+        self.frame_indices = np.asarray(frame_indices, dtype=np.int64)
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.kept = np.asarray(kept if kept is not None else [], dtype=bool)
+        self.next_frame = next_frame
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.counters.update(counters or {})
+        self.schedule = schedule
+        self.reference = reference
+        self.qualities = np.asarray(qualities, dtype=np.float64) if qualities is not None else None
+
+
+def checkpoint_path(output_dir):
+    return Path(output_dir) / CHECKPOINT_FILENAME
+
+
+def load_checkpoint(output_dir, key):
+    """The checkpoint in output_dir if it was written for key, else None"""
+    try:
+        with np.load(checkpoint_path(output_dir)) as data:
+            state = json.loads(str(data["state"]))
+            if state.get("key") != key:
+                return None
+            return Checkpoint(key, state["phase"], data["frame_indices"], data["hashes"], data["kept"],
+                              state["next_frame"], state["counters"], state["schedule"],
+                              data["reference"] if "reference" in data.files else None,
+                              data["qualities"] if "qualities" in data.files else None)
+    except (OSError, ValueError, KeyError, EOFError):
+        return None  # Missing, or left unreadable by something other than DeDupe
+
+
+def save_checkpoint(output_dir, checkpoint):
+    """Write a checkpoint atomically, replacing the previous one"""
+    state = {"key": checkpoint.key, "phase": checkpoint.phase, "next_frame": int(checkpoint.next_frame),
+             "counters": {name: int(value) for name, value in checkpoint.counters.items()},
+             "schedule": list(checkpoint.schedule) if checkpoint.schedule else None}
+    arrays = {"state": np.array(json.dumps(state)), "frame_indices": checkpoint.frame_indices,
+              "hashes": checkpoint.hashes, "kept": checkpoint.kept}
+    if checkpoint.reference is not None:
+        arrays["reference"] = checkpoint.reference
+    if checkpoint.qualities is not None:
+        arrays["qualities"] = checkpoint.qualities
+    write_atomically(checkpoint_path(output_dir), lambda handle: np.savez(handle, **arrays))
+
+
+def remove_checkpoint(output_dir):
+    try:
+        checkpoint_path(output_dir).unlink()
+    except OSError:
+        pass
@@ -0,0 +1,352 @@
+"""Headless batch processing: python -m dedupe_core [options] VIDEO_OR_GLOB ..."""
+import argparse
+import copy
+import cProfile
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .best_frame import DEFAULT_GROUP_GAP
+from .buffer_pool import DEFAULT_POOL_BYTES
+from .checkpoint import CHECKPOINT_FILENAME, DEFAULT_CHECKPOINT_INTERVAL
+from .export import EXPORT_FILENAMES, EXPORT_FORMATS
+from .frame_hash import DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS, HASH_PLANE_SIZE
+from .frame_source import DECODER_AUTO, DECODERS, DEFAULT_PREFETCH
+from .global_index import GlobalHashIndex
+from .hash_cache import DEFAULT_CACHE_SIZE, HashCache, default_cache_dir
+from .hash_index import DEFAULT_WINDOW_FRAMES
+from .manifest import MANIFEST_FILENAME
+from .pipeline import ProcessingOptions, ProcessingStats, process_regions, process_video
+from .prefilter import DEFAULT_CUT_THRESHOLD, DEFAULT_STATIC_THRESHOLD, PrefilterOptions
+from .progress import JsonProgressLog, ProgressReporter, console_sink
+from .sampling import STRATEGIES, STRATEGY_AUTO
+from .streaming import process_stream
+from .writer import DEFAULT_OUTPUT_FORMAT, DEFAULT_QUALITY, DEFAULT_WRITER_THREADS, OUTPUT_FORMATS
+
+DEFAULT_OUTPUT_DIRNAME = "DeDupe_Output"
+
+# Written to each output folder with --metrics
+METRICS_FILENAME = "metrics.json"
+
+
+def parse_region(text):
+    """Parse an "x,y,width,height" ROI argument"""
+    try:
+        x, y, w, h = (int(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ROI must be x,y,width,height, got {text!r}") from None
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError("ROI width and height must be positive")
+    return x, y, w, h
+
+
+def expand_inputs(patterns, file_list=None):
+    """Expand paths and glob patterns into an ordered, de-duplicated list of files"""
+    if file_list:
+        with open(file_list, encoding="utf-8") as handle:
+            patterns = list(patterns) + [line.strip() for line in handle
+                                         if line.strip() and not line.startswith("#")]
+
+    videos = []
+    seen = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = [m for m in sorted(glob.glob(pattern, recursive=True)) if os.path.isfile(m)]
+        else:
+            # Explicit paths are kept even if missing so they get reported as failures
+            matches = [pattern]
+        for match in matches:
+            key = os.path.abspath(match)
+            if key not in seen:
+                seen.add(key)
+                videos.append(match)
+    return videos
+
+
+def plan_output_dirs(videos, output_root=None):
+    """One output directory per video, named after the file and never shared"""
+    planned = []
+    used = set()
+    for video in videos:
+        root = Path(output_root) if output_root else Path(video).parent / DEFAULT_OUTPUT_DIRNAME
+        stem = Path(video).stem
+        candidate = root / stem
+        suffix = 1
+        while str(candidate) in used:
+            suffix += 1
+            candidate = root / f"{stem}_{suffix}"
+        used.add(str(candidate))
+        planned.append(candidate)
+    return planned
+
+
+def run_job(video_path, output_dir, options, show_progress=False, progress_log=None, regions=None,
+            stream=None, metrics=False, profile_path=None, trace_path=None):
+    """Process one video and return a list of stats dicts, one per region; never raises
+
+    With several regions the video is decoded once and each region is saved
+    to its own subfolder. stream, a dict of process_stream() arguments,
+    treats the input as an unbounded stream instead. Progress sinks are
+    created here so they also work inside pool workers. metrics writes each
+    stats dict to METRICS_FILENAME in its output folder; profile_path and
+    trace_path save a cProfile dump and a Chrome trace of the job.
+    """
+    reporter = ProgressReporter(queue_size=None)
+    log = JsonProgressLog(progress_log) if progress_log else None
+    if show_progress:
+        reporter.add_sink(console_sink())
+    if log is not None:
+        reporter.add_sink(log)
+    if trace_path:
+        options = copy.copy(options)
+        options.trace = True
+    profiler = cProfile.Profile() if profile_path else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            if stream is not None:
+                all_stats = [process_stream(video_path, output_dir, options, progress=reporter, **stream)]
+            elif regions and len(regions) > 1:
+                all_stats = process_regions(video_path, output_dir, regions, options, progress=reporter)
+            else:
+                all_stats = [process_video(video_path, output_dir, options, progress=reporter)]
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+        if trace_path:
+            # Regions decoded together share one RunMetrics
+            all_stats[0].metrics.write_trace(trace_path)
+        results = [stats.as_dict() for stats in all_stats]
+        if metrics:
+            for result in results:
+                metrics_dir = Path(result["output_dir"])
+                metrics_dir.mkdir(parents=True, exist_ok=True)
+                with open(metrics_dir / METRICS_FILENAME, "w", encoding="utf-8") as handle:
+                    json.dump(result, handle, indent=2)
+        return results
+    except Exception as e:
+        stats = ProcessingStats(video_path, output_dir)
+        stats.error = str(e)
+        return [stats.as_dict()]
+    finally:
+        if log is not None:
+            log.close()
+
+
+def run_batch(videos, output_root=None, options=None, jobs=1, on_result=None, show_progress=False,
+              progress_log=None, regions=None, stream=None, metrics=False, profile_path=None, trace_path=None):
+    """Process videos with at most `jobs` running at once; return stats in input order
+
+    Several regions give one stats entry per video and region.
+    show_progress prints throttled progress lines to stderr; progress_log
+    appends the same snapshots to a file as JSON lines. profile_path and
+    trace_path apply to the first video only.
+    """
+    options = options or ProcessingOptions()
+    output_dirs = plan_output_dirs(videos, output_root)
+    results = [None] * len(videos)
+
+    def job_args(i):
+        return (show_progress, progress_log, regions, stream, metrics,
+                profile_path if i == 0 else None, trace_path if i == 0 else None)
+
+    if jobs <= 1:
+        for i, (video, output_dir) in enumerate(zip(videos, output_dirs)):
+            results[i] = run_job(video, output_dir, options, *job_args(i))
+            if on_result is not None:
+                for result in results[i]:
+                    on_result(result)
+        return [result for video_results in results for result in video_results]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(run_job, video, output_dir, options, *job_args(i)): i
+            for i, (video, output_dir) in enumerate(zip(videos, output_dirs))
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result is not None:
+                for result in results[futures[future]]:
+                    on_result(result)
+    return [result for video_results in results for result in video_results]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m dedupe_core",
+        description="Extract unique frames from videos without a display.")
+    parser.add_argument("inputs", nargs="*",
+                        help="video files, image-sequence folders or glob patterns (quote globs, ** recurses)")
+    parser.add_argument("--file-list", help="text file with one video path or glob per line")
+    parser.add_argument("-o", "--output-dir",
+                        help=f"root for per-video output folders (default: <video dir>/{DEFAULT_OUTPUT_DIRNAME})")
+    parser.add_argument("--fps", type=float, default=30, help="frames per second to extract (default: 30)")
+    parser.add_argument("--threshold", type=float, default=95.0,
+                        help="similarity threshold in percent (default: 95)")
+    parser.add_argument("--roi", type=parse_region, action="append",
+                        help="only process this region: x,y,width,height; repeat to extract several "
+                             "regions in one decoding pass, each into its own subfolder")
+    parser.add_argument("--hash-algorithm", choices=HASH_ALGORITHMS, default=DEFAULT_HASH_ALGORITHM)
+    parser.add_argument("--full-res-hash", action="store_true",
+                        help=f"hash full-resolution frames instead of a ~{HASH_PLANE_SIZE} px plane (slower on HD/4K)")
+    parser.add_argument("--sampling", choices=STRATEGIES, default=STRATEGY_AUTO,
+                        help="seek per sample, decode sequentially, or choose automatically")
+    parser.add_argument("--decoder", choices=DECODERS, default=DECODER_AUTO,
+                        help="OpenCV, PyAV (pip install av) or an image folder; auto reads folders as images "
+                             "and files with OpenCV")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH,
+                        help=f"frames decoded ahead on a background thread, 0 to decode inline "
+                             f"(default: {DEFAULT_PREFETCH})")
+    parser.add_argument("--buffer-pool-mb", type=int, default=DEFAULT_POOL_BYTES // (1024 * 1024),
+                        help="memory for reused frame buffers per video; decoding waits when it is full, "
+                             f"0 allocates every frame (default: {DEFAULT_POOL_BYTES // (1024 * 1024)})")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="videos processed concurrently (default: 1)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="decoder processes per video (default: 1)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT,
+                        help="image format for saved frames (default: jpg)")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                        help=f"JPEG/WebP quality, 1-100 (default: {DEFAULT_QUALITY})")
+    parser.add_argument("--writer-threads", type=int, default=DEFAULT_WRITER_THREADS,
+                        help=f"image encoder threads per video (default: {DEFAULT_WRITER_THREADS})")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="hash and dedup only; report what would be saved without writing frames")
+    parser.add_argument("--cache-dir", help=f"hash cache directory (default: {default_cache_dir()})")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help="evict least recently used cache entries above this size")
+    parser.add_argument("--no-cache", action="store_true", help="always decode; don't read or write the hash cache")
+    parser.add_argument("--global-index", metavar="DB",
+                        help="SQLite file of frames kept from earlier videos; frames repeating them are dropped "
+                             "and new ones are added (shared safely by --jobs and concurrent runs)")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="skip frames that barely differ from the last hashed one, without hashing them")
+    parser.add_argument("--adaptive-sampling", action="store_true",
+                        help="with --prefilter: sample sparsely through static stretches and densely after "
+                             "cuts (may miss changes shorter than 4 sample intervals)")
+    parser.add_argument("--static-threshold", type=float, default=DEFAULT_STATIC_THRESHOLD,
+                        help="--prefilter: mean pixel difference (0-255) below which a frame is unchanged "
+                             f"(default: {DEFAULT_STATIC_THRESHOLD})")
+    parser.add_argument("--cut-threshold", type=float, default=DEFAULT_CUT_THRESHOLD,
+                        help="--prefilter: mean pixel difference above which a frame starts a new scene "
+                             f"(default: {DEFAULT_CUT_THRESHOLD})")
+    parser.add_argument("--best-frame", action="store_true",
+                        help="save the sharpest, best-exposed frame of each group of duplicates instead of the "
+                             "first (same number of frames; each is written once its group ends)")
+    parser.add_argument("--group-gap", type=int, default=DEFAULT_GROUP_GAP,
+                        help="--best-frame: sample intervals without a duplicate after which a group ends "
+                             f"(default: {DEFAULT_GROUP_GAP})")
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help=f"seconds between progress checkpoints ({CHECKPOINT_FILENAME} in each output folder), "
+                             f"0 to never checkpoint (default: {DEFAULT_CHECKPOINT_INTERVAL:g})")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="start over even if the output folder has a checkpoint from an interrupted run "
+                             "with the same video and settings")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help=f"don't write {MANIFEST_FILENAME} (source frame, timestamp, hash and duplicate link of "
+                             "every hashed frame) to each output folder")
+    parser.add_argument("--export", choices=EXPORT_FORMATS,
+                        help="write no images, only the unique frames as an ffmpeg select filter script "
+                             f"({EXPORT_FILENAMES['select']}), an ffconcat list ({EXPORT_FILENAMES['concat']}) "
+                             f"or one packed video ({EXPORT_FILENAMES['video']})")
+    parser.add_argument("--stream", action="store_true",
+                        help="treat inputs as live sources (camera index, RTSP/HTTP URL or file) and dedup "
+                             "against a window of recent frames, with constant memory and no known length")
+    parser.add_argument("--window-frames", type=int, default=DEFAULT_WINDOW_FRAMES,
+                        help="--stream: compare with this many recently kept frames "
+                             f"(default: {DEFAULT_WINDOW_FRAMES})")
+    parser.add_argument("--window-seconds", type=float,
+                        help="--stream: only compare with frames kept in this many seconds of stream time")
+    parser.add_argument("--max-seconds", type=float, help="--stream: stop after this much stream time")
+    parser.add_argument("--progress", action="store_true",
+                        help="print progress to stderr (at most 10 updates per second per video)")
+    parser.add_argument("--progress-log", help="append progress snapshots to this file as JSON lines")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"write each run's stats with per-stage timings (p50/p99 ms), queue depths and "
+                             f"throughput to {METRICS_FILENAME} in its output folder")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="save a cProfile dump of the first input's job (open with pstats or snakeviz)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="save a Chrome trace of the first input's stages (chrome://tracing or Perfetto)")
+    parser.add_argument("--stats-format", choices=("json", "jsonl"), default="json",
+                        help="per-file stats printed to stdout at the end (default: json)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        # Sources may be URLs or device indices, so nothing is globbed
+        videos = list(args.inputs)
+    else:
+        videos = expand_inputs(args.inputs, args.file_list)
+    if not videos:
+        parser.error("no input videos found")
+    if args.jobs < 1 or args.workers < 1 or args.writer_threads < 1:
+        parser.error("--jobs, --workers and --writer-threads must be at least 1")
+    if args.prefetch < 0 or args.buffer_pool_mb < 0 or args.checkpoint_interval < 0:
+        parser.error("--prefetch, --buffer-pool-mb and --checkpoint-interval must not be negative")
+    if not 1 <= args.quality <= 100:
+        parser.error("--quality must be between 1 and 100")
+
+    if args.adaptive_sampling and not args.prefilter:
+        parser.error("--adaptive-sampling requires --prefilter")
+    if args.group_gap < 1:
+        parser.error("--group-gap must be at least 1")
+
+    hash_cache = None
+    if not args.no_cache:
+        hash_cache = HashCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+    # Repeated regions would share an output folder
+    regions = list(dict.fromkeys(args.roi or []))
+    options = ProcessingOptions(fps=args.fps, similarity=args.threshold, region=regions[0] if regions else None,
+                                hash_algorithm=args.hash_algorithm, workers=args.workers,
+                                sampling_strategy=args.sampling, image_format=args.format,
+                                quality=args.quality, writer_threads=args.writer_threads,
+                                dry_run=args.dry_run, hash_cache=hash_cache,
+                                hash_plane_size=0 if args.full_res_hash else HASH_PLANE_SIZE,
+                                decoder=args.decoder, prefetch=args.prefetch,
+                                buffer_pool_bytes=args.buffer_pool_mb * 1024 * 1024,
+                                checkpoint_interval=args.checkpoint_interval, resume=not args.no_resume,
+                                best_frame=args.best_frame, group_gap=args.group_gap, manifest=not args.no_manifest,
+                                export=args.export,
+                                global_index=GlobalHashIndex(args.global_index) if args.global_index else None)
+    if args.prefilter:
+        options.prefilter = PrefilterOptions(args.static_threshold, args.cut_threshold, args.adaptive_sampling)
+
+    stream = None
+    if args.stream:
+        if len(regions) > 1:
+            parser.error("--stream supports a single --roi")
+        if args.best_frame or args.export:
+            parser.error("--best-frame and --export don't apply to --stream")
+        if args.window_frames < 1:
+            parser.error("--window-frames must be at least 1")
+        stream = {"window_frames": args.window_frames, "window_seconds": args.window_seconds,
+                  "max_seconds": args.max_seconds}
+
+    def report(result):
+        status = "error: " + result["error"] if result["error"] else f"{result['saved_frames']} frames saved"
+        label = result["video_path"]
+        if len(regions) > 1 and result["region"]:
+            label += " roi " + ",".join(str(v) for v in result["region"] or ())
+        if options.prefilter is not None and not result["error"]:
+            status += " (pruned " + ", ".join(f"{stage} {count}" for stage, count in result["pruned"].items()) + ")"
+        print(f"{label}: {status}", file=sys.stderr)
+
+    results = run_batch(videos, args.output_dir, options, args.jobs, on_result=report,
+                        show_progress=args.progress, progress_log=args.progress_log, regions=regions,
+                        stream=stream, metrics=args.metrics, profile_path=args.profile, trace_path=args.trace)
+
+    if args.stats_format == "jsonl":
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print(json.dumps(results, indent=2))
+    return 1 if any(result["error"] for result in results) else 0
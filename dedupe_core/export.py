@@ -0,0 +1,164 @@
+"""Hash-only output: the kept frames as a list for ffmpeg, or packed into one video
+
+Instead of encoding every unique frame to its own image file, an export
+run only decodes and deduplicates, then writes one file to the output
+folder describing the frames it would have saved, in the order they
+would have been numbered:
+
+- EXPORT_SELECT: an ffmpeg filter script selecting the frames by index,
+  for ffmpeg -i VIDEO -filter_script:v select.txt -fps_mode vfr frame_%06d.png
+- EXPORT_CONCAT: an ffconcat list with an inpoint/outpoint per frame, for
+  ffmpeg -f concat -safe 0 -i frames.ffconcat ...; frame-exact only with
+  intra-frame codecs (MJPEG, ProRes and the like), since ffmpeg decodes
+  each entry from the keyframe before its inpoint and may pass on frames
+  from there
+- EXPORT_VIDEO: the frames themselves, one after another in a single
+  video written with cv2.VideoWriter, so thousands of small files become
+  one sequential stream. Single-process runs encode it during the
+  decoding pass; otherwise the frames are decoded again at the end
+
+Timestamps are frame index / video fps, as in the run manifest.
+"""
+import os
+import time
+from pathlib import Path
+
+import cv2
+
+from .fileio import write_atomically
+from .metrics import STAGE_ENCODE
+from .writer import DEFAULT_QUEUE_SIZE, FrameWriter
+
+EXPORT_SELECT = "select"
+EXPORT_CONCAT = "concat"
+EXPORT_VIDEO = "video"
+EXPORT_FORMATS = (EXPORT_SELECT, EXPORT_CONCAT, EXPORT_VIDEO)
+
+# File each export writes to the output folder
+EXPORT_FILENAMES = {
+    EXPORT_SELECT: "select.txt",
+    EXPORT_CONCAT: "frames.ffconcat",
+    EXPORT_VIDEO: "unique.avi",
+}
+
+# Codec of packed videos: every frame is a keyframe, so any one can be seeked to exactly, and it encodes
+# faster than mp4v; OpenCV's FFmpeg backend always has it, unlike H.264
+VIDEO_FOURCC = "MJPG"
+
+
+def export_path(output_dir, export):
+    return Path(output_dir) / EXPORT_FILENAMES[export]
+
+
+def select_expression(frame_indices):
+    """ffmpeg select filter picking exactly these frames, commas escaped for a filtergraph"""
+    if not frame_indices:
+        return "select=0"
+    return "select=" + "+".join(f"eq(n\\,{frame_idx})" for frame_idx in frame_indices)
+
+
+def concat_script(video_path, frame_indices, video_fps):
+    """ffconcat list with one single-frame entry per frame"""
+    quoted = str(Path(video_path).resolve()).replace("'", "'\\''")
+    lines = ["ffconcat version 1.0"]
+    for frame_idx in frame_indices:
+        lines += [f"file '{quoted}'", f"inpoint {frame_idx / video_fps:.6f}",
+                  f"outpoint {(frame_idx + 1) / video_fps:.6f}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_frame_list(output_dir, export, video_path, frame_indices, video_fps):
+    """Write a select or concat export atomically; returns its size in bytes"""
+    if export == EXPORT_SELECT:
+        text = select_expression(frame_indices) + "\n"
+    elif export == EXPORT_CONCAT:
+        if not video_fps > 0:
+            raise ValueError(f"A concat export needs the video's frame rate, which {video_path} doesn't report")
+        text = concat_script(video_path, frame_indices, video_fps)
+    else:
+        raise ValueError(f"Not a frame list export: {export}")
+    data = text.encode("utf-8")
+    write_atomically(export_path(output_dir, export), lambda handle: handle.write(data))
+    return len(data)
+
+
+class VideoExport:
+    """Frames appended in order to one packed video, which only replaces export_path() once committed
+
+    The video is opened at the size of the first frame; its frame rate is
+    only playback speed. Until commit() it is a hidden partial file, which
+    the next export to the same folder overwrites.
+    """
+
+    def __init__(self, output_dir, fps, metrics=None):
+        self.path = export_path(output_dir, EXPORT_VIDEO)
+        # Same extension, so the backend picks the same container
+        self.partial_path = self.path.with_name(".partial_" + self.path.name)
+        self.fps = fps
+        self.metrics = metrics
+        self.frames_written = 0
+        self._writer = None
+
+    def write(self, frame):
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._writer = cv2.VideoWriter(str(self.partial_path), cv2.CAP_FFMPEG,
+                                           cv2.VideoWriter_fourcc(*VIDEO_FOURCC), self.fps, (width, height))
+            if not self._writer.isOpened():
+                raise IOError(f"Could not open video writer for {self.path}")
+        start = time.perf_counter()
+        self._writer.write(frame)
+        if self.metrics is not None:
+            self.metrics.record(STAGE_ENCODE, start)
+        self.frames_written += 1
+
+    def release(self):
+        """Finish encoding; the video stays a partial file"""
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def commit(self):
+        """Move the finished video into place; returns its size in bytes, 0 if no frame was written"""
+        self.release()
+        if not self.frames_written:
+            return 0
+        os.replace(self.partial_path, self.path)
+        return os.path.getsize(self.path)
+
+    def discard(self):
+        self.release()
+        try:
+            os.remove(self.partial_path)
+        except OSError:
+            pass
+
+    def close(self, keep=True):
+        """Commit the video, or discard it; returns the bytes kept"""
+        if keep:
+            return self.commit()
+        self.discard()
+        return 0
+
+
+class PackedVideoWriter(FrameWriter):
+    """FrameWriter appending the frames submitted to a VideoExport instead of writing image files
+
+    A single encoder thread keeps the frames in the order they were
+    submitted; paths are ignored. close() leaves the video uncommitted, so
+    a run decides afterwards whether it is complete.
+    """
+
+    def __init__(self, output_dir, fps, queue_size=DEFAULT_QUEUE_SIZE, metrics=None):
+        self.export = VideoExport(output_dir, fps, metrics)
+        super().__init__(threads=1, queue_size=queue_size, metrics=metrics)
+
+    def _write(self, path, frame):
+        self.export.write(frame)
+        return 0
+
+    def close(self, raise_errors=True):
+        try:
+            super().close(raise_errors)
+        finally:
+            self.export.release()
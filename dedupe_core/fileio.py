@@ -0,0 +1,46 @@
+"""Files replaced atomically, so readers see either the old version or the new one, never a partial write"""
+import os
+from pathlib import Path
+
+# Without O_BINARY, Windows would translate line endings in the binary files written here
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
+def _create_temp(directory, name):
+    """Open a new temporary file in directory; returns (fd, path)
+
+    Created with mode 0666 so the kernel applies the process umask, as for
+    any file opened for writing; tempfile.mkstemp() would make it 0600.
+    """
+    while True:
+        path = os.path.join(directory, f".{name}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(path, _TEMP_FLAGS, 0o666), path
+        except FileExistsError:
+            continue
+
+
+def write_atomically(path, write):
+    """Call write(handle) on a temporary file next to path, then rename it over path
+
+    The result keeps the permissions of the file it replaces, or gets those
+    of any new file under the process umask.
+    """
+    path = Path(path)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except OSError:
+        mode = None
+    fd, tmp_path = _create_temp(path.parent, path.name)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            write(handle)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
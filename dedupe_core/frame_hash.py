@@ -0,0 +1,170 @@
+"""Batched 64-bit perceptual hashes for stacks of video frames
+
+All algorithms take an N×H×W grayscale or N×H×W×3 BGR stack (or a list of
+such frames) and return an array of N uint64 hashes. Bit k of a hash is element k of the row-major 8×8
+bit grid, matching the original DeDupeApp.calculate_frame_hash loop.
+
+Large frames are first point-sampled down to a hash plane of about
+HASH_PLANE_SIZE pixels on the short side and converted to grayscale
+there, so the cost of hashing stays flat from 720p to 4K. Pass
+plane_size=0 to hash from the full-resolution frame instead. Those
+intermediate planes live in per-thread scratch buffers, so hashing a
+stream of same-sized frames allocates nothing per frame.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+ALGORITHM_AVERAGE = "average"
+ALGORITHM_DHASH = "dhash"
+ALGORITHM_PHASH = "phash"
+ALGORITHM_WHASH = "whash"
+HASH_ALGORITHMS = (ALGORITHM_AVERAGE, ALGORITHM_DHASH, ALGORITHM_PHASH, ALGORITHM_WHASH)
+DEFAULT_HASH_ALGORITHM = ALGORITHM_AVERAGE
+
+HASH_SIZE = 8
+
+# pHash works on the low frequencies of a 32×32 DCT
+PHASH_IMAGE_SIZE = 32
+
+# wHash decomposes a 64×64 image down to an 8×8 Haar LL band
+WHASH_IMAGE_SIZE = 64
+
+# Minimum short side of the grayscale plane hashes are computed from; well
+# above the largest thumbnail (64 px) so the final resize still averages
+HASH_PLANE_SIZE = 256
+
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II basis, so a 2-D DCT is M @ X @ M.T"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2.0 * size))
+    matrix[0] *= np.sqrt(1.0 / size)
+    matrix[1:] *= np.sqrt(2.0 / size)
+    return matrix
+
+
+_DCT_LOW = _dct_matrix(PHASH_IMAGE_SIZE)[:HASH_SIZE]
+
+# Per-thread intermediate planes, reused while the frame size stays the same
+_scratch = threading.local()
+
+
+def _scratch_buffer(name, shape, dtype=np.uint8):
+    """This thread's scratch array called name, reallocated only when the shape changes"""
+    buffer = getattr(_scratch, name, None)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = np.empty(shape, dtype=dtype)
+        setattr(_scratch, name, buffer)
+    return buffer
+
+
+def pack_hashes(bits):
+    """Pack an N×64 boolean array into N uint64 values, bit k = column k"""
+    bits = np.ascontiguousarray(bits, dtype=bool).reshape(len(bits), HASH_SIZE * HASH_SIZE)
+    packed = np.packbits(bits, axis=1, bitorder="little")
+    return packed.view("<u8").reshape(-1).astype(np.uint64)
+
+
+def hash_plane(frame, plane_size=HASH_PLANE_SIZE, reuse=False):
+    """Grayscale plane of a frame, decimated by an integer factor to about plane_size
+
+    Nearest-neighbour decimation by a whole factor only touches the pixels
+    it keeps, so unlike a full-frame cvtColor its cost hardly grows with
+    resolution. Frames already smaller than twice plane_size, and every
+    frame when plane_size is 0, are only converted to grayscale.
+
+    With reuse=True the result is written to this thread's scratch buffers
+    and is only valid until its next reuse call.
+    """
+    height, width = frame.shape[:2]
+    factor = min(height, width) // plane_size if plane_size else 0
+    if factor >= 2:
+        size = (width // factor, height // factor)
+        dst = _scratch_buffer("decimated", (size[1], size[0]) + frame.shape[2:], frame.dtype) if reuse else None
+        frame = cv2.resize(frame, size, dst=dst, interpolation=cv2.INTER_NEAREST)
+    if frame.ndim == 3:
+        dst = _scratch_buffer("gray", frame.shape[:2], frame.dtype) if reuse else None
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=dst)
+    return frame
+
+
+def _thumbnails(frames, size, interpolation=cv2.INTER_LINEAR, dtype=np.uint8,
+                plane_size=HASH_PLANE_SIZE):
+    """Grayscale and resize every frame of a stack to size=(width, height)
+
+    Frames are reduced one at a time through scratch planes, and uint8
+    thumbnails are resized straight into the output, so only the N×h×w
+    result is allocated.
+    """
+    width, height = size
+    out = np.empty((len(frames), height, width), dtype=dtype)
+    for i, frame in enumerate(frames):
+        plane = hash_plane(frame, plane_size, reuse=True)
+        if plane.dtype == out.dtype:
+            cv2.resize(plane, size, dst=out[i], interpolation=interpolation)
+        else:
+            out[i] = cv2.resize(plane, size, interpolation=interpolation)
+    return out
+
+
+def average_hash(frames, plane_size=HASH_PLANE_SIZE):
+    """Mean-threshold hash of an 8×8 bilinear thumbnail (the original DeDupe hash)"""
+    small = _thumbnails(frames, (HASH_SIZE, HASH_SIZE), plane_size=plane_size).reshape(len(frames), -1)
+    means = small.mean(axis=1, keepdims=True)
+    return pack_hashes(small > means)
+
+
+def difference_hash(frames, plane_size=HASH_PLANE_SIZE):
+    """dHash: whether each pixel is brighter than its left neighbour on a 9×8 thumbnail"""
+    small = _thumbnails(frames, (HASH_SIZE + 1, HASH_SIZE), cv2.INTER_AREA, plane_size=plane_size)
+    return pack_hashes(small[:, :, 1:] > small[:, :, :-1])
+
+
+def perceptual_hash(frames, plane_size=HASH_PLANE_SIZE):
+    """pHash: median-threshold of the 8×8 lowest DCT frequencies of a 32×32 thumbnail"""
+    small = _thumbnails(frames, (PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE), cv2.INTER_AREA,
+                          dtype=np.float64, plane_size=plane_size)
+    low = (_DCT_LOW @ small @ _DCT_LOW.T).reshape(len(frames), -1)
+    medians = np.median(low, axis=1, keepdims=True)
+    return pack_hashes(low > medians)
+
+
+def wavelet_hash(frames, plane_size=HASH_PLANE_SIZE):
+    """wHash: median-threshold of the Haar LL band after decomposing 64×64 to 8×8"""
+    small = _thumbnails(frames, (WHASH_IMAGE_SIZE, WHASH_IMAGE_SIZE), cv2.INTER_AREA,
+                          dtype=np.float64, plane_size=plane_size)
+    # Each Haar level's LL band is the 2×2 block average of the previous one
+    block = WHASH_IMAGE_SIZE // HASH_SIZE
+    ll = small.reshape(len(frames), HASH_SIZE, block, HASH_SIZE, block).mean(axis=(2, 4))
+    ll = ll.reshape(len(frames), -1)
+    medians = np.median(ll, axis=1, keepdims=True)
+    return pack_hashes(ll > medians)
+
+
+_HASH_FUNCTIONS = {
+    ALGORITHM_AVERAGE: average_hash,
+    ALGORITHM_DHASH: difference_hash,
+    ALGORITHM_PHASH: perceptual_hash,
+    ALGORITHM_WHASH: wavelet_hash,
+}
+
+
+def hash_frames(frames, algorithm=DEFAULT_HASH_ALGORITHM, plane_size=HASH_PLANE_SIZE):
+    """Hash a stack (or list) of frames, returning an array of uint64 hashes"""
+    try:
+        hash_function = _HASH_FUNCTIONS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown hash algorithm: {algorithm}") from None
+    if len(frames) == 0:
+        return np.empty(0, dtype=np.uint64)
+    first = np.asarray(frames[0])
+    if first.ndim not in (2, 3) or (first.ndim == 3 and first.shape[2] != 3):
+        raise ValueError(f"Expected grayscale or BGR frames, got shape {first.shape}")
+    return hash_function(frames, plane_size)
+
+
+def hash_frame(frame, algorithm=DEFAULT_HASH_ALGORITHM, plane_size=HASH_PLANE_SIZE):
+    """Hash a single BGR or grayscale frame, returning a Python int"""
+    return int(hash_frames([frame], algorithm, plane_size)[0])
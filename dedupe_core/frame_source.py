@@ -0,0 +1,466 @@
+"""Frame sources: one decode path for the pipeline, workers, streams and the GUI preview
+
+Every decoder is exposed through the cv2.VideoCapture interface (isOpened,
+grab, retrieve, read, get, set, release), so the sampling strategies work
+unchanged on any of them:
+
+- opencv: cv2.VideoCapture, for files, URLs and camera indexes
+- pyav: PyAV with FFmpeg's frame and slice threading (optional, pip install av)
+- images: a directory of numbered images, such as an earlier DeDupe output
+
+iter_frames() yields (index, timestamp, frame) lazily, optionally decoding
+a few frames ahead on a background thread. FrameSource keeps one handle
+open for everything that reads the same video and closes it when told to.
+"""
+import os
+import queue
+import re
+import threading
+from pathlib import Path
+
+import cv2
+
+from .buffer_pool import PooledOutput
+from .sampling import STRATEGY_SEQUENTIAL, iter_sampled_frames
+
+DECODER_AUTO = "auto"
+DECODER_OPENCV = "opencv"
+DECODER_PYAV = "pyav"
+DECODER_IMAGES = "images"
+DECODERS = (DECODER_AUTO, DECODER_OPENCV, DECODER_PYAV, DECODER_IMAGES)
+
+# Frames decoded ahead of the consumer by iter_frames(); overlaps decoding with hashing on multi-core machines
+DEFAULT_PREFETCH = 4
+
+# Files read as frames of an image sequence
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+# Frame rate reported for image sequences, which don't carry one
+DEFAULT_SEQUENCE_FPS = 30.0
+
+# Four-character code reported for image sequences; listed in sampling.INTRA_ONLY_CODECS
+IMAGE_SEQUENCE_FOURCC = "IMGS"
+
+# Not every OpenCV build exposes keyframe flags
+_CAP_PROP_KEY_FRAME = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+
+# PyAV codec names whose stream carries no usable four-character tag
+_PYAV_CODEC_FOURCC = {"mjpeg": "MJPG", "png": "png ", "rawvideo": "I420", "ffvhuff": "FFVH", "huffyuv": "HFYU"}
+
+
+def _fourcc(code):
+    return cv2.VideoWriter_fourcc(*code) if len(code) == 4 else 0
+
+
+def _into(image, frame):
+    """Copy a decoded frame into the caller's output array when it fits, as cv2 read(image=...) does"""
+    if frame is None or image is None or image.shape != frame.shape or image.dtype != frame.dtype:
+        return frame
+    image[...] = frame
+    return image
+
+
+def _natural_key(path):
+    """Sort frame_2.png before frame_10.png"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", path.name)]
+
+
+class ImageSequenceCapture:
+    """Capture over the images of a directory, in natural filename order"""
+
+    def __init__(self, directory, fps=DEFAULT_SEQUENCE_FPS):
+        directory = Path(directory)
+        self._paths = []
+        if directory.is_dir():
+            self._paths = sorted((path for path in directory.iterdir()
+                                  if path.suffix.lower() in IMAGE_EXTENSIONS), key=_natural_key)
+        self.fps = fps
+        self._position = -1  # Index of the grabbed image
+        self._size = None
+
+    def isOpened(self):
+        return self._paths is not None and bool(self._paths)
+
+    def grab(self):
+        if not self.isOpened() or self._position + 1 >= len(self._paths):
+            return False
+        self._position += 1
+        return True
+
+    def retrieve(self, image=None):
+        if self._position < 0:
+            return False, None
+        frame = cv2.imread(str(self._paths[self._position]), cv2.IMREAD_COLOR)
+        return frame is not None, _into(image, frame)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def _frame_size(self):
+        if self._size is None:
+            frame = cv2.imread(str(self._paths[0]), cv2.IMREAD_COLOR) if self.isOpened() else None
+            self._size = (frame.shape[1], frame.shape[0]) if frame is not None else (0, 0)
+        return self._size
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self._paths or ()))
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position + 1)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(0, self._position) * 1000.0 / self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._frame_size()[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._frame_size()[1])
+        if prop == cv2.CAP_PROP_FOURCC:
+            return float(_fourcc(IMAGE_SEQUENCE_FOURCC))
+        return 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        # Every image is a keyframe, so positioning is free
+        self._position = min(max(0, int(value)), len(self._paths or ())) - 1
+        return True
+
+    def release(self):
+        self._paths = None
+
+
+def _import_pyav():
+    """PyAV, imported on first use: it is optional and slow to import"""
+    try:
+        import av
+    except ImportError:
+        raise ImportError("The pyav decoder needs PyAV: pip install av") from None
+    return av
+
+
+class PyAVCapture:
+    """Capture backed by PyAV, decoding with FFmpeg's own worker threads
+
+    threads=0 lets FFmpeg pick a thread count. Frame indices are derived
+    from presentation timestamps, so positions stay exact after a seek.
+    """
+
+    def __init__(self, path, threads=0):
+        self._av = _import_pyav()
+        self._container = self._av.open(str(path))
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"  # Frame and slice threading
+        self._stream.thread_count = threads
+        rate = self._stream.average_rate or self._stream.guessed_rate
+        self._fps = float(rate) if rate else 0.0
+        self._start_pts = self._stream.start_time or 0
+        self._decoded = None  # Decoding iterator, restarted by seeks
+        self._pending = None  # Frame decoded while seeking, returned by the next grab()
+        self._frame = None  # Last grabbed av.VideoFrame
+        self._position = 0  # Index of the frame the next grab() returns
+
+    def isOpened(self):
+        return self._container is not None
+
+    def _next_frame(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return frame
+        if self._decoded is None:
+            self._decoded = self._container.decode(self._stream)
+        try:
+            return next(self._decoded)
+        except (StopIteration, self._av.error.EOFError):
+            return None
+
+    def _index_of(self, frame):
+        if frame.pts is None or not self._fps:
+            return self._position
+        return int(round(float((frame.pts - self._start_pts) * self._stream.time_base) * self._fps))
+
+    def grab(self):
+        if self._container is None:
+            return False
+        frame = self._next_frame()
+        if frame is None:
+            return False
+        self._frame = frame
+        self._position = self._index_of(frame) + 1
+        return True
+
+    def retrieve(self, image=None):
+        if self._frame is None:
+            return False, None
+        return True, _into(image, self._frame.to_ndarray(format="bgr24"))
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        context = self._stream.codec_context
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self._stream.frames:
+                return float(self._stream.frames)
+            if self._stream.duration and self._fps:
+                return float(int(self._stream.duration * self._stream.time_base * self._fps))
+            return 0.0
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            if self._frame is None or self._frame.pts is None:
+                return 0.0
+            return float((self._frame.pts - self._start_pts) * self._stream.time_base) * 1000.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(context.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(context.height)
+        if prop == cv2.CAP_PROP_FOURCC:
+            tag = _PYAV_CODEC_FOURCC.get(context.name) or context.codec_tag or ""
+            return float(_fourcc(tag))
+        if _CAP_PROP_KEY_FRAME is not None and prop == _CAP_PROP_KEY_FRAME:
+            return 1.0 if self._frame is not None and getattr(self._frame, "key_frame", False) else 0.0
+        return 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES or self._container is None:
+            return False
+        target = max(0, int(value))
+        if target == self._position:
+            return True
+        # Land on the keyframe at or before the target, then decode forward to it
+        seconds = target / self._fps if self._fps else 0.0
+        self._container.seek(self._start_pts + int(seconds / self._stream.time_base), backward=True,
+                             any_frame=False, stream=self._stream)
+        self._decoded = None
+        self._pending = None
+        self._frame = None
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            if self._index_of(frame) >= target:
+                self._pending = frame
+                break
+        self._position = target
+        return True
+
+    def release(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def open_source(source, decoder=DECODER_AUTO):
+    """Open a capture for a path, URL, camera index or image directory, or pass a capture object through
+
+    Anything with the cv2.VideoCapture grab/retrieve/get/release interface
+    is accepted as is, such as a test-pattern stand-in for a camera; its
+    read() and retrieve() must accept an image= output array, which they
+    may ignore.
+    DECODER_AUTO reads directories as image sequences and everything else
+    with OpenCV.
+    """
+    if hasattr(source, "grab") and hasattr(source, "retrieve"):
+        return source
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder}")
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)  # Camera index, as on the command line
+    if decoder == DECODER_IMAGES or (decoder == DECODER_AUTO and not isinstance(source, int)
+                                     and os.path.isdir(source)):
+        return ImageSequenceCapture(source)
+    if decoder == DECODER_PYAV:
+        return PyAVCapture(source)
+    return cv2.VideoCapture(source if isinstance(source, int) else str(source))
+
+
+class _Failure:
+    """An exception raised on the prefetch thread, re-raised in the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+_END = object()
+
+
+def prefetched(iterator, depth=DEFAULT_PREFETCH, discard=None):
+    """Yield from an iterator that runs up to `depth` items ahead on a background thread
+
+    Closing the returned generator (or finishing it) stops and joins the
+    thread before returning, so the capture underneath can be released
+    straight away. discard, if given, is called on every item that was
+    produced but never yielded.
+    """
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    if discard is not None:
+                        discard(item)
+                    return
+            put(_END)
+        except BaseException as error:
+            put(_Failure(error))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="frame-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+        if discard is not None:
+            while True:
+                try:
+                    item = items.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _END and not isinstance(item, _Failure):
+                    discard(item)
+
+
+def _borrowed(buffers):
+    """Yield (frame_idx, timestamp, array) from (frame_idx, timestamp, FrameBuffer), releasing each on resume"""
+    held = None
+    try:
+        for frame_idx, timestamp, buffer in buffers:
+            held = buffer
+            yield frame_idx, timestamp, buffer.array
+            held = None
+            buffer.release()
+    finally:
+        if held is not None:
+            held.release()
+        buffers.close()
+
+
+def iter_frames(cap, frame_indices, strategy=STRATEGY_SEQUENTIAL, prefetch=0, pool=None):
+    """Yield (frame_idx, timestamp in seconds, frame) for each requested index in ascending order
+
+    Decoding follows iter_sampled_frames(). With prefetch > 0, frames are
+    decoded that many ahead on a background thread; frame_indices is then
+    read ahead too, so feedback-driven schedules need prefetch=0.
+
+    With a BufferPool, frames are decoded into its buffers and each one is
+    only valid until the next frame is requested. A consumer that keeps a
+    frame longer, such as a FrameWriter, takes pool.retain(frame) and calls
+    the returned release when it is done. Decoding blocks while the pool is
+    at its ceiling.
+    """
+    if pool is None:
+        def decode():
+            for frame_idx, frame in iter_sampled_frames(cap, frame_indices, strategy):
+                yield frame_idx, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+
+        if prefetch > 0:
+            return prefetched(decode(), prefetch)
+        return decode()
+
+    def decode_pooled():
+        out = PooledOutput(pool)
+        try:
+            for frame_idx, frame in iter_sampled_frames(cap, frame_indices, strategy, out):
+                yield frame_idx, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, out.claim(frame)
+        finally:
+            out.discard()
+
+    if prefetch > 0:
+        return _borrowed(prefetched(decode_pooled(), prefetch, discard=lambda item: item[2].release()))
+    return _borrowed(decode_pooled())
+
+
+class FrameSource:
+    """One open video shared by everything that reads it, closed deterministically
+
+    All decoding goes through a lock, so a preview and metadata queries
+    can share the handle from different threads. Use as a context manager
+    or call close(); frames() holds the lock until its generator is
+    exhausted or closed.
+    """
+
+    def __init__(self, source, decoder=DECODER_AUTO):
+        self.source = source
+        self.decoder = decoder
+        self._lock = threading.RLock()
+        self._cap = open_source(source, decoder)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise IOError(f"Could not open video: {source}")
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    @property
+    def duration(self):
+        """Length in seconds, or 0 when the frame rate is unknown"""
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+    @property
+    def closed(self):
+        return self._cap is None
+
+    def frame_at(self, frame_idx):
+        """Decode a single frame, or return None if it can't be read"""
+        with self._lock:
+            if self._cap is None:
+                raise ValueError("Frame source is closed")
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def frames(self, frame_indices=None, strategy=STRATEGY_SEQUENTIAL, prefetch=0):
+        """Yield (frame_idx, timestamp, frame) lazily; every frame when frame_indices is None"""
+        if frame_indices is None:
+            frame_indices = range(self.frame_count)
+        with self._lock:
+            if self._cap is None:
+                raise ValueError("Frame source is closed")
+            frames = iter_frames(self._cap, frame_indices, strategy, prefetch)
+            try:
+                for item in frames:
+                    yield item
+            finally:
+                frames.close()
+
+    def close(self):
+        with self._lock:
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
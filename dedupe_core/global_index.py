@@ -0,0 +1,337 @@
+"""Persistent frame hash index shared by every video of a corpus
+
+Frames kept from earlier videos are recorded in an SQLite database with
+their source video and frame index, so later videos can drop frames that
+repeat them (re-uploads, intros, outros). SQLite in WAL mode lets any
+number of batch workers read while one of them writes, keeps RAM bounded
+by its page cache, and scales to tens of millions of rows.
+
+Near-duplicate queries use the same pigeonhole idea as MultiIndexHash: the
+hash is also stored split into indexed bands, and two hashes within
+distance r agree to within r // m bits on at least one of m bands. Each
+band is probed for those few values and the candidates are verified
+exactly. Two band layouts are stored: 16-bit bands need few probes but
+return more candidates as the index grows, 32-bit bands the reverse; each
+query uses whichever is cheaper at the current size.
+"""
+import os
+import sqlite3
+import threading
+
+from .frame_hash import DEFAULT_HASH_ALGORITHM
+from .hash_index import _binomial, _flip_masks, hamming_distance
+
+# (column prefix, band count, band width) of the stored band layouts
+BAND_LAYOUTS = (("band", 4, 16), ("wide", 2, 32))
+
+# Seconds a connection waits for another process's write lock
+DEFAULT_TIMEOUT = 60.0
+
+# Frames checked and added per write transaction; batch workers take turns at the lock between chunks
+WRITE_CHUNK_FRAMES = 256
+
+# SQLite page cache per connection; bounds RAM while keeping the band indexes' hot pages resident
+CACHE_SIZE_MB = 64
+
+# AUTOINCREMENT: ids of deleted rows are never handed out again, which check_and_add_many() relies on
+_FRAMES_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    frame_index INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    wide0 INTEGER NOT NULL,
+    wide1 INTEGER NOT NULL
+);
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    video TEXT NOT NULL,
+    region TEXT NOT NULL,
+    hash_algorithm TEXT NOT NULL,
+    UNIQUE (video, region, hash_algorithm)
+);
+""" + _FRAMES_TABLE.format(name="frames") + """
+CREATE INDEX IF NOT EXISTS frames_source ON frames(source_id);
+CREATE INDEX IF NOT EXISTS frames_band0 ON frames(band0);
+CREATE INDEX IF NOT EXISTS frames_band1 ON frames(band1);
+CREATE INDEX IF NOT EXISTS frames_band2 ON frames(band2);
+CREATE INDEX IF NOT EXISTS frames_band3 ON frames(band3);
+CREATE INDEX IF NOT EXISTS frames_wide0 ON frames(wide0);
+CREATE INDEX IF NOT EXISTS frames_wide1 ON frames(wide1);
+"""
+
+
+def _to_signed(hash_value):
+    """SQLite integers are signed 64-bit"""
+    hash_value = int(hash_value)
+    return hash_value - (1 << 64) if hash_value >= 1 << 63 else hash_value
+
+
+def _to_unsigned(hash_value):
+    return hash_value + (1 << 64) if hash_value < 0 else hash_value
+
+
+def _bands(hash_value, band_count, band_width):
+    mask = (1 << band_width) - 1
+    return [(hash_value >> (band * band_width)) & mask for band in range(band_count)]
+
+
+_probe_masks = {}
+
+
+def _probe_masks_for(band_width, flips):
+    """_flip_masks(), cached; enumerating 32-bit masks takes a while"""
+    key = (band_width, flips)
+    if key not in _probe_masks:
+        _probe_masks[key] = _flip_masks(band_width, flips)
+    return _probe_masks[key]
+
+
+def _choose_layout(max_distance, size):
+    """Return (prefix, band count, band width, flips) of the cheapest layout, or None to scan"""
+    best_cost, best = max(size, 1), None
+    for prefix, band_count, band_width in BAND_LAYOUTS:
+        flips = max_distance // band_count
+        probes = band_count * sum(_binomial(band_width, k) for k in range(flips + 1))
+        candidates = probes * size / float(1 << band_width)
+        if probes + candidates < best_cost:
+            best_cost, best = probes + candidates, (prefix, band_count, band_width, flips)
+    return best
+
+
+def _nearest(hash_value, rows, max_distance):
+    """(distance, hash, video, frame index) of the closest row within max_distance, or None"""
+    best = None
+    for stored, video, frame_index in rows:
+        stored = _to_unsigned(stored)
+        distance = hamming_distance(hash_value, stored)
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, stored, video, frame_index)
+    return best
+
+
+def _frames_autoincrement(connection):
+    sql = connection.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'frames'").fetchone()[0]
+    return "AUTOINCREMENT" in sql.upper()
+
+
+def _migrate(connection):
+    """Rebuild a frames table from before AUTOINCREMENT, keeping its rows and ids"""
+    if _frames_autoincrement(connection):
+        return
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated it while this one waited for the lock
+        if not _frames_autoincrement(connection):
+            connection.execute(_FRAMES_TABLE.format(name="frames_migrated"))
+            connection.execute("INSERT INTO frames_migrated SELECT * FROM frames")
+            connection.execute("DROP TABLE frames")
+            connection.execute("ALTER TABLE frames_migrated RENAME TO frames")
+            # The indexes went with the old table
+            for statement in _SCHEMA.split(";"):
+                if "CREATE INDEX" in statement:
+                    connection.execute(statement)
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def _region_key(region):
+    return ",".join(str(v) for v in region) if region else ""
+
+
+class IndexSource:
+    """One video (and region) whose frames are checked against and added to the index"""
+
+    def __init__(self, source_id, video, region, hash_algorithm):
+        self.id = source_id  # None when the source is only queried, never added to
+        self.video = video
+        self.region = region
+        self.hash_algorithm = hash_algorithm
+
+
+class GlobalHashIndex:
+    """SQLite-backed hash index shared across videos, runs and processes
+
+    Frames only match frames of other videos hashed with the same region
+    and algorithm. Registering a video with source() replaces whatever an
+    earlier run recorded for it, so re-running a video doesn't match it
+    against itself. Only the database path is pickled, so an instance can
+    be passed to pool workers; each process opens its own connection.
+    """
+
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"path": self.path, "timeout": self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["timeout"])
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Transactions are managed explicitly below
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.execute(f"PRAGMA cache_size=-{CACHE_SIZE_MB * 1024}")
+            connection.executescript(_SCHEMA)
+            _migrate(connection)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close this thread's connection"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def source(self, video_path, region=None, hash_algorithm=DEFAULT_HASH_ALGORITHM, replace=True):
+        """Register a video for checking and adding frames
+
+        With replace=True, frames recorded for the same video, region and
+        algorithm by an earlier run are deleted. With replace=False nothing
+        is written and the returned source can only be queried (dry runs).
+        """
+        video = os.path.abspath(str(video_path))
+        key = (video, _region_key(region), hash_algorithm)
+        if not replace:
+            return IndexSource(None, video, region, hash_algorithm)
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM sources WHERE video = ? AND region = ? AND hash_algorithm = ?", key)
+            source_id = connection.execute(
+                "INSERT INTO sources (video, region, hash_algorithm) VALUES (?, ?, ?)", key).lastrowid
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return IndexSource(source_id, video, region, hash_algorithm)
+
+    def _candidates(self, connection, source, hash_value, max_distance):
+        """Rows (hash, video, frame index) that can lie within max_distance"""
+        scope = ("SELECT f.hash, s.video, f.frame_index FROM frames f JOIN sources s ON s.id = f.source_id "
+                 "WHERE s.video != ? AND s.region = ? AND s.hash_algorithm = ?")
+        params = (source.video, _region_key(source.region), source.hash_algorithm)
+        # Row ids only grow, so the largest is a cheap upper bound on the size
+        size = connection.execute("SELECT MAX(id) FROM frames").fetchone()[0] or 0
+        layout = _choose_layout(max_distance, size)
+        if layout is None:
+            return connection.execute(scope, params)
+
+        prefix, band_count, band_width, flips = layout
+        bands = _bands(hash_value, band_count, band_width)
+        if flips == 0:
+            # One exact band match needed; a fixed statement stays prepared
+            probes = " OR ".join(f"f.{prefix}{band} = ?" for band in range(band_count))
+            return connection.execute(f"{scope} AND ({probes})", params + tuple(bands))
+        masks = _probe_masks_for(band_width, flips)
+        # Values are generated integers, so they are inlined rather than bound
+        # to stay under old SQLite builds' 999-parameter limit
+        probes = " OR ".join(
+            f"f.{prefix}{band} IN ({','.join(str(value ^ mask) for mask in masks)})"
+            for band, value in enumerate(bands))
+        return connection.execute(f"{scope} AND ({probes})", params)
+
+    def _find(self, connection, source, hash_value, max_distance):
+        return _nearest(hash_value, self._candidates(connection, source, hash_value, max_distance), max_distance)
+
+    def _added_since(self, connection, source, last_id):
+        """Rows (hash, video, frame index) of other videos added after row last_id"""
+        return connection.execute(
+            "SELECT f.hash, s.video, f.frame_index FROM frames f JOIN sources s ON s.id = f.source_id "
+            "WHERE f.id > ? AND s.video != ? AND s.region = ? AND s.hash_algorithm = ?",
+            (last_id, source.video, _region_key(source.region), source.hash_algorithm)).fetchall()
+
+    def find(self, source, hash_value, max_distance=0):
+        """Return (distance, hash, video, frame index) of the nearest match from another video, or None"""
+        return self._find(self._connection(), source, int(hash_value), max_distance)
+
+    def check_and_add(self, source, hash_value, frame_index, max_distance=0):
+        """Add a frame unless another video has a near-duplicate; return the match or None
+
+        The frame is looked up first, without the write lock. The insert
+        and a second check against rows added since are one transaction,
+        so concurrent workers can't both keep the same frame.
+        """
+        return self.check_and_add_many(source, [hash_value], [frame_index], max_distance)[0]
+
+    def check_and_add_many(self, source, hashes, frame_indices, max_distance=0):
+        """check_and_add() for a batch of frames, one transaction per WRITE_CHUNK_FRAMES frames
+
+        The write lock is only held to re-check a chunk against what other
+        writers added during its lookups and to insert it, so long videos
+        don't keep other batch workers waiting on it.
+        """
+        hashes = [int(hash_value) for hash_value in hashes]
+        if source.id is None:
+            return [self.find(source, hash_value, max_distance) for hash_value in hashes]
+
+        connection = self._connection()
+        frame_indices = list(frame_indices)
+        matches = []
+        for chunk_start in range(0, len(hashes), WRITE_CHUNK_FRAMES):
+            chunk = slice(chunk_start, chunk_start + WRITE_CHUNK_FRAMES)
+            # Row ids only grow (AUTOINCREMENT), so rows above this one were committed after the lookups began
+            last_id = connection.execute("SELECT MAX(id) FROM frames").fetchone()[0] or 0
+            found = [self._find(connection, source, hash_value, max_distance) for hash_value in hashes[chunk]]
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                added = self._added_since(connection, source, last_id)
+                for hash_value, frame_index, match in zip(hashes[chunk], frame_indices[chunk], found):
+                    recent = _nearest(hash_value, added, max_distance)
+                    if recent is not None and (match is None or recent[0] < match[0]):
+                        match = recent
+                    if match is None:
+                        self._insert(connection, source, hash_value, frame_index)
+                    matches.append(match)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return matches
+
+    def add_many(self, source, hashes, frame_indices):
+        """Record frames without checking them, e.g. those a resumed run had already kept"""
+        if source.id is None:
+            return
+        connection = self._connection()
+        rows = list(zip(hashes, frame_indices))
+        for chunk_start in range(0, len(rows), WRITE_CHUNK_FRAMES):
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for hash_value, frame_index in rows[chunk_start:chunk_start + WRITE_CHUNK_FRAMES]:
+                    self._insert(connection, source, int(hash_value), frame_index)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _insert(self, connection, source, hash_value, frame_index):
+        connection.execute(
+            "INSERT INTO frames (source_id, frame_index, hash, band0, band1, band2, band3, wide0, wide1) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [source.id, int(frame_index), _to_signed(hash_value)]
+            + _bands(hash_value, 4, 16) + _bands(hash_value, 2, 32))
@@ -0,0 +1,141 @@
+"""Persistent on-disk cache of per-video (frame index, hash) streams
+
+A re-run of the same video with the same sampling, ROI and hash algorithm
+loads the hash stream from the cache instead of decoding, so changing only
+the similarity threshold or output folder costs a dedup pass over an
+array plus decoding the frames that are actually written.
+"""
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .fileio import write_atomically
+
+# Default cap on the total size of cached hash streams
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+# Bytes read from each of the start, middle and end of a file for its fingerprint
+FINGERPRINT_CHUNK = 64 * 1024
+
+CACHE_VERSION = 1
+
+
+def default_cache_dir():
+    """Per-user cache directory for the current platform"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "DeDupe" / "hash_cache"
+
+
+def content_fingerprint(path, chunk_size=FINGERPRINT_CHUNK):
+    """Cheap content hash from the size and three chunks of the file
+
+    For a directory (an image sequence), a hash of its file names, sizes
+    and modification times.
+    """
+    if os.path.isdir(path):
+        digest = hashlib.blake2b(digest_size=16)
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            stat = entry.stat()
+            digest.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as handle:
+        for offset in (0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)):
+            handle.seek(offset)
+            digest.update(handle.read(chunk_size))
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Directory of .npy hash streams with a size cap and LRU eviction
+
+    Each entry is an N×2 uint64 array of (frame index, hash) rows, loaded
+    with memory mapping. Entries are written atomically, and a read
+    refreshes the file's mtime, which eviction uses as its recency order.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, video_path, sampling, region, hash_algorithm, hash_plane_size=None):
+        """Cache key for a video file and the settings that shape its hash stream"""
+        stat = os.stat(video_path)
+        fields = {
+            "version": CACHE_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "fingerprint": content_fingerprint(video_path),
+            "sampling": sampling,
+            "region": list(region) if region else None,
+            "hash_algorithm": hash_algorithm,
+            "hash_plane_size": hash_plane_size,
+        }
+        encoded = json.dumps(fields, sort_keys=True).encode()
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.npy"
+
+    def load(self, key):
+        """Return (frame_indices, hashes) for a key, or None on a miss"""
+        path = self._path(key)
+        try:
+            rows = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if rows.ndim != 2 or rows.shape[1] != 2 or rows.dtype != np.uint64:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return rows[:, 0].astype(np.int64), np.array(rows[:, 1])
+
+    def store(self, key, frame_indices, hashes):
+        """Save a complete hash stream, then evict old entries over the size cap"""
+        rows = np.empty((len(hashes), 2), dtype=np.uint64)
+        rows[:, 0] = np.asarray(frame_indices, dtype=np.int64)
+        rows[:, 1] = np.asarray(hashes, dtype=np.uint64)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        write_atomically(self._path(key), lambda handle: np.save(handle, rows))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass  # In use by another process (e.g. memory-mapped on Windows)
+
+    def clear(self):
+        """Delete every cached entry"""
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,257 @@
+"""Hamming-distance index over 64-bit perceptual frame hashes"""
+from collections import deque
+
+HASH_BITS = 64
+
+# Kept frames a RecentHashWindow compares against by default
+DEFAULT_WINDOW_FRAMES = 100
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two integer hashes"""
+    return bin(a ^ b).count("1")
+
+
+def similarity_to_distance(similarity, hash_bits=HASH_BITS):
+    """Convert a similarity percentage (50-100) into a maximum Hamming distance
+
+    100% only matches identical hashes; 95% on a 64-bit hash tolerates 3
+    differing bits.
+    """
+    similarity = max(0.0, min(100.0, float(similarity)))
+    # Round away float noise such as 95.0 -> 3.1999999 before truncating
+    return int(round((100.0 - similarity) * hash_bits / 100.0, 6))
+
+
+def _flip_masks(width, max_flips):
+    """All masks of up to max_flips set bits within a band of the given width"""
+    masks = [0]
+    for _ in range(max_flips):
+        masks = sorted({mask | (1 << bit) for mask in masks for bit in range(width)} | set(masks))
+    return masks
+
+
+def _binomial(n, k):
+    """n choose k (math.comb needs Python 3.8)"""
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+class MultiIndexHash:
+    """Multi-index hashing over equal-width bit bands of the hash
+
+    The hash is split into m bands, each with its own bucket table. Two
+    hashes within distance r must agree to within r // m bits on at least
+    one band (pigeonhole), so a query only probes the buckets near each of
+    its band values and verifies the candidates found there. The band count
+    is chosen per radius to balance bucket probes against candidates; for
+    radii so large that probing costs more than a scan (below ~63%
+    similarity), it falls back to a linear scan.
+    """
+
+    # (band count, band width) pairs considered; all split 64 bits evenly
+    BAND_LAYOUTS = ((2, 32), (4, 16), (8, 8))
+
+    # Number of stored hashes assumed when choosing a band layout
+    EXPECTED_SIZE = 100000
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self.band_count, self.band_width = self._choose_layout(max_distance)
+        self._band_mask = (1 << self.band_width) - 1
+        self._probe_masks = []
+        if self.band_count:
+            self._probe_masks = _flip_masks(self.band_width, max_distance // self.band_count)
+        self._buckets = [{} for _ in range(self.band_count)]
+        self._hashes = []
+        self._payloads = []
+
+    @classmethod
+    def _choose_layout(cls, max_distance):
+        """Return (band count, band width), or (0, 0) for a linear scan"""
+        best = (cls.EXPECTED_SIZE, 0, 0)
+        for band_count, band_width in cls.BAND_LAYOUTS:
+            flips = max_distance // band_count
+            probes = band_count * sum(_binomial(band_width, k) for k in range(flips + 1))
+            candidates = probes * cls.EXPECTED_SIZE / float(1 << band_width)
+            cost = probes + candidates
+            if cost < best[0]:
+                best = (cost, band_count, band_width)
+        return best[1], best[2]
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _bands(self, hash_value):
+        width, mask = self.band_width, self._band_mask
+        return [(hash_value >> (band * width)) & mask for band in range(self.band_count)]
+
+    def add(self, hash_value, payload=None):
+        """Insert a hash with an optional payload (e.g. its frame index)"""
+        entry = len(self._hashes)
+        self._hashes.append(hash_value)
+        self._payloads.append(payload)
+        for buckets, band_value in zip(self._buckets, self._bands(hash_value)):
+            bucket = buckets.get(band_value)
+            if bucket is None:
+                buckets[band_value] = [entry]
+            else:
+                bucket.append(entry)
+
+    def find(self, hash_value, max_distance=None):
+        """Return (distance, hash, payload) of the nearest stored hash within range
+
+        Ties are broken by insertion order so results match a linear scan
+        over the hashes in the order they were added. Returns None when
+        nothing is within max_distance.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        if not self.band_count:
+            return self._scan(hash_value, max_distance)
+
+        seen = set()
+        best = None
+        for buckets, band_value in zip(self._buckets, self._bands(hash_value)):
+            for flip in self._probe_masks:
+                bucket = buckets.get(band_value ^ flip)
+                if bucket is None:
+                    continue
+                for entry in bucket:
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    distance = hamming_distance(hash_value, self._hashes[entry])
+                    if distance <= max_distance and (best is None or (distance, entry) < best):
+                        best = (distance, entry)
+
+        if best is None:
+            return None
+        distance, entry = best
+        return distance, self._hashes[entry], self._payloads[entry]
+
+    def _scan(self, hash_value, max_distance):
+        best = None
+        for entry, stored in enumerate(self._hashes):
+            distance = hamming_distance(hash_value, stored)
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, entry)
+                if distance == 0:
+                    break
+
+        if best is None:
+            return None
+        distance, entry = best
+        return distance, self._hashes[entry], self._payloads[entry]
+
+
+class HashIndex:
+    """Set of kept frame hashes answering "is there a near-duplicate?" queries
+
+    With a distance of 0 this is a plain dict lookup, identical to the
+    original exact-match behaviour. Otherwise queries go through a
+    multi-index hash table, which stays sublinear for the radii typically
+    used for deduplication (90-100% similarity).
+    """
+
+    def __init__(self, max_distance=0):
+        self.max_distance = max_distance
+        self._exact = {}
+        self._table = MultiIndexHash(max_distance) if max_distance > 0 else None
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, hash_value, payload=None):
+        """Record a kept hash"""
+        self._exact[hash_value] = payload
+        if self._table is not None:
+            self._table.add(hash_value, payload)
+
+    def find(self, hash_value):
+        """Return (distance, hash, payload) of the closest match, or None"""
+        if hash_value in self._exact:
+            return 0, hash_value, self._exact[hash_value]
+        if self._table is None:
+            return None
+        return self._table.find(hash_value)
+
+    def check_and_add(self, hash_value, payload=None):
+        """Add the hash unless a near-duplicate exists; return the match or None"""
+        match = self.find(hash_value)
+        if match is None:
+            self.add(hash_value, payload)
+        return match
+
+
+class RecentHashWindow:
+    """Ring buffer of the most recently kept hashes, for unbounded streams
+
+    A frame is a duplicate if it matches one of the last max_frames kept
+    frames and/or one kept within the last max_seconds of stream time.
+    Older hashes fall out, so memory stays constant however long the
+    stream runs. Queries are a scan over the window, which is small.
+    """
+
+    def __init__(self, max_distance=0, max_frames=DEFAULT_WINDOW_FRAMES, max_seconds=None):
+        if max_frames is None and max_seconds is None:
+            raise ValueError("A window needs max_frames, max_seconds or both")
+        self.max_distance = max_distance
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self._entries = deque(maxlen=max_frames)  # (timestamp, hash, payload), oldest first
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, timestamp):
+        if self.max_seconds is None:
+            return
+        entries = self._entries
+        while entries and timestamp - entries[0][0] > self.max_seconds:
+            entries.popleft()
+
+    def find(self, hash_value, timestamp=0.0):
+        """Return (distance, hash, payload) of the closest hash in the window, or None
+
+        Ties go to the most recently kept frame.
+        """
+        self._expire(timestamp)
+        best = None
+        for _, stored, payload in reversed(self._entries):
+            distance = hamming_distance(hash_value, stored)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, stored, payload)
+                if distance == 0:
+                    break
+        return best
+
+    def add(self, hash_value, timestamp=0.0, payload=None):
+        """Record a kept hash, evicting the oldest once the window is full"""
+        self._entries.append((timestamp, hash_value, payload))
+
+    def check_and_add(self, hash_value, timestamp=0.0, payload=None):
+        """Add the hash unless a near-duplicate is in the window; return the match or None"""
+        match = self.find(hash_value, timestamp)
+        if match is None:
+            self.add(hash_value, timestamp, payload)
+        return match
+
+
+def select_unique(hashes, max_distance, payloads=None):
+    """Run the dedup over a hash stream in order
+
+    Returns a list with, for each hash, None if it is kept or the payload of
+    the kept hash it duplicates. Payloads default to stream positions.
+    """
+    index = HashIndex(max_distance)
+    if payloads is None:
+        payloads = range(len(hashes))
+    matches = []
+    for hash_value, payload in zip(hashes, payloads):
+        match = index.check_and_add(int(hash_value), payload)
+        matches.append(None if match is None else match[2])
+    return matches
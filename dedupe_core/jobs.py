@@ -0,0 +1,203 @@
+"""Queue of video jobs run a few at a time on background threads, for the GUI
+
+Each Job carries its own video, output folder and ProcessingOptions (the
+settings and ROI captured when it was queued), its own cancel flag and
+its own ProgressReporter. A JobScheduler starts queued jobs in order as
+long as fewer than `concurrency` are running and their worker processes
+fit in the machine's cores. A job's thread starts the next ones as soon
+as it ends, so the queue never waits on the UI between jobs.
+
+Jobs run on threads, as the GUI's single run always did: decoding,
+hashing and writing release the GIL, and options.workers > 1 still
+spreads a job over worker processes.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+
+from .pipeline import PHASE_DONE, process_video
+from .progress import ProgressReporter
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_STOPPED = "stopped"  # Cancelled while running; starting it again resumes from its checkpoint
+JOB_CANCELLED = "cancelled"  # Cancelled before it started
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_DONE, JOB_STOPPED, JOB_CANCELLED, JOB_FAILED)
+
+# Jobs saving frames at once by default; beyond this, writers sharing a disk mostly take turns at it
+DISK_CONCURRENCY = 2
+
+
+def default_concurrency(workers=1, cpu_count=None):
+    """Jobs to run at once: as many as the cores fit at `workers` processes each, up to DISK_CONCURRENCY"""
+    cpus = cpu_count or os.cpu_count() or 1
+    return max(1, min(cpus // max(1, workers), DISK_CONCURRENCY))
+
+
+class Job:
+    """One video to process with its own settings, cancel flag and progress"""
+
+    def __init__(self, video_path, output_dir, options, label=None):
+        self.video_path = video_path
+        self.output_dir = Path(output_dir)
+        self.options = options
+        self.label = label or Path(video_path).name
+        self.status = JOB_QUEUED
+        self.stats = None
+        self.error = None
+        self.last_event = None  # Latest progress snapshot, written by the job's thread
+        self.started = None
+        self.finished = None
+        self.reporter = ProgressReporter(queue_size=None)
+        self.reporter.add_sink(self._record)
+        self._cancel = threading.Event()
+
+    def _record(self, event):
+        self.last_event = event
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cpu_weight(self):
+        """Cores the job keeps busy, counted against the scheduler's budget"""
+        if self.options.prefilter is not None:
+            return 1  # Pre-filtered videos are hashed in one process
+        return max(1, self.options.workers)
+
+    @property
+    def progress(self):
+        """Percent complete; finished jobs count as complete"""
+        if self.done:
+            return 100.0
+        return self.last_event["progress"] if self.last_event is not None else 0.0
+
+    @property
+    def frames_per_second(self):
+        """Recent throughput while running, else 0"""
+        if self.status != JOB_RUNNING or self.last_event is None or self.last_event["phase"] == PHASE_DONE:
+            return 0.0
+        return self.last_event["frames_per_second"]
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        """Process the video on the calling thread, recording the outcome instead of raising"""
+        self.started = time.time()
+        try:
+            self.stats = process_video(self.video_path, self.output_dir, self.options,
+                                       should_stop=self._cancel.is_set, progress=self.reporter)
+            self.status = JOB_STOPPED if self.stats.stopped else JOB_DONE
+        except Exception as e:
+            self.error = str(e)
+            self.status = JOB_FAILED
+        finally:
+            self.finished = time.time()
+
+
+class JobScheduler:
+    """Runs submitted Jobs in order, at most `concurrency` at once within a budget of cores
+
+    A job starts when fewer than concurrency are running and its
+    cpu_weight fits in what the running ones leave of cpu_budget; a job
+    heavier than the whole budget still runs, alone. Jobs are never
+    reordered, so a heavy job at the head of the queue holds back lighter
+    ones behind it until it can start.
+    """
+
+    def __init__(self, concurrency=None, cpu_budget=None):
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        self.concurrency = max(1, concurrency or default_concurrency())
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        """Queue a job, starting it now if there is room
+
+        Raises ValueError if an unfinished job already writes to the same
+        output folder, since the two would overwrite each other's frames.
+        """
+        with self._lock:
+            for other in self.jobs:
+                if not other.done and other.output_dir.resolve() == job.output_dir.resolve():
+                    raise ValueError(f"{other.label} is already being saved to {job.output_dir}")
+            self.jobs.append(job)
+        self._dispatch()
+
+    def set_concurrency(self, concurrency):
+        with self._lock:
+            self.concurrency = max(1, int(concurrency))
+        self._dispatch()
+
+    def cancel(self, job):
+        """Stop a running job at its next frame, or drop a queued one"""
+        with self._lock:
+            job.cancel()
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.finished = time.time()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def clear_finished(self):
+        """Forget finished jobs; returns them"""
+        with self._lock:
+            finished = [job for job in self.jobs if job.done]
+            self.jobs = [job for job in self.jobs if not job.done]
+        return finished
+
+    def counts(self):
+        """Number of jobs in each state"""
+        counts = dict.fromkeys((JOB_QUEUED, JOB_RUNNING) + FINISHED_STATES, 0)
+        for job in list(self.jobs):
+            counts[job.status] += 1
+        return counts
+
+    def busy(self):
+        return any(not job.done for job in list(self.jobs))
+
+    def frames_per_second(self):
+        """Aggregate recent throughput of the running jobs"""
+        return sum(job.frames_per_second for job in list(self.jobs))
+
+    def _next_job(self):
+        """Mark the next job that may start as running and return it, or None; call with the lock held"""
+        running = [job for job in self.jobs if job.status == JOB_RUNNING]
+        if len(running) >= self.concurrency:
+            return None
+        load = sum(job.cpu_weight for job in running)
+        for job in self.jobs:
+            if job.status != JOB_QUEUED:
+                continue
+            if running and load + job.cpu_weight > self.cpu_budget:
+                return None
+            job.status = JOB_RUNNING
+            return job
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                job = self._next_job()
+            if job is None:
+                return
+            # Not daemons: a job cancelled as the app closes still checkpoints and flushes its writes
+            threading.Thread(target=self._run, args=(job,), name=f"job-{job.label}").start()
+
+    def _run(self, job):
+        try:
+            job.run()
+        finally:
+            self._dispatch()
@@ -0,0 +1,193 @@
+"""Columnar record of a finished run: where every hashed frame went and why
+
+Each output folder gets a MANIFEST_FILENAME with one row per hashed
+frame, in frame order:
+
+- frame_index: the frame's index in the video
+- timestamp: its time in seconds (frame index / video fps)
+- hash: its 64-bit perceptual hash
+- duplicate_of: the frame index of the kept frame it repeats, KEPT for a
+  frame that was kept (started a group of duplicates), OTHER_VIDEO for a
+  repeat of a frame kept from another video
+- output: the number of the saved file showing this frame
+  (frame_path(folder, output)), or -1. With best-frame selection that is
+  the group's best frame, which needn't be its kept frame. After an
+  export run it is the frame's position in the export instead
+
+plus the run's settings and ROI as JSON metadata. Frames skipped by the
+scene pre-filter were never hashed and have no row.
+
+The file is an uncompressed .npz, readable with plain np.load(), whose
+columns are laid out 64-byte aligned so load_manifest() can map them
+straight from disk: opening a million-row manifest reads only its
+metadata.
+"""
+import json
+import struct
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from .fileio import write_atomically
+from .writer import frame_path
+
+# Written to each output folder next to the frames
+MANIFEST_FILENAME = "manifest.npz"
+
+MANIFEST_VERSION = 1
+
+# duplicate_of values of frames that repeat no earlier frame of the video
+KEPT = -1
+OTHER_VIDEO = -2
+
+COLUMNS = ("frame_index", "timestamp", "hash", "duplicate_of", "output")
+
+# Fixed part of a ZIP local file header; the name and extra field lengths are its last two fields
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+
+# Bytes zipfile adds to a local header for a member written with force_zip64
+_ZIP64_EXTRA = 20
+
+# Column data starts on a multiple of this many bytes in the file, as np.save() aligns it in a .npy
+COLUMN_ALIGNMENT = 64
+
+
+class Manifest:
+    """The columns and metadata of one run's manifest
+
+    Columns are NumPy arrays (read-only memory maps when loaded with
+    mmap=True), indexed as manifest["hash"]. Rows are sorted by
+    frame_index, so looking a frame up is a binary search.
+    """
+
+    def __init__(self, columns, meta, output_dir=None):
+        self.columns = columns
+        self.meta = meta
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+
+    def __len__(self):
+        return len(self.columns["frame_index"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def row(self, frame_idx):
+        """Row of a hashed frame, or None if the frame wasn't hashed"""
+        frame_indices = self.columns["frame_index"]
+        row = int(np.searchsorted(frame_indices, frame_idx))
+        if row < len(frame_indices) and frame_indices[row] == frame_idx:
+            return row
+        return None
+
+    def kept(self):
+        """Rows of the frames that were kept"""
+        return np.flatnonzero(self.columns["duplicate_of"] == KEPT)
+
+    def saved(self):
+        """Rows of the frames saved to files, in output order"""
+        rows = np.flatnonzero(self.columns["output"] >= 0)
+        return rows[np.argsort(self.columns["output"][rows], kind="stable")]
+
+    def duplicates(self, frame_idx):
+        """Rows of the frames dropped as repeats of the kept frame frame_idx"""
+        return np.flatnonzero(self.columns["duplicate_of"] == frame_idx)
+
+    def output_path(self, row):
+        """Path of the file showing a row's frame, or None if it wasn't saved to a file of its own"""
+        output = int(self.columns["output"][row])
+        if output < 0 or self.meta.get("export"):
+            return None
+        return frame_path(self.output_dir, output, self.meta["image_format"])
+
+
+def build_manifest(frame_indices, hashes, duplicate_of, outputs, meta):
+    """Manifest of a hashed stream, where outputs maps output numbers to the frame index saved under each"""
+    frame_indices = np.asarray(frame_indices, dtype=np.int64)
+    video_fps = meta.get("video_fps") or 0.0
+    output = np.full(len(frame_indices), -1, dtype=np.int32)
+    if outputs:
+        numbers, saved = zip(*outputs.items())
+        output[np.searchsorted(frame_indices, saved)] = numbers
+    columns = {
+        "frame_index": frame_indices,
+        "timestamp": frame_indices / video_fps if video_fps > 0 else np.full(len(frame_indices), np.nan),
+        "hash": np.asarray(hashes, dtype=np.uint64),
+        "duplicate_of": np.asarray(duplicate_of, dtype=np.int64),
+        "output": output,
+    }
+    return Manifest(columns, dict(meta, version=MANIFEST_VERSION))
+
+
+def manifest_path(output_dir):
+    return Path(output_dir) / MANIFEST_FILENAME
+
+
+def save_manifest(output_dir, manifest):
+    """Write a manifest to output_dir atomically, replacing any earlier one"""
+    arrays = dict(manifest.columns, meta=np.array(json.dumps(manifest.meta)))
+    write_atomically(manifest_path(output_dir), lambda handle: _write_aligned_npz(handle, arrays))
+
+
+def load_manifest(path, mmap=True):
+    """Load a manifest file, or the one in an output folder
+
+    With mmap=True the columns are memory-mapped read-only and pages are
+    only read as they are used.
+    """
+    path = Path(path)
+    if path.is_dir():
+        path = manifest_path(path)
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        columns = _map_columns(path) if mmap else {}
+        for name in COLUMNS:
+            if name not in columns:
+                columns[name] = data[name]
+    return Manifest(columns, meta, path.parent)
+
+
+def _write_aligned_npz(handle, arrays):
+    """Write arrays like np.savez(), but with each array's data aligned in the file so it can be mapped
+
+    The .npy header of each member is padded with spaces, as the format
+    allows, until the data after it lands on a COLUMN_ALIGNMENT boundary.
+    """
+    with zipfile.ZipFile(handle, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, array in arrays.items():
+            array = np.asarray(array, order="C")
+            info = zipfile.ZipInfo(f"{name}.npy", date_time=(1980, 1, 1, 0, 0, 0))
+            zip64 = array.nbytes > zipfile.ZIP64_LIMIT // 2
+            header = repr({"descr": np.lib.format.dtype_to_descr(array.dtype), "fortran_order": False,
+                           "shape": array.shape}).encode("latin1")
+            # Magic, version and header length come first; the header ends with a newline
+            start = handle.tell() + _LOCAL_HEADER.size + len(info.filename) + (_ZIP64_EXTRA if zip64 else 0) + 10
+            header += b" " * (-(start + len(header) + 1) % COLUMN_ALIGNMENT) + b"\n"
+            with archive.open(info, "w", force_zip64=zip64) as member:
+                member.write(np.lib.format.magic(1, 0) + struct.pack("<H", len(header)) + header)
+                member.write(array.reshape(-1).view(np.uint8).data)
+
+
+def _map_columns(path):
+    """Memory maps of the stored (uncompressed) columns of an .npz file"""
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if name not in COLUMNS or info.compress_type != zipfile.ZIP_STORED:
+                continue
+            # The member's data follows its local header, whose variable-length fields may differ from the
+            # central directory's
+            handle.seek(info.header_offset)
+            fields = _LOCAL_HEADER.unpack(handle.read(_LOCAL_HEADER.size))
+            handle.seek(info.header_offset + _LOCAL_HEADER.size + fields[-2] + fields[-1])
+            version = np.lib.format.read_magic(handle)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+            if dtype.hasobject or not shape[0]:
+                continue  # np.memmap can't map object arrays or empty files; these are read normally
+            columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=handle.tell(), shape=shape,
+                                      order="F" if fortran_order else "C")
+    return columns
@@ -0,0 +1,253 @@
+"""Per-stage timings and counters for processing runs, cheap enough to leave on
+
+Each stage of a run (seek, decode, hash, lookup, encode, write, ...) is
+timed with time.perf_counter() around the work itself and recorded into
+the run's RunMetrics, from whichever thread does the work. A stage keeps
+an exact count, total and maximum plus a fixed-size random sample for
+percentiles, so memory stays constant however long a stream runs.
+
+With trace=True every span is also kept, up to MAX_TRACE_EVENTS, and can
+be written as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import cv2
+
+STAGE_SEEK = "seek"
+STAGE_DECODE = "decode"
+STAGE_CONVERT = "convert"  # retrieve(): turning a grabbed frame into a BGR array
+STAGE_PREFILTER = "prefilter"
+STAGE_HASH = "hash"
+STAGE_LOOKUP = "lookup"
+STAGE_QUALITY = "quality"  # Sharpness/exposure scoring for best-frame selection
+STAGE_WRITER_WAIT = "writer_wait"  # Decoding blocked on a full writer queue
+STAGE_ENCODE = "encode"
+STAGE_WRITE = "write"
+STAGES = (STAGE_SEEK, STAGE_DECODE, STAGE_CONVERT, STAGE_PREFILTER, STAGE_HASH, STAGE_LOOKUP, STAGE_QUALITY,
+          STAGE_WRITER_WAIT, STAGE_ENCODE, STAGE_WRITE)
+
+# Frames waiting in the writer queue, sampled at every submit()
+GAUGE_WRITER_QUEUE = "writer_queue"
+
+# Samples kept per stage for percentiles; p99 of 4096 samples is within a few percent
+RESERVOIR_SIZE = 4096
+
+# Spans kept for a trace; about 100 MB of trace JSON
+MAX_TRACE_EVENTS = 1000000
+
+
+class Distribution:
+    """Count, total, maximum and a reservoir sample of a stream of values"""
+
+    def __init__(self, seed=0):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = []
+        self._rng = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if len(self._samples) < RESERVOIR_SIZE:
+            self._samples.append(value)
+        else:
+            # Algorithm R: every value seen so far is kept with the same probability
+            slot = self._rng.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self._samples[slot] = value
+
+    def merge(self, other):
+        """Fold in another Distribution, such as one returned by a worker process"""
+        if not other.count:
+            return
+        weight = other.count / (self.count + other.count)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for value in other._samples:
+            if len(self._samples) < RESERVOIR_SIZE:
+                self._samples.append(value)
+            elif self._rng.random() < weight:
+                self._samples[self._rng.randrange(RESERVOIR_SIZE)] = value
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100), 0.0 when nothing was recorded"""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+    def summary(self, scale=1.0, digits=3):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, digits) if self.count else 0.0,
+            "p50": round(self.percentile(50) * scale, digits),
+            "p99": round(self.percentile(99) * scale, digits),
+            "max": round(self.max * scale, digits),
+        }
+
+
+class RunMetrics:
+    """Stage timings, gauges and trace spans of one run, shared by all of its threads"""
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.stages = {}
+        self.gauges = {}
+        self.events = []
+        self.dropped_events = 0
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def record(self, stage, start, end=None):
+        """Record a span that began at perf_counter() value start and ends now (or at end)"""
+        if end is None:
+            end = time.perf_counter()
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = Distribution()
+            stats.add(end - start)
+            if self.trace:
+                self._trace(stage, start, end)
+
+    def record_batch(self, stage, start, count):
+        """Record a span covering count items as count equal per-item durations"""
+        end = time.perf_counter()
+        if count <= 0:
+            return
+        share = (end - start) / count
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = Distribution()
+            for _ in range(count):
+                stats.add(share)
+            if self.trace:
+                self._trace(stage, start, end)
+
+    def _trace(self, stage, start, end):
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            self.dropped_events += 1
+            return
+        thread = threading.get_ident()
+        if thread not in self._thread_names:
+            self._thread_names[thread] = threading.current_thread().name
+        self.events.append((stage, thread, start, end))
+
+    def observe(self, gauge, value):
+        """Sample a level, such as a queue depth"""
+        with self._lock:
+            stats = self.gauges.get(gauge)
+            if stats is None:
+                stats = self.gauges[gauge] = Distribution()
+            stats.add(value)
+
+    def merge(self, stages):
+        """Add stage timings recorded elsewhere, e.g. the `stages` of a worker process's RunMetrics"""
+        with self._lock:
+            for stage, stats in stages.items():
+                self.stages.setdefault(stage, Distribution()).merge(stats)
+
+    def stage_seconds(self):
+        """Total seconds spent in each stage so far"""
+        with self._lock:
+            return {stage: stats.total for stage, stats in self.stages.items()}
+
+    def summary(self, elapsed=None, frames=None, bytes_written=None):
+        """Plain dict of every stage's latencies in milliseconds, gauges and throughput"""
+        with self._lock:
+            stages = {stage: dict(stats.summary(1000.0), total_seconds=round(stats.total, 3))
+                      for stage, stats in sorted(self.stages.items(), key=lambda item: _stage_order(item[0]))}
+            gauges = {gauge: stats.summary(digits=1) for gauge, stats in self.gauges.items()}
+        result = {"stages_ms": stages, "gauges": gauges}
+        if elapsed:
+            result["elapsed_seconds"] = round(elapsed, 3)
+            if frames is not None:
+                result["frames_per_second"] = round(frames / elapsed, 2)
+            if bytes_written is not None:
+                result["bytes_per_second"] = round(bytes_written / elapsed)
+        if bytes_written is not None:
+            result["bytes_written"] = bytes_written
+        return result
+
+    def write_trace(self, path):
+        """Write the recorded spans as Chrome trace JSON; needs trace=True"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            names = dict(self._thread_names)
+        threads = {}
+        trace = []
+        for stage, thread, start, end in events:
+            tid = threads.setdefault(thread, len(threads) + 1)
+            trace.append({"name": stage, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1)})
+        for thread, tid in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": names[thread]}})
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, handle)
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def busiest_stages(stage_seconds, count=2):
+    """[(stage, share of the summed stage time)] for the stages that took longest"""
+    total = sum(stage_seconds.values())
+    if total <= 0:
+        return []
+    ranked = sorted(stage_seconds.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [(stage, seconds / total) for stage, seconds in ranked]
+
+
+class TimedCapture:
+    """Capture wrapper that times seeks, decoding and conversion into a RunMetrics
+
+    grab() and read() count as decode, retrieve() as convert, and setting
+    CAP_PROP_POS_FRAMES as seek. Everything else goes to the wrapped
+    capture untouched.
+    """
+
+    def __init__(self, cap, metrics):
+        self._cap = cap
+        self._metrics = metrics
+
+    def grab(self):
+        start = time.perf_counter()
+        ok = self._cap.grab()
+        self._metrics.record(STAGE_DECODE, start)
+        return ok
+
+    def retrieve(self, image=None):
+        start = time.perf_counter()
+        result = self._cap.retrieve() if image is None else self._cap.retrieve(image=image)
+        self._metrics.record(STAGE_CONVERT, start)
+        return result
+
+    def read(self, image=None):
+        start = time.perf_counter()
+        result = self._cap.read() if image is None else self._cap.read(image=image)
+        self._metrics.record(STAGE_DECODE, start)
+        return result
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return self._cap.set(prop, value)
+        start = time.perf_counter()
+        ok = self._cap.set(prop, value)
+        self._metrics.record(STAGE_SEEK, start)
+        return ok
+
+    def __getattr__(self, name):
+        return getattr(self._cap, name)
+
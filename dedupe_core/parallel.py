@@ -0,0 +1,320 @@
+"""Multi-process decoding and hashing over keyframe-aligned video segments
+
+Each worker process opens its own capture, seeks to the start of its
+segment and decodes it linearly. The per-segment hash streams come back in
+frame order, so running the dedup over the merged stream gives exactly the
+same result as the single-threaded path.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from .best_frame import frame_quality
+from .buffer_pool import BufferPool
+from .frame_hash import DEFAULT_HASH_ALGORITHM, HASH_PLANE_SIZE, hash_frames
+from .frame_source import DECODER_AUTO, iter_frames, open_source
+from .metrics import (
+    STAGE_ENCODE,
+    STAGE_HASH,
+    STAGE_PREFILTER,
+    STAGE_QUALITY,
+    STAGE_WRITE,
+    RunMetrics,
+    TimedCapture,
+)
+from .prefilter import SCENE_STATIC, AdaptiveSchedule, SceneFilter, strongest
+from .roi import CropPlan
+from .writer import DEFAULT_OUTPUT_FORMAT, DEFAULT_QUALITY, encode_image
+from .sampling import (
+    STRATEGIES,
+    STRATEGY_AUTO,
+    FrameSampler,
+    choose_strategy,
+    estimate_keyframe_interval,
+    iter_sampled_frames,
+)
+
+# Frames hashed per hash_frames() call inside a worker
+HASH_BATCH_SIZE = 32
+
+# Segments per worker, so a slow segment doesn't leave the other cores idle
+SEGMENTS_PER_WORKER = 4
+
+# Shortest segment, in keyframe intervals, worth the cost of a worker seek
+MIN_SEGMENT_KEYFRAMES = 4
+
+
+def default_workers():
+    """Number of worker processes to use when none is configured"""
+    return max(1, os.cpu_count() or 1)
+
+
+def plan_segments(total_frames, workers, keyframe_interval=1):
+    """Split [0, total_frames) into (start, stop) segments on keyframe boundaries
+
+    Boundaries are rounded to multiples of the keyframe interval so each
+    worker's initial seek lands on (or next to) a keyframe instead of
+    decoding most of a GOP it will throw away.
+    """
+    if total_frames <= 0:
+        return []
+    keyframe_interval = max(1, int(keyframe_interval))
+    target = max(1, workers * SEGMENTS_PER_WORKER)
+    min_length = keyframe_interval * MIN_SEGMENT_KEYFRAMES
+    length = max(min_length, -(-total_frames // target))
+    # Round the segment length up to whole GOPs
+    length = -(-length // keyframe_interval) * keyframe_interval
+    return [(start, min(start + length, total_frames)) for start in range(0, total_frames, length)]
+
+
+def segment_sample_indices(start, stop, frame_interval):
+    """Sample indices (multiples of frame_interval) that fall inside a segment"""
+    first = -(-start // frame_interval) * frame_interval
+    return range(first, stop, frame_interval)
+
+
+def segment_samples(sampling, start, stop):
+    """The samples of a segment: a FrameSampler's, or every sampling-th frame for an int"""
+    if isinstance(sampling, FrameSampler):
+        return sampling.segment(start, stop)
+    return segment_sample_indices(start, stop, sampling)
+
+
+def _hash_segment(video_path, start, stop, sampling, regions, hash_algorithm, strategy, plane_size,
+                  prefilter=None, decoder=DECODER_AUTO, score=False):
+    """Worker: decode one segment once for every region
+
+    Returns ([(frame indices, hashes, frames pre-filtered, frame_quality() scores or None) per region],
+    stage timings).
+    """
+    metrics = RunMetrics()
+    cap = TimedCapture(open_source(video_path, decoder), metrics)
+    plans = [CropPlan(region) for region in regions]
+    # Each segment starts with a fresh reference frame, so its first sample is always hashed
+    filters = [SceneFilter(prefilter) for _ in plans] if prefilter is not None else None
+    indices = [[] for _ in plans]
+    hashes = [[] for _ in plans]
+    pruned = [0 for _ in plans]
+    qualities = [[] for _ in plans]
+    batches = [[] for _ in plans]
+    batch_indices = [[] for _ in plans]
+
+    def flush(i):
+        start = time.perf_counter()
+        hashes[i].append(hash_frames(batches[i], hash_algorithm, plane_size))
+        metrics.record_batch(STAGE_HASH, start, len(batches[i]))
+        indices[i].extend(batch_indices[i])
+        batches[i], batch_indices[i] = [], []
+
+    try:
+        samples = segment_samples(sampling, start, stop)
+        schedule = None
+        if prefilter is not None and prefilter.adaptive:
+            interval = sampling.interval if isinstance(sampling, FrameSampler) else sampling
+            schedule = samples = AdaptiveSchedule(next(iter(samples), stop), stop, interval)
+        for frame_idx, frame in iter_sampled_frames(cap, samples, strategy):
+            scenes = []
+            for i, plan in enumerate(plans):
+                cropped = plan.crop(frame)
+                if cropped is None:
+                    continue
+                if filters is not None:
+                    start = time.perf_counter()
+                    scene = filters[i].check(cropped)
+                    metrics.record(STAGE_PREFILTER, start)
+                    scenes.append(scene)
+                    if scene == SCENE_STATIC:
+                        pruned[i] += 1
+                        continue
+                if score:
+                    start = time.perf_counter()
+                    qualities[i].append(frame_quality(cropped))
+                    metrics.record(STAGE_QUALITY, start)
+                batches[i].append(cropped)
+                batch_indices[i].append(frame_idx)
+                if len(batches[i]) == HASH_BATCH_SIZE:
+                    flush(i)
+            if schedule is not None and scenes:
+                schedule.report(strongest(scenes))
+        for i in range(len(plans)):
+            if batches[i]:
+                flush(i)
+    finally:
+        cap.release()
+
+    results = []
+    for region_indices, region_hashes, region_pruned, region_qualities in zip(indices, hashes, pruned, qualities):
+        scores = np.asarray(region_qualities, dtype=np.float64) if score else None
+        if region_hashes:
+            results.append((np.asarray(region_indices, dtype=np.int64), np.concatenate(region_hashes),
+                            region_pruned, scores))
+        else:
+            results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64), region_pruned, scores))
+    return results, metrics.stages
+
+
+def _write_segment(video_path, frames, region, keyframe_interval, image_format, quality, decoder=DECODER_AUTO):
+    """Worker: decode and save the given (frame_idx, filename) pairs
+
+    Returns (frames written, bytes written, stage timings).
+    """
+    metrics = RunMetrics()
+    cap = TimedCapture(open_source(video_path, decoder), metrics)
+    plan = CropPlan(region)
+    filenames = dict(frames)
+    written = 0
+    written_bytes = 0
+    try:
+        indices = sorted(filenames)
+        spacing = (indices[-1] - indices[0]) // max(1, len(indices) - 1)
+        strategy = choose_strategy(max(1, spacing), keyframe_interval)
+        # Frames are written synchronously, so the pool's two minimum buffers are reused throughout
+        for frame_idx, _, frame in iter_frames(cap, indices, strategy, pool=BufferPool(0)):
+            frame = plan.crop(frame)
+            if frame is not None:
+                start = time.perf_counter()
+                buffer = encode_image(filenames[frame_idx], frame, image_format, quality)
+                encoded = time.perf_counter()
+                with open(filenames[frame_idx], "wb") as handle:
+                    handle.write(buffer.tobytes())
+                metrics.record(STAGE_ENCODE, start, encoded)
+                metrics.record(STAGE_WRITE, encoded)
+                written_bytes += len(buffer)
+                written += 1
+    finally:
+        cap.release()
+    return written, written_bytes, metrics.stages
+
+
+def _probe_video(video_path, decoder=DECODER_AUTO):
+    """Return (keyframe interval, frame count) for a video file"""
+    cap = open_source(video_path, decoder)
+    try:
+        return estimate_keyframe_interval(cap), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def _run_segments(futures, should_stop, progress):
+    """Collect segment results in submission order, cancelling on stop"""
+    results = []
+    for done, future in enumerate(futures, 1):
+        if should_stop is not None and should_stop():
+            for pending in futures:
+                pending.cancel()
+            return results, True
+        results.append(future.result())
+        if progress is not None:
+            progress(done, len(futures))
+    return results, False
+
+
+def hash_regions_parallel(video_path, sampling, regions, workers=None,
+                          hash_algorithm=DEFAULT_HASH_ALGORITHM, strategy=STRATEGY_AUTO,
+                          should_stop=None, progress=None, plane_size=HASH_PLANE_SIZE, prefilter=None,
+                          decoder=DECODER_AUTO, metrics=None, score=False):
+    """Hash every sampled frame of a video, once per region, using worker processes
+
+    sampling is a FrameSampler, or an int to hash every sampling-th frame.
+    Each segment is decoded once however many regions there are. Returns
+    ([(frame_indices, hashes, frames pre-filtered, qualities) per region], stopped),
+    where qualities are the hashed frames' frame_quality() scores with
+    score=True, else None.
+    prefilter is a PrefilterOptions, or None to hash every sample; each
+    segment starts it afresh, so what it skips depends on the segment
+    boundaries and can differ from a single pass. decoder is one of
+    frame_source.DECODERS. progress(done, total) is called as segments
+    complete; should_stop() is polled between segments. The workers' stage timings are merged into
+    metrics, a RunMetrics, if given.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+    workers = workers or default_workers()
+    keyframe_interval, total_frames = _probe_video(video_path, decoder)
+    segments = plan_segments(total_frames, workers, keyframe_interval)
+    # Resolve once here rather than probing keyframes again in every worker
+    if strategy == STRATEGY_AUTO:
+        strategy = choose_strategy(sampling.step if isinstance(sampling, FrameSampler) else sampling,
+                                   keyframe_interval)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_hash_segment, video_path, start, stop, sampling, list(regions),
+                            hash_algorithm, strategy, plane_size, prefilter, decoder, score)
+            for start, stop in segments
+        ]
+        results, stopped = _run_segments(futures, should_stop, progress)
+    if metrics is not None:
+        for _, stages in results:
+            metrics.merge(stages)
+    results = [regions_result for regions_result, _ in results]
+
+    streams = []
+    for i in range(len(regions)):
+        if results:
+            streams.append((np.concatenate([r[i][0] for r in results]),
+                            np.concatenate([r[i][1] for r in results]),
+                            sum(r[i][2] for r in results),
+                            np.concatenate([r[i][3] for r in results]) if score else None))
+        else:
+            streams.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64), 0,
+                            np.empty(0, dtype=np.float64) if score else None))
+    return streams, stopped
+
+
+def hash_video_parallel(video_path, sampling, workers=None, region=None,
+                        hash_algorithm=DEFAULT_HASH_ALGORITHM, strategy=STRATEGY_AUTO,
+                        should_stop=None, progress=None, plane_size=HASH_PLANE_SIZE):
+    """Hash every sampled frame of a video using a pool of worker processes
+
+    sampling is a FrameSampler or a frame interval, as for
+    hash_regions_parallel(). Returns (frame_indices, hashes, stopped).
+    progress(done, total) is called as segments complete; should_stop() is
+    polled between segments.
+    """
+    streams, stopped = hash_regions_parallel(video_path, sampling, [region], workers,
+                                             hash_algorithm, strategy, should_stop, progress, plane_size)
+    indices, hashes = streams[0][:2]
+    return indices, hashes, stopped
+
+
+def write_frames_parallel(video_path, frames, workers=None, region=None, should_stop=None,
+                          progress=None, image_format=DEFAULT_OUTPUT_FORMAT, quality=DEFAULT_QUALITY,
+                          decoder=DECODER_AUTO, metrics=None):
+    """Decode and save (frame_idx, filename) pairs using worker processes
+
+    Frames are grouped by segment so each worker decodes one contiguous
+    stretch of the video. Returns (frames written, bytes written, stopped).
+    The workers' stage timings are merged into metrics if given.
+    """
+    workers = workers or default_workers()
+    frames = sorted(frames)
+    if not frames:
+        return 0, 0, False
+    keyframe_interval, total_frames = _probe_video(video_path, decoder)
+    segments = plan_segments(max(total_frames, frames[-1][0] + 1), workers, keyframe_interval)
+
+    groups = []
+    position = 0
+    for _, stop in segments:
+        group = []
+        while position < len(frames) and frames[position][0] < stop:
+            group.append(frames[position])
+            position += 1
+        if group:
+            groups.append(group)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_write_segment, video_path, group, region, keyframe_interval,
+                            image_format, quality, decoder)
+            for group in groups
+        ]
+        results, stopped = _run_segments(futures, should_stop, progress)
+    if metrics is not None:
+        for result in results:
+            metrics.merge(result[2])
+    return sum(r[0] for r in results), sum(r[1] for r in results), stopped
@@ -0,0 +1,781 @@
+"""Frame extraction and deduplication pipeline, callable without a GUI"""
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .best_frame import DEFAULT_GROUP_GAP, GroupSelector, frame_quality, select_best
+from .buffer_pool import DEFAULT_POOL_BYTES, BufferPool
+from .checkpoint import (
+    COUNTERS,
+    DEFAULT_CHECKPOINT_INTERVAL,
+    Checkpoint,
+    checkpoint_key,
+    load_checkpoint,
+    remove_checkpoint,
+    save_checkpoint,
+)
+from .frame_hash import DEFAULT_HASH_ALGORITHM, HASH_PLANE_SIZE, hash_frame
+from .export import EXPORT_VIDEO, PackedVideoWriter, VideoExport, write_frame_list
+from .frame_source import DECODER_AUTO, DEFAULT_PREFETCH, iter_frames, open_source
+from .hash_index import HashIndex, select_unique, similarity_to_distance
+from .manifest import KEPT, OTHER_VIDEO, build_manifest, save_manifest
+from .metrics import STAGE_HASH, STAGE_LOOKUP, STAGE_PREFILTER, STAGE_QUALITY, RunMetrics, TimedCapture
+from .parallel import hash_regions_parallel, write_frames_parallel
+from .prefilter import SCENE_STATIC, AdaptiveSchedule, SceneFilter, strongest
+from .roi import CropPlan, region_dirname
+from .sampling import STRATEGY_AUTO, FrameSampler, resolve_strategy
+from .writer import (
+    DEFAULT_OUTPUT_FORMAT,
+    DEFAULT_QUALITY,
+    DEFAULT_WRITER_THREADS,
+    FrameWriter,
+    frame_path,
+)
+
+PHASE_HASHING = "hashing"
+PHASE_SAVING = "saving"
+PHASE_DONE = "done"
+
+# Share of the progress bar given to hashing when kept frames are saved in a second pass
+HASH_PHASE_SHARE = 90.0
+
+
+class ProcessingOptions:
+    """Settings for one processing run"""
+
+    def __init__(self, fps=30, similarity=95.0, region=None, hash_algorithm=DEFAULT_HASH_ALGORITHM,
+                 workers=1, sampling_strategy=STRATEGY_AUTO, image_format=DEFAULT_OUTPUT_FORMAT,
+                 quality=DEFAULT_QUALITY, writer_threads=DEFAULT_WRITER_THREADS, dry_run=False,
+                 hash_cache=None, hash_plane_size=HASH_PLANE_SIZE, global_index=None, prefilter=None,
+                 decoder=DECODER_AUTO, prefetch=DEFAULT_PREFETCH, buffer_pool_bytes=DEFAULT_POOL_BYTES,
+                 trace=False, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, resume=True, best_frame=False,
+                 group_gap=DEFAULT_GROUP_GAP, manifest=True, export=None):
+        self.fps = fps
+        self.similarity = similarity
+        self.region = region  # (x, y, width, height) or None for the whole frame
+        self.hash_algorithm = hash_algorithm
+        self.workers = workers
+        self.sampling_strategy = sampling_strategy
+        self.image_format = image_format
+        self.quality = quality  # JPEG/WebP quality, 1-100
+        self.writer_threads = writer_threads
+        self.dry_run = dry_run  # hash and dedup only, don't write any frames
+        self.hash_cache = hash_cache  # HashCache, or None to always decode
+        self.hash_plane_size = hash_plane_size  # 0 hashes full-resolution frames
+        self.global_index = global_index  # GlobalHashIndex to also drop frames seen in other videos
+        self.prefilter = prefilter  # PrefilterOptions to skip unchanged frames before hashing, or None
+        self.decoder = decoder  # One of frame_source.DECODERS
+        self.prefetch = prefetch  # Frames decoded ahead on a background thread; 0 decodes inline
+        self.buffer_pool_bytes = buffer_pool_bytes  # Ceiling for reused frame buffers; 0 allocates every frame
+        self.trace = trace  # Keep every timed span in stats.metrics for RunMetrics.write_trace()
+        self.checkpoint_interval = checkpoint_interval  # Seconds between checkpoints; 0 never checkpoints
+        self.resume = resume  # Continue from a matching checkpoint in the output folder
+        self.best_frame = best_frame  # Save the sharpest frame of each duplicate group instead of the first
+        self.group_gap = group_gap  # Sample intervals without a match after which a group closes
+        self.manifest = manifest  # Write a manifest.npz of every hashed frame to each output folder
+        self.export = export  # One of export.EXPORT_FORMATS to write one file instead of an image per frame
+
+    def buffer_pool(self):
+        """A fresh BufferPool for one decoding pass, or None when pooling is off"""
+        return BufferPool(self.buffer_pool_bytes) if self.buffer_pool_bytes else None
+
+    @property
+    def max_distance(self):
+        """Hamming distance within which frames count as duplicates"""
+        return similarity_to_distance(self.similarity)
+
+
+class ProcessingStats:
+    """Counters for one processing run, updated in place while it runs"""
+
+    def __init__(self, video_path, output_dir, region=None):
+        self.video_path = str(video_path)
+        self.output_dir = str(output_dir)
+        self.region = region
+        self.total_frames = 0
+        self.video_fps = 0.0
+        self.frames_to_process = 0
+        self.processed_frames = 0
+        self.saved_frames = 0
+        self.bytes_written = 0
+        self.cache_hit = False
+        self.global_duplicates = 0  # Dropped as repeats of frames from other videos
+        self.prefiltered_frames = 0  # Skipped by the scene pre-filter without hashing
+        self.metrics = None  # RunMetrics of the run, shared by all regions decoded together
+        self.resumed = False  # Continued from the checkpoint of an interrupted run
+        self.phase = PHASE_HASHING
+        self.progress = 0.0
+        self.elapsed = 0.0
+        self.stopped = False
+        self.error = None
+
+    @property
+    def duplicates_removed(self):
+        return self.processed_frames - self.saved_frames
+
+    def pruned(self):
+        """Frames each stage dropped, in pipeline order
+
+        "sampling" is how many fewer frames adaptive sampling decoded than
+        the fixed interval would have (negative if it decoded more).
+        """
+        return {
+            "sampling": self.frames_to_process - self.processed_frames if self.frames_to_process else 0,
+            "prefilter": self.prefiltered_frames,
+            "hash_index": self.duplicates_removed - self.prefiltered_frames - self.global_duplicates,
+            "global_index": self.global_duplicates,
+        }
+
+    def as_dict(self):
+        """Plain dict for JSON output"""
+        return {
+            "video_path": self.video_path,
+            "output_dir": self.output_dir,
+            "region": list(self.region) if self.region else None,
+            "total_frames": self.total_frames,
+            "video_fps": self.video_fps,
+            "processed_frames": self.processed_frames,
+            "saved_frames": self.saved_frames,
+            "duplicates_removed": self.duplicates_removed,
+            "bytes_written": self.bytes_written,
+            "cache_hit": self.cache_hit,
+            "resumed": self.resumed,
+            "global_duplicates": self.global_duplicates,
+            "pruned": self.pruned(),
+            "metrics": self.metrics.summary(self.elapsed, self.processed_frames, self.bytes_written)
+                       if self.metrics is not None else None,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "stopped": self.stopped,
+            "error": self.error,
+        }
+
+
+class _Track:
+    """One region's share of a run: its crop, output folder, stats and hash stream"""
+
+    def __init__(self, video_path, region, output_dir):
+        self.region = region
+        self.plan = CropPlan(region)
+        self.output_dir = Path(output_dir)
+        self.stats = ProcessingStats(video_path, output_dir, region)
+        self.cache_key = None
+        self.checkpoint_key = None  # None when this track is never checkpointed
+        self.checkpoint = None  # Checkpoint of an interrupted run this one continues
+        self.source = None  # IndexSource in the global hash index
+        self.frame_indices = None
+        self.hashes = None
+        self.qualities = None  # frame_quality() of each hashed frame, for best-frame selection
+        self.links = None  # Per hashed frame, the manifest's duplicate_of
+        self.outputs = None  # Output number -> frame index saved under it
+        self.packed = None  # VideoExport of options.export written during the decoding pass, not yet committed
+        self.saved = False  # Kept frames already written during the decoding pass
+
+
+def process_video(video_path, output_dir, options=None, should_stop=None, progress=None):
+    """Extract the unique frames of a video into output_dir
+
+    should_stop() is polled regularly and ends the run early when it
+    returns True; progress(stats) is called as frames are processed.
+    Returns a ProcessingStats. Errors are raised to the caller.
+    """
+    options = options or ProcessingOptions()
+    return _process(video_path, [_Track(video_path, options.region, output_dir)], options, should_stop,
+                    progress)[0]
+
+
+def process_regions(video_path, output_dir, regions, options=None, should_stop=None, progress=None):
+    """Extract the unique frames of several regions of a video, decoding it once
+
+    Each region has its own hash stream and duplicates, and is saved to
+    output_dir/region_dirname(region); options.region is ignored. Returns
+    one ProcessingStats per region; progress(stats) is called with the
+    stats of the region being worked on.
+    """
+    options = options or ProcessingOptions()
+    tracks = [_Track(video_path, region, Path(output_dir) / region_dirname(region)) for region in regions]
+    return _process(video_path, tracks, options, should_stop, progress)
+
+
+def _process(video_path, tracks, options, should_stop, progress):
+    should_stop = should_stop or (lambda: False)
+    start_time = time.perf_counter()
+    all_stats = [track.stats for track in tracks]
+    metrics = RunMetrics(options.trace)
+    for stats in all_stats:
+        stats.metrics = metrics
+
+    cap = TimedCapture(open_source(str(video_path), options.decoder), metrics)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        video_fps = cap.get(cv2.CAP_PROP_FPS)
+
+        # Frames are sampled by timestamp, at exactly options.fps
+        sampler = FrameSampler(options.fps, video_fps, 0, total_frames)
+        sampling = sampler.key()
+        if options.prefilter is not None:
+            # Pre-filtered streams leave out frames, so they are cached apart from complete ones; "single-pass"
+            # keeps out streams that worker processes pre-filtered a segment at a time
+            sampling += f",prefilter({options.prefilter.key()}),single-pass"
+        checkpointing = options.checkpoint_interval > 0 and not options.dry_run
+        for track in tracks:
+            track.stats.total_frames = total_frames
+            track.stats.video_fps = video_fps
+            track.stats.frames_to_process = len(sampler)
+            if not options.dry_run:
+                track.output_dir.mkdir(parents=True, exist_ok=True)
+            if options.hash_cache is not None:
+                track.cache_key = options.hash_cache.key(video_path, sampling, track.region,
+                                                         options.hash_algorithm, options.hash_plane_size)
+                # Cached streams have no quality scores, so best-frame runs hash again (and refresh the entry)
+                cached = options.hash_cache.load(track.cache_key) if not options.best_frame else None
+                if cached is not None:
+                    track.stats.cache_hit = True
+                    track.frame_indices, track.hashes = cached
+                    track.stats.processed_frames = len(track.hashes)
+            if checkpointing:
+                track.checkpoint_key = checkpoint_key(video_path, _checkpoint_settings(sampling, track.region,
+                                                                                       options))
+                if options.resume and track.checkpoint_key is not None:
+                    track.checkpoint = load_checkpoint(track.output_dir, track.checkpoint_key)
+            if track.checkpoint is not None and track.checkpoint.phase == PHASE_SAVING and track.hashes is None:
+                # Hashing had finished; only saving is left
+                track.frame_indices, track.hashes = track.checkpoint.frame_indices, track.checkpoint.hashes
+                track.qualities = track.checkpoint.qualities
+                track.stats.processed_frames = track.checkpoint.counters["processed_frames"]
+                track.stats.prefiltered_frames = track.checkpoint.counters["prefiltered_frames"]
+            if options.global_index is not None:
+                # A dry run only queries; a real run replaces what earlier runs recorded for this video
+                track.source = options.global_index.source(video_path, track.region, options.hash_algorithm,
+                                                           replace=not options.dry_run)
+
+        # Regions without a cached hash stream share one decoding pass
+        uncached = [track for track in tracks if track.hashes is None]
+        # ...which resumes only if all of them were checkpointed at the same frame; it then runs here,
+        # since worker processes always start from the beginning of the video
+        positions = {track.checkpoint.next_frame if track.checkpoint is not None
+                     and track.checkpoint.phase == PHASE_HASHING else None for track in uncached}
+        resuming = uncached and None not in positions and len(positions) == 1
+        if not resuming:
+            for track in uncached:
+                track.checkpoint = None
+        # The pre-filter compares each sample with the last one it let through, and adaptive sampling spaces
+        # samples by it, so a pre-filtered stream only matches a single pass when hashed in one
+        if uncached and options.workers > 1 and options.prefilter is None and not resuming:
+            cap.release()
+            _hash_parallel(video_path, sampler, uncached, options, should_stop, progress)
+        elif uncached:
+            _process_sequential(cap, sampler, uncached, options, should_stop, progress)
+
+        for track in tracks:
+            if any(stats.stopped for stats in all_stats):
+                for stats in all_stats:
+                    stats.stopped = True
+                break
+            if not track.saved:
+                _save_kept_frames(cap, video_path, sampler, track, options, should_stop, progress)
+
+        if options.export is not None and not options.dry_run:
+            for track in tracks:
+                if track.stats.stopped:
+                    break
+                if options.export == EXPORT_VIDEO and not cap.isOpened():
+                    # Released for the worker processes
+                    cap = TimedCapture(open_source(str(video_path), options.decoder), metrics)
+                _export_frames(cap, sampler, track, options, should_stop, progress)
+    finally:
+        cap.release()
+        for stats in all_stats:
+            stats.elapsed = time.perf_counter() - start_time
+
+    for track in tracks:
+        stats = track.stats
+        if not stats.stopped:
+            stats.phase = PHASE_DONE
+            stats.progress = 100.0
+            if options.manifest and not options.dry_run:
+                save_manifest(track.output_dir, build_manifest(track.frame_indices, track.hashes, track.links,
+                                                               track.outputs, _manifest_meta(track, sampler,
+                                                                                             options)))
+            if track.checkpoint_key is not None:
+                remove_checkpoint(track.output_dir)
+        elif track.packed is not None:
+            track.packed.discard()
+        if progress is not None:
+            progress(stats)
+    return all_stats
+
+
+def _checkpoint_settings(sampling, region, options):
+    """Everything besides the video that decides a run's output, for its checkpoint key"""
+    settings = {
+        "sampling": sampling,
+        "region": list(region) if region else None,
+        "hash_algorithm": options.hash_algorithm,
+        "hash_plane_size": options.hash_plane_size,
+        "max_distance": options.max_distance,
+        "image_format": options.image_format,
+        "quality": options.quality,
+        "decoder": options.decoder,
+        "global_index": options.global_index.path if options.global_index is not None else None,
+    }
+    if options.best_frame:
+        settings["group_gap"] = options.group_gap
+    if options.export is not None:
+        settings["export"] = options.export
+    return settings
+
+
+def _manifest_meta(track, sampler, options):
+    stats = track.stats
+    return {
+        "video_path": stats.video_path,
+        "region": list(track.region) if track.region else None,
+        "video_fps": stats.video_fps,
+        "total_frames": stats.total_frames,
+        "fps": options.fps,
+        "frame_interval": sampler.step,
+        "hash_algorithm": options.hash_algorithm,
+        "hash_plane_size": options.hash_plane_size,
+        "max_distance": options.max_distance,
+        "image_format": options.image_format,
+        "best_frame": options.best_frame,
+        "export": options.export,
+        "prefiltered_frames": stats.prefiltered_frames,
+    }
+
+
+def _checkpoint_counters(stats, **overrides):
+    counters = {name: getattr(stats, name) for name in COUNTERS}
+    counters.update(overrides)
+    return counters
+
+
+def _process_sequential(cap, sampler, tracks, options, should_stop, progress):
+    """Decode and hash on the calling thread while writer threads save kept frames
+
+    Continues from the tracks' checkpoints if they have one, and
+    checkpoints every options.checkpoint_interval seconds and when stopped.
+    With options.best_frame, kept frames open groups whose best member is
+    written when the group closes. With options.export no images are
+    written; a packed video is encoded as frames are kept when they are
+    kept in output order and none were written before, and everything else
+    is exported once hashing is done.
+    """
+    frame_hashes = [HashIndex(options.max_distance) for _ in tracks]
+    metrics = tracks[0].stats.metrics
+    packing = (options.export == EXPORT_VIDEO and not options.dry_run and not options.best_frame
+               and all(track.checkpoint is None for track in tracks))
+    if packing:
+        writers = [PackedVideoWriter(track.output_dir, _export_fps(track.stats, sampler, options),
+                                     metrics=metrics) for track in tracks]
+    else:
+        writers = [FrameWriter(options.image_format, options.quality, options.writer_threads,
+                               dry_run=options.dry_run or options.export is not None, metrics=metrics)
+                   for _ in tracks]
+    hashed_indices = [[] for _ in tracks]
+    hashed_values = [[] for _ in tracks]
+    kept_flags = [[] for _ in tracks]
+    links = [[] for _ in tracks]
+    outputs = [{} for _ in tracks]
+    first = tracks[0].stats
+    filters = [SceneFilter(options.prefilter) for _ in tracks] if options.prefilter is not None else None
+    selectors = None
+    qualities = [[] for _ in tracks]
+    if options.best_frame:
+        selectors = [GroupSelector(None, options.group_gap * sampler.step) for _ in tracks]
+
+    start_frame = 0
+    schedule_state = None
+    for i, track in enumerate(tracks):
+        checkpoint = track.checkpoint
+        if checkpoint is None:
+            continue
+        # The frames before the checkpoint are restored instead of decoded again
+        start_frame, schedule_state = checkpoint.next_frame, checkpoint.schedule
+        hashed_indices[i] = checkpoint.frame_indices.tolist()
+        hashed_values[i] = checkpoint.hashes.tolist()
+        kept_flags[i] = checkpoint.kept.tolist()
+        if selectors is not None:
+            qualities[i] = checkpoint.qualities.tolist()
+            # Replayed groups only record their frames; those frames are on disk already
+            selectors[i].emit = _group_writer(track, None, options, outputs[i])
+        ordinal = 0
+        for j, (frame_hash, frame_idx) in enumerate(zip(hashed_values[i], hashed_indices[i])):
+            match = frame_hashes[i].check_and_add(frame_hash, frame_idx)
+            kept = kept_flags[i][j]
+            links[i].append(KEPT if kept else match[2] if match is not None else OTHER_VIDEO)
+            if selectors is not None:
+                selectors[i].advance(frame_idx)
+                if kept:
+                    selectors[i].open(frame_idx, ordinal, qualities[i][j])
+                elif match is not None:
+                    selectors[i].offer(match[2], frame_idx, qualities[i][j])
+            elif kept:
+                outputs[i][ordinal] = frame_idx
+            ordinal += kept
+        if selectors is not None:
+            # The checkpoint was written with the open groups' best frames so far
+            selectors[i].write_open()
+        if filters is not None:
+            filters[i].reference = checkpoint.reference
+        for name, value in checkpoint.counters.items():
+            setattr(track.stats, name, value)
+        track.stats.resumed = True
+        if track.source is not None:
+            # Registering the video again dropped what the interrupted run had added to the global index
+            options.global_index.add_many(track.source, checkpoint.hashes[checkpoint.kept].tolist(),
+                                          checkpoint.frame_indices[checkpoint.kept].tolist())
+
+    # Decode linearly unless samples are far enough apart for seeking to pay off
+    strategy = resolve_strategy(cap, sampler.step, options.sampling_strategy)
+    samples = sampler.segment(start_frame, first.total_frames)
+    schedule = None
+    prefetch = options.prefetch
+    if options.prefilter is not None and options.prefilter.adaptive:
+        # Pulled lazily, so each report() sets the gap to the next sample; reading ahead would break that
+        schedule = samples = AdaptiveSchedule(start_frame, first.total_frames, sampler.interval, schedule_state)
+        prefetch = 0
+    # Frames are decoded into reused buffers; a writer holds on to one until it has encoded it
+    pool = options.buffer_pool()
+    sampled = iter_frames(cap, samples, strategy, prefetch, pool)
+    if selectors is not None:
+        for track, selector, writer, track_outputs in zip(tracks, selectors, writers, outputs):
+            selector.emit = _group_writer(track, writer, options, track_outputs)
+
+    def save_checkpoints(next_frame):
+        for i, track in enumerate(tracks):
+            if track.checkpoint_key is None:
+                continue
+            # Every frame the checkpoint counts must be on disk before it is replaced
+            if selectors is not None:
+                selectors[i].write_open()
+            writers[i].flush()
+            counters = _checkpoint_counters(track.stats,
+                                            bytes_written=track.stats.bytes_written + writers[i].bytes_written)
+            save_checkpoint(track.output_dir, Checkpoint(
+                track.checkpoint_key, PHASE_HASHING, hashed_indices[i], hashed_values[i], kept_flags[i],
+                next_frame, counters, schedule.state() if schedule is not None else None,
+                filters[i].reference if filters is not None else None,
+                qualities[i] if selectors is not None else None))
+
+    checkpointing = options.checkpoint_interval > 0 and any(track.checkpoint_key for track in tracks)
+    next_checkpoint = time.perf_counter() + options.checkpoint_interval
+    next_frame = start_frame
+    try:
+        for frame_idx, _, frame in sampled:
+            if should_stop():
+                for track in tracks:
+                    track.stats.stopped = True
+                if checkpointing:
+                    save_checkpoints(next_frame)
+                break
+
+            scenes = []
+            for i, track in enumerate(tracks):
+                stats = track.stats
+                # Apply selective area if enabled; a view, not a copy
+                region_frame = track.plan.crop(frame)
+                if region_frame is None:
+                    continue  # Skip invalid region
+                stats.processed_frames += 1
+                if schedule is not None:
+                    # Samples are no longer evenly spaced, so progress follows the position in the video
+                    stats.progress = min(100.0, (frame_idx + 1) / max(1, stats.total_frames) * 100)
+                else:
+                    stats.progress = min(100.0, stats.processed_frames / max(1, stats.frames_to_process) * 100)
+
+                if filters is not None:
+                    start = time.perf_counter()
+                    scene = filters[i].check(region_frame)
+                    metrics.record(STAGE_PREFILTER, start)
+                    scenes.append(scene)
+                    if scene == SCENE_STATIC:
+                        # Too close to the last hashed frame to be new; no hash, no index lookup
+                        stats.prefiltered_frames += 1
+                        continue
+
+                # Hashed from a decimated plane; the full frame is only kept if it gets written
+                start = time.perf_counter()
+                frame_hash = hash_frame(region_frame, options.hash_algorithm, options.hash_plane_size)
+                hashed = time.perf_counter()
+                metrics.record(STAGE_HASH, start, hashed)
+                hashed_indices[i].append(frame_idx)
+                hashed_values[i].append(frame_hash)
+
+                match = frame_hashes[i].check_and_add(frame_hash, frame_idx)
+                unique = match is None and not _seen_in_other_videos(track, options, frame_hash, frame_idx)
+                metrics.record(STAGE_LOOKUP, hashed)
+                kept_flags[i].append(unique)
+                links[i].append(KEPT if unique else match[2] if match is not None else OTHER_VIDEO)
+                if selectors is not None:
+                    start = time.perf_counter()
+                    quality = frame_quality(region_frame)
+                    metrics.record(STAGE_QUALITY, start)
+                    qualities[i].append(quality)
+                    # May close groups, writing their best frames
+                    selectors[i].advance(frame_idx)
+                    if unique:
+                        selectors[i].open(frame_idx, stats.saved_frames, quality, region_frame)
+                        stats.saved_frames += 1
+                    elif match is not None:
+                        selectors[i].offer(match[2], frame_idx, quality, region_frame)
+                elif unique:
+                    # Blocks while the writer queue is full
+                    writers[i].submit(frame_path(track.output_dir, stats.saved_frames, options.image_format),
+                                      region_frame, pool.retain(region_frame) if pool is not None else None)
+                    outputs[i][stats.saved_frames] = frame_idx
+                    stats.saved_frames += 1
+
+            if schedule is not None and scenes:
+                schedule.report(strongest(scenes))
+            # Without a schedule, resuming decodes on from here; the frames in between aren't sampled
+            next_frame = frame_idx + (schedule.step if schedule is not None else 1)
+            if checkpointing and time.perf_counter() >= next_checkpoint:
+                save_checkpoints(next_frame)
+                next_checkpoint = time.perf_counter() + options.checkpoint_interval
+            if progress is not None:
+                progress(first)
+    finally:
+        # Stops the prefetch thread before anything else touches the capture
+        sampled.close()
+        # Frames already judged unique are flushed even when stopping early
+        for i, (track, writer) in enumerate(zip(tracks, writers)):
+            try:
+                if selectors is not None:
+                    selectors[i].close_all()  # Writes the best frames of the groups still open
+            finally:
+                writer.close()
+            track.stats.bytes_written += writer.bytes_written
+            track.saved = True
+            if packing:
+                track.packed = writer.export
+
+    for i, track in enumerate(tracks):
+        track.frame_indices = np.array(hashed_indices[i], dtype=np.int64)
+        track.hashes = np.array(hashed_values[i], dtype=np.uint64)
+        track.links, track.outputs = links[i], outputs[i]
+        # Only complete streams are cached
+        if track.cache_key is not None and not track.stats.stopped:
+            options.hash_cache.store(track.cache_key, track.frame_indices, track.hashes)
+
+
+def _group_writer(track, writer, options, outputs):
+    """emit() for a track's GroupSelector, queueing each group's best frame on writer (if not None)
+
+    The frame saved under each output number is recorded in outputs.
+    """
+    def emit(ordinal, frame_idx, frame):
+        outputs[ordinal] = frame_idx
+        if writer is not None:
+            writer.submit(frame_path(track.output_dir, ordinal, options.image_format), frame)
+    return emit
+
+
+def _seen_in_other_videos(track, options, frame_hash, frame_idx):
+    """Check a frame that is new to its video against the global index, adding it if it's new there too"""
+    if track.source is None:
+        return False
+    if options.global_index.check_and_add(track.source, frame_hash, frame_idx, options.max_distance) is None:
+        return False
+    track.stats.global_duplicates += 1
+    return True
+
+
+def _hash_parallel(video_path, sampler, tracks, options, should_stop, progress):
+    """Hash segments in worker processes, decoding each segment once for all regions"""
+    def hash_progress(done, total):
+        for track in tracks:
+            track.stats.progress = done / total * HASH_PHASE_SHARE
+        if progress is not None:
+            progress(tracks[0].stats)
+
+    streams, stopped = hash_regions_parallel(
+        str(video_path), sampler, [track.region for track in tracks], options.workers,
+        options.hash_algorithm, options.sampling_strategy, should_stop, hash_progress,
+        options.hash_plane_size, options.prefilter, options.decoder, tracks[0].stats.metrics, options.best_frame)
+    for track, (frame_indices, hashes, prefiltered, qualities) in zip(tracks, streams):
+        track.stats.processed_frames = len(hashes) + prefiltered
+        track.stats.prefiltered_frames = prefiltered
+        track.stats.stopped = stopped
+        if stopped:
+            continue
+        track.frame_indices, track.hashes, track.qualities = frame_indices, hashes, qualities
+        if track.cache_key is not None:
+            options.hash_cache.store(track.cache_key, frame_indices, hashes)
+
+
+def _save_kept_frames(cap, video_path, sampler, track, options, should_stop, progress):
+    """Dedup an already-hashed stream, then decode and save only the kept frames
+
+    With options.best_frame, the frames saved are the groups' best ones,
+    picked from the stream's quality scores. Uses worker processes when
+    options.workers > 1, otherwise the given capture and a background
+    writer.
+    """
+    stats = track.stats
+
+    def write_progress(done, total):
+        stats.progress = HASH_PHASE_SHARE + done / total * (100.0 - HASH_PHASE_SHARE)
+        if progress is not None:
+            progress(stats)
+
+    # Dedup the stream in frame order, exactly as the single-pass path does
+    start = time.perf_counter()
+    frame_indices = track.frame_indices.tolist()
+    matches = select_unique(track.hashes, options.max_distance, frame_indices)
+    kept = [frame_idx for frame_idx, match in zip(frame_indices, matches) if match is None]
+    track.links = [KEPT if match is None else match for match in matches]
+    if track.source is not None:
+        kept_hashes = [hash_value for hash_value, match in zip(track.hashes, matches) if match is None]
+        global_matches = options.global_index.check_and_add_many(track.source, kept_hashes, kept,
+                                                                 options.max_distance)
+        repeats = {frame_idx for frame_idx, match in zip(kept, global_matches) if match is not None}
+        kept = [frame_idx for frame_idx in kept if frame_idx not in repeats]
+        track.links = [OTHER_VIDEO if frame_idx in repeats else link
+                       for frame_idx, link in zip(frame_indices, track.links)]
+        stats.global_duplicates = len(repeats)
+    stats.metrics.record_batch(STAGE_LOOKUP, start, len(track.hashes))
+    if options.dry_run:
+        stats.saved_frames = len(kept)
+        return
+    if options.best_frame:
+        chosen = select_best(frame_indices, matches, track.qualities.tolist(), kept,
+                             options.group_gap * sampler.step)
+    else:
+        chosen = enumerate(kept)
+    track.outputs = dict(chosen)
+    if options.export is not None:
+        # Nothing is saved here; _export_frames() writes the export
+        stats.saved_frames = len(track.outputs)
+        if track.checkpoint is not None and track.checkpoint.phase == PHASE_SAVING:
+            stats.resumed = True
+        return
+    # Decoded in frame order; a group's best frame is saved under its anchor's number
+    frames = sorted((frame_idx, str(frame_path(track.output_dir, saved, options.image_format)))
+                    for saved, frame_idx in track.outputs.items())
+
+    stats.phase = PHASE_SAVING
+    checkpoint = None
+    if track.checkpoint_key is not None:
+        if track.checkpoint is not None and track.checkpoint.phase == PHASE_SAVING:
+            # The interrupted run had already written the frames before this one
+            stats.saved_frames = track.checkpoint.counters["saved_frames"]
+            stats.bytes_written = track.checkpoint.counters["bytes_written"]
+            stats.resumed = True
+        # Hashing is done; a run interrupted from here on only has to save the rest
+        checkpoint = Checkpoint(track.checkpoint_key, PHASE_SAVING, track.frame_indices, track.hashes,
+                                counters=_checkpoint_counters(stats), qualities=track.qualities)
+        save_checkpoint(track.output_dir, checkpoint)
+    resumed = stats.saved_frames
+    frames = frames[resumed:]
+
+    if options.workers > 1 or not cap.isOpened():
+        # Segments finish out of order, so this path only checkpoints before it starts
+        written, bytes_written, stats.stopped = write_frames_parallel(
+            str(video_path), frames, options.workers, track.region, should_stop,
+            lambda done, total: write_progress(resumed + done, resumed + total),
+            options.image_format, options.quality, options.decoder, stats.metrics)
+        stats.saved_frames += written
+        stats.bytes_written += bytes_written
+        return
+
+    if not frames:
+        return
+    kept = [frame_idx for frame_idx, _ in frames]
+    spacing = max(1, (kept[-1] - kept[0]) // max(1, len(kept) - 1))
+    strategy = resolve_strategy(cap, spacing, options.sampling_strategy)
+    filenames = dict(frames)
+    pool = options.buffer_pool()
+    decoded = iter_frames(cap, kept, strategy, options.prefetch, pool)
+    bytes_before = stats.bytes_written
+
+    def update_checkpoint():
+        # Every frame the checkpoint counts must be on disk before it is replaced
+        writer.flush()
+        checkpoint.counters = _checkpoint_counters(stats, bytes_written=bytes_before + writer.bytes_written)
+        save_checkpoint(track.output_dir, checkpoint)
+
+    next_checkpoint = time.perf_counter() + options.checkpoint_interval
+    with FrameWriter(options.image_format, options.quality, options.writer_threads, metrics=stats.metrics) as writer:
+        try:
+            for frame_idx, _, frame in decoded:
+                if should_stop():
+                    stats.stopped = True
+                    if checkpoint is not None:
+                        update_checkpoint()
+                    break
+                frame = track.plan.crop(frame)
+                if frame is None:
+                    continue
+                writer.submit(filenames[frame_idx], frame, pool.retain(frame) if pool is not None else None)
+                stats.saved_frames += 1
+                write_progress(stats.saved_frames, resumed + len(frames))
+                if checkpoint is not None and time.perf_counter() >= next_checkpoint:
+                    update_checkpoint()
+                    next_checkpoint = time.perf_counter() + options.checkpoint_interval
+        finally:
+            decoded.close()
+    stats.bytes_written = bytes_before + writer.bytes_written
+
+
+def _export_frames(cap, sampler, track, options, should_stop, progress):
+    """Write options.export for a track whose hash stream is complete
+
+    The frames are exported in frame order, as ffmpeg's select filter
+    emits them, and track.outputs is renumbered to match, so the manifest's
+    output column is each frame's position in the export. A packed video
+    not already encoded during the decoding pass is decoded and written
+    here; stopping discards it, and a checkpoint lets the next run skip
+    straight to writing it again.
+    """
+    stats = track.stats
+    frames = sorted(track.outputs.values())
+    track.outputs = dict(enumerate(frames))
+    if options.export != EXPORT_VIDEO:
+        stats.bytes_written += write_frame_list(track.output_dir, options.export, stats.video_path, frames,
+                                                stats.video_fps)
+        return
+    if track.packed is not None and track.packed.frames_written == len(frames):
+        # Encoded during the decoding pass
+        stats.bytes_written += track.packed.commit()
+        return
+
+    stats.phase = PHASE_SAVING
+    if track.checkpoint_key is not None:
+        save_checkpoint(track.output_dir, Checkpoint(track.checkpoint_key, PHASE_SAVING, track.frame_indices,
+                                                     track.hashes, counters=_checkpoint_counters(stats),
+                                                     qualities=track.qualities))
+    if not frames:
+        return
+    spacing = max(1, (frames[-1] - frames[0]) // max(1, len(frames) - 1))
+    strategy = resolve_strategy(cap, spacing, options.sampling_strategy)
+    decoded = iter_frames(cap, frames, strategy, options.prefetch, options.buffer_pool())
+    export = VideoExport(track.output_dir, _export_fps(stats, sampler, options), stats.metrics)
+    complete = False
+    try:
+        for frame_idx, _, frame in decoded:
+            if should_stop():
+                stats.stopped = True
+                break
+            frame = track.plan.crop(frame)
+            if frame is None:
+                continue
+            export.write(frame)
+            stats.progress = HASH_PHASE_SHARE + export.frames_written / len(frames) * (100.0 - HASH_PHASE_SHARE)
+            if progress is not None:
+                progress(stats)
+        complete = not stats.stopped
+    finally:
+        decoded.close()
+        # A partial video is discarded, on errors too
+        stats.bytes_written += export.close(keep=complete)
+
+
+def _export_fps(stats, sampler, options):
+    """Playback rate of a packed video: the rate frames were sampled at"""
+    return stats.video_fps / sampler.step if stats.video_fps > 0 else options.fps
@@ -0,0 +1,127 @@
+"""Scene-change pre-filter and adaptive sampling ahead of hashing
+
+A tiny point-sampled thumbnail of each sampled frame is compared with the
+last frame that went on to be hashed. Frames that have clearly not changed
+are skipped without hashing or an index lookup; a large difference marks a
+cut. With adaptive sampling the interval between samples widens through
+static stretches and tightens right after cuts.
+"""
+import cv2
+
+SCENE_STATIC = "static"
+SCENE_CHANGED = "changed"
+SCENE_CUT = "cut"
+
+# Thumbnail compared between frames; point sampling keeps it far cheaper than a hash
+THUMBNAIL_SIZE = (64, 36)
+
+# Mean absolute difference (0-255) below which a frame counts as unchanged;
+# just above typical sensor and compression noise
+DEFAULT_STATIC_THRESHOLD = 3.0
+
+# Mean absolute difference above which a frame counts as a cut
+DEFAULT_CUT_THRESHOLD = 35.0
+
+# Adaptive sampling: the interval doubles per static sample up to this multiple of the base interval
+MAX_INTERVAL_FACTOR = 4
+
+# Adaptive sampling: after a cut, this many samples are taken at half the base interval
+DENSE_SAMPLES = 4
+
+
+class PrefilterOptions:
+    """Settings for the pre-filter; picklable so worker processes can use them"""
+
+    def __init__(self, static_threshold=DEFAULT_STATIC_THRESHOLD, cut_threshold=DEFAULT_CUT_THRESHOLD,
+                 adaptive=False):
+        self.static_threshold = static_threshold
+        self.cut_threshold = cut_threshold
+        self.adaptive = adaptive
+
+    def key(self):
+        """Text identifying the settings, for the hash cache key"""
+        return f"static={self.static_threshold},cut={self.cut_threshold},adaptive={self.adaptive}"
+
+
+class SceneFilter:
+    """Classifies each frame against the last frame that was let through
+
+    reference is that frame's thumbnail, e.g. restored from a checkpoint.
+    """
+
+    def __init__(self, options=None, reference=None):
+        self.options = options or PrefilterOptions()
+        self.reference = reference
+
+    def check(self, frame):
+        """Return SCENE_STATIC, SCENE_CHANGED or SCENE_CUT for a frame
+
+        Frames that aren't static become the new reference, so a slow
+        change can't creep past the filter one small step at a time.
+        """
+        height, width = frame.shape[:2]
+        size = (min(THUMBNAIL_SIZE[0], width), min(THUMBNAIL_SIZE[1], height))
+        thumbnail = cv2.resize(frame, size, interpolation=cv2.INTER_NEAREST)
+        if self.reference is None or self.reference.shape != thumbnail.shape:
+            self.reference = thumbnail
+            return SCENE_CHANGED
+
+        difference = float(cv2.absdiff(thumbnail, self.reference).mean())
+        if difference < self.options.static_threshold:
+            return SCENE_STATIC
+        self.reference = thumbnail
+        if difference > self.options.cut_threshold:
+            return SCENE_CUT
+        return SCENE_CHANGED
+
+
+class AdaptiveSchedule:
+    """Frame indices to sample, spaced by the scene changes reported so far
+
+    Iterating yields indices lazily; report() after each sampled frame sets
+    the step to the next one. Without reports this is range(start, stop,
+    interval). Static frames double the step up to MAX_INTERVAL_FACTOR times
+    the interval, any change resets it, and a cut is followed by
+    DENSE_SAMPLES samples at half the interval. state() and the state
+    argument carry (step, dense samples left) over to a resumed run.
+    """
+
+    def __init__(self, start, stop, interval, state=None):
+        self.start = start
+        self.stop = stop
+        self.interval = interval
+        self._step, self._dense_left = state or (interval, 0)
+
+    @property
+    def step(self):
+        """Gap between the last sampled frame and the next one"""
+        return self._step
+
+    def state(self):
+        return self._step, self._dense_left
+
+    def __iter__(self):
+        frame_idx = self.start
+        while frame_idx < self.stop:
+            yield frame_idx
+            frame_idx += self._step
+
+    def report(self, scene):
+        if scene == SCENE_CUT:
+            self._dense_left = DENSE_SAMPLES
+        if self._dense_left:
+            self._dense_left -= 1
+            self._step = max(1, self.interval // 2)
+        elif scene == SCENE_STATIC:
+            self._step = min(self._step * 2, self.interval * MAX_INTERVAL_FACTOR)
+        else:
+            self._step = self.interval
+
+
+def strongest(scenes):
+    """The most significant of several classifications (cut > changed > static)"""
+    if SCENE_CUT in scenes:
+        return SCENE_CUT
+    if SCENE_CHANGED in scenes:
+        return SCENE_CHANGED
+    return SCENE_STATIC
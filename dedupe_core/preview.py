@@ -0,0 +1,118 @@
+"""Downscaled preview frames of a video, decoded in the background for region selection
+
+A handful of representative frames is decoded once per loaded video,
+shrunk to display size and converted to RGB off the UI thread, so the area
+selection window opens from memory and can scrub between them without
+touching the decoder or full-resolution pixels.
+"""
+import threading
+
+import cv2
+
+# Representative frames kept per video, spread evenly through it
+PREVIEW_FRAMES = 9
+
+# Largest preview (width, height); frames are only ever scaled down
+PREVIEW_MAX_SIZE = (1200, 800)
+
+
+def preview_positions(frame_count, count=PREVIEW_FRAMES):
+    """Frame indices of the previews: the middle of `count` equal slices of the video"""
+    if frame_count <= 0:
+        return [0]
+    count = max(1, min(count, frame_count))
+    return [int((i + 0.5) * frame_count / count) for i in range(count)]
+
+
+def display_scale(width, height, max_size=PREVIEW_MAX_SIZE):
+    """Scale factor that fits a frame within max_size without enlarging it"""
+    return min(max_size[0] / width, max_size[1] / height, 1.0)
+
+
+class PreviewFrame:
+    """One cached preview: RGB pixels at display size, and the frame they came from"""
+
+    def __init__(self, frame_idx, timestamp, rgb, original_size):
+        self.frame_idx = frame_idx
+        self.timestamp = timestamp
+        self.rgb = rgb
+        self.original_size = original_size  # (width, height) of the decoded frame
+
+    @property
+    def display_size(self):
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+    @property
+    def scale(self):
+        return self.rgb.shape[1] / self.original_size[0]
+
+
+class PreviewIndex:
+    """Builds the preview frames of a FrameSource on a background thread
+
+    The middle frame is decoded first, so a dialog can show it as soon as
+    possible; the others follow outwards from the middle. Decoding goes
+    through the source's shared handle. close() stops the thread and must
+    be called before the source is closed.
+    """
+
+    def __init__(self, source, count=PREVIEW_FRAMES, max_size=PREVIEW_MAX_SIZE):
+        self.source = source
+        self.max_size = max_size
+        self.positions = preview_positions(source.frame_count, count)
+        self._frames = [None] * len(self.positions)
+        self._missing = set()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._build, name="preview-index", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def middle(self):
+        return len(self.positions) // 2
+
+    def _build(self):
+        try:
+            order = sorted(range(len(self.positions)), key=lambda i: (abs(i - self.middle), i))
+            for i in order:
+                if self._stop.is_set():
+                    return
+                try:
+                    frame = self.source.frame_at(self.positions[i])
+                except ValueError:
+                    return  # The source was closed
+                if frame is None:
+                    self._missing.add(i)
+                    continue
+                self._frames[i] = self._downscale(self.positions[i], frame)
+        finally:
+            self._done.set()
+
+    def _downscale(self, frame_idx, frame):
+        height, width = frame.shape[:2]
+        scale = display_scale(width, height, self.max_size)
+        if scale < 1.0:
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        timestamp = frame_idx / self.source.fps if self.source.fps > 0 else 0.0
+        # Converted after shrinking, so only display-sized pixels are touched
+        return PreviewFrame(frame_idx, timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (width, height))
+
+    def get(self, i):
+        """The PreviewFrame at position i, or None while it's being decoded or if it failed"""
+        return self._frames[i]
+
+    def failed(self, i):
+        """True if position i couldn't be decoded, or won't be because building stopped"""
+        return i in self._missing or (self._done.is_set() and self._frames[i] is None)
+
+    def wait(self, timeout=None):
+        """Wait until every preview has been built; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,153 @@
+"""Time-throttled progress reporting shared by the GUI, the CLI and log files
+
+The pipeline calls its progress callback once per sampled frame. A
+ProgressReporter used as that callback publishes at most max_rate
+snapshots per second, plus one whenever the phase changes, to any number
+of sinks and, for consumers that poll instead, to a thread-safe queue.
+"""
+import json
+import queue
+import sys
+import threading
+import time
+
+from .metrics import busiest_stages
+
+# Snapshots per second; the UI can't usefully redraw faster than this
+DEFAULT_MAX_RATE = 10.0
+
+# Snapshots kept for a slow poller; older ones are dropped first
+DEFAULT_QUEUE_SIZE = 100
+
+
+def snapshot(stats, elapsed, frames_per_second):
+    """Plain-dict progress event for a ProcessingStats"""
+    remaining = None
+    total = stats.frames_to_process or None
+    if total and frames_per_second > 0:
+        remaining = max(0, total - stats.processed_frames) / frames_per_second
+    busiest = busiest_stages(stats.metrics.stage_seconds()) if stats.metrics is not None else []
+    return {
+        "time": time.time(),
+        "video_path": stats.video_path,
+        "phase": stats.phase,
+        "processed_frames": stats.processed_frames,
+        "frames_to_process": total,
+        "saved_frames": stats.saved_frames,
+        "duplicates_removed": stats.duplicates_removed,
+        "progress": round(stats.progress, 2),
+        "elapsed_seconds": round(elapsed, 3),
+        "frames_per_second": round(frames_per_second, 2),
+        "eta_seconds": None if remaining is None else round(remaining, 1),
+        "busiest_stages": [[stage, round(share, 3)] for stage, share in busiest],
+    }
+
+
+class ProgressReporter:
+    """Progress callback that throttles per-frame updates by wall-clock time
+
+    events queues snapshots for consumers that poll with drain(). Pass
+    queue_size=None when only sinks are used; events is then None.
+    """
+
+    def __init__(self, max_rate=DEFAULT_MAX_RATE, sinks=(), queue_size=DEFAULT_QUEUE_SIZE):
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.events = queue.Queue(maxsize=queue_size) if queue_size is not None else None
+        self._sinks = list(sinks)
+        self._lock = threading.Lock()
+        self._start_time = None
+        self._last_time = None
+        self._last_processed = 0
+        self._last_phase = None
+
+    def add_sink(self, sink):
+        """Also send every published snapshot to sink(event)"""
+        self._sinks.append(sink)
+
+    def __call__(self, stats):
+        now = time.monotonic()
+        with self._lock:
+            if self._start_time is None:
+                self._start_time = self._last_time = now
+            elif stats.phase == self._last_phase and now - self._last_time < self.min_interval:
+                return
+
+            # Throughput over the last reporting interval, not the whole run
+            interval = now - self._last_time
+            if interval > 0:
+                rate = (stats.processed_frames - self._last_processed) / interval
+            else:
+                rate = 0.0
+            event = snapshot(stats, now - self._start_time, rate)
+            self._last_time = now
+            self._last_processed = stats.processed_frames
+            self._last_phase = stats.phase
+
+        self._publish(event)
+
+    def _publish(self, event):
+        while self.events is not None:
+            try:
+                self.events.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+        for sink in self._sinks:
+            sink(event)
+
+    def drain(self):
+        """Return all queued snapshots, oldest first, without blocking"""
+        events = []
+        while self.events is not None:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+
+class JsonProgressLog:
+    """Sink appending each snapshot to a file as one JSON object per line"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._handle = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event):
+        with self._lock:
+            self._handle.write(json.dumps(event) + "\n")
+            self._handle.flush()
+
+    def close(self):
+        with self._lock:
+            self._handle.close()
+
+
+def format_progress(event):
+    """One-line human-readable summary of a snapshot"""
+    if event["frames_to_process"]:
+        count = f"{event['processed_frames']}/{event['frames_to_process']}"
+    else:
+        count = str(event["processed_frames"])
+    text = (f"{event['phase']}: {count} | saved {event['saved_frames']} | "
+            f"{event['frames_per_second']:.1f} frames/s")
+    if event["eta_seconds"] is not None:
+        text += f" | ETA {event['eta_seconds']:.0f}s"
+    if event["busiest_stages"]:
+        text += " | " + format_stages(event["busiest_stages"])
+    return text
+
+
+def format_stages(busiest):
+    """The busiest_stages of a snapshot as text, e.g. decode 61%, hash 22%"""
+    return ", ".join(f"{stage} {share * 100:.0f}%" for stage, share in busiest)
+
+
+def console_sink(stream=None):
+    """Sink printing format_progress() lines, prefixed with the video path"""
+    def sink(event):
+        print(f"{event['video_path']}: {format_progress(event)}", file=stream or sys.stderr)
+    return sink
@@ -0,0 +1,66 @@
+"""Region-of-interest helpers for the selective area feature"""
+
+
+def clamp_region(region, frame_width, frame_height):
+    """Clamp an (x, y, width, height) region to the frame bounds
+
+    Returns None when nothing of the region lies inside the frame.
+    """
+    x, y, w, h = region
+    # Ensure coordinates are within frame bounds
+    x = max(0, min(x, frame_width - 1))
+    y = max(0, min(y, frame_height - 1))
+    w = min(w, frame_width - x)
+    h = min(h, frame_height - y)
+    if w <= 0 or h <= 0:
+        return None
+    return x, y, w, h
+
+
+def crop_frame(frame, region):
+    """Crop a frame to a region, or return None if the region is empty"""
+    if region is None:
+        return frame
+    clamped = clamp_region(region, frame.shape[1], frame.shape[0])
+    if clamped is None:
+        return None
+    x, y, w, h = clamped
+    return frame[y:y + h, x:x + w]
+
+
+def region_dirname(region):
+    """Output folder name for one of several regions of a video"""
+    x, y, w, h = region
+    return f"roi_{x}_{y}_{w}x{h}"
+
+
+class CropPlan:
+    """Crop for one region, clamped once per frame size and applied as a view
+
+    crop() returns a slice of the decoded frame rather than a copy. OpenCV
+    accepts such row-strided arrays as they are, so hashing and encoding
+    read the region straight out of the decoder's buffer.
+    """
+
+    def __init__(self, region=None):
+        self.region = region
+        self._shape = None
+        self._slices = None
+
+    def crop(self, frame):
+        """The region of a frame, or None if the region lies outside it"""
+        if self.region is None:
+            return frame
+        shape = frame.shape[:2]
+        if shape != self._shape:
+            # Normally only on the first frame; recomputed if the stream changes size
+            self._shape = shape
+            clamped = clamp_region(self.region, shape[1], shape[0])
+            if clamped is None:
+                self._slices = None
+            else:
+                x, y, w, h = clamped
+                self._slices = (slice(y, y + h), slice(x, x + w))
+        if self._slices is None:
+            return None
+        return frame[self._slices]
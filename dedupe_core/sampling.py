@@ -0,0 +1,283 @@
+"""Frame sampling strategies for OpenCV video captures"""
+import math
+
+import cv2
+
+STRATEGY_AUTO = "auto"
+STRATEGY_SEEK = "seek"
+STRATEGY_SEQUENTIAL = "sequential"
+STRATEGIES = (STRATEGY_AUTO, STRATEGY_SEEK, STRATEGY_SEQUENTIAL)
+
+# Codecs where every frame is a keyframe, so seeking never decodes extra frames
+INTRA_ONLY_CODECS = {
+    "MJPG", "mjpg", "jpeg", "JPEG", "png ", "PNG ", "ap4h", "apch", "apcn",
+    "apcs", "apco", "AVdn", "AVdh", "HFYU", "FFVH", "RGBA", "I420", "IYUV",
+    "IMGS",  # frame_source.ImageSequenceCapture
+}
+
+# Keyframe spacing assumed when the backend cannot report keyframe flags
+DEFAULT_KEYFRAME_SECONDS = 2.0
+
+# Number of frames inspected when probing for keyframe flags
+KEYFRAME_PROBE_FRAMES = 300
+
+# Fixed cost of one seek (demuxer flush + decoder reset), expressed in decoded
+# frames; measured with benchmarks/bench_sampling.py on the FFmpeg backend
+SEEK_OVERHEAD_FRAMES = 16
+
+# Slack when comparing frame times with sample times; many backends round timestamps to the millisecond
+TIMESTAMP_TOLERANCE = 0.002
+
+# Not every OpenCV build exposes keyframe flags
+_CAP_PROP_KEY_FRAME = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+
+
+class FrameSampler:
+    """The frames to sample at fps samples per second: the first frame at or after each multiple of 1/fps
+
+    A frame is sampled when a sample time falls after the previous frame's
+    timestamp and no later than its own, so the choice rests on those two
+    timestamps alone. It keeps to the requested rate instead of a rounded
+    whole-frame step (10 fps from 29.97 fps video samples 10 frames a
+    second, not 14.99), follows variable-frame-rate timing, and gives the
+    same frames however the video is split into segments. Asking for more
+    than the video's rate samples every frame once; fps <= 0 does too.
+
+    Sequential decoding asks wants() about every frame in order, starting
+    with the one before start. Iterating yields the indices that timestamps
+    of index / video_fps would pick, which seeking uses and len() counts;
+    on constant-frame-rate video both pick the same frames. start and stop
+    bound the frame indices considered.
+    """
+
+    def __init__(self, fps, video_fps, start=0, stop=None):
+        self.fps = fps
+        self.video_fps = video_fps
+        self.start = start
+        self.stop = stop
+        self._previous = None  # Sample slot of the last frame seen by wants()
+
+    @property
+    def step(self):
+        """Mean frames per sample"""
+        if self.fps <= 0 or self.video_fps <= 0:
+            return 1.0
+        return max(1.0, self.video_fps / self.fps)
+
+    @property
+    def interval(self):
+        """Whole frames per sample, for schedules that step by index"""
+        return max(1, int(self.step))
+
+    def key(self):
+        """Identifies the frames sampled, for caches and checkpoints"""
+        return f"timestamps,fps={self.fps:g}"
+
+    def segment(self, start, stop):
+        """A fresh sampler over frames [start, stop) of the same video"""
+        return FrameSampler(self.fps, self.video_fps, start, stop)
+
+    def _slot(self, timestamp):
+        """Number of the last sample time at or before a timestamp"""
+        return math.floor((timestamp + TIMESTAMP_TOLERANCE) * self.fps)
+
+    def wants(self, frame_idx, timestamp):
+        """Whether a frame is sampled, given its presentation timestamp in seconds
+
+        Backends that report no timestamp (0 past the first frame) are
+        taken to run at video_fps.
+        """
+        if self.fps <= 0:
+            return True
+        if timestamp <= 0 < frame_idx and self.video_fps > 0:
+            timestamp = frame_idx / self.video_fps
+        slot = self._slot(timestamp)
+        sampled = self._previous is None or slot > self._previous
+        self._previous = slot
+        return sampled
+
+    def _nominal_slot(self, frame_idx):
+        return self._slot(frame_idx / self.video_fps)
+
+    def __iter__(self):
+        stop = math.inf if self.stop is None else self.stop
+        if self.step == 1.0:
+            frame_idx = self.start
+            while frame_idx < stop:
+                yield frame_idx
+                frame_idx += 1
+            return
+        slot = self._nominal_slot(self.start - 1) + 1
+        while True:
+            # First frame whose timestamp reaches this sample time, corrected for float rounding
+            frame_idx = max(self.start, math.ceil((slot / self.fps - TIMESTAMP_TOLERANCE) * self.video_fps))
+            while self._nominal_slot(frame_idx) < slot:
+                frame_idx += 1
+            while frame_idx > self.start and self._nominal_slot(frame_idx - 1) >= slot:
+                frame_idx -= 1
+            if frame_idx >= stop:
+                return
+            yield frame_idx
+            slot = self._nominal_slot(frame_idx) + 1
+
+    def __len__(self):
+        if self.stop is None:
+            raise TypeError("An unbounded FrameSampler has no length")
+        if self.stop <= self.start:
+            return 0
+        if self.step == 1.0:
+            return self.stop - self.start
+        # Never more than one sample time per frame, so each step up in slot is one sample
+        return self._nominal_slot(self.stop - 1) - self._nominal_slot(self.start - 1)
+
+
+def fourcc_to_str(value):
+    """Decode the integer CAP_PROP_FOURCC value into its four characters"""
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+def probe_keyframe_interval(cap, probe_frames=KEYFRAME_PROBE_FRAMES):
+    """Measure the mean keyframe spacing over the first frames of the stream
+
+    Returns None when the backend does not report keyframe flags. The capture
+    is rewound to its previous position afterwards.
+    """
+    if _CAP_PROP_KEY_FRAME is None:
+        return None
+
+    start_pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    keyframes = 0
+    grabbed = 0
+    try:
+        for _ in range(probe_frames):
+            if not cap.grab():
+                break
+            grabbed += 1
+            if cap.get(_CAP_PROP_KEY_FRAME) > 0:
+                keyframes += 1
+    finally:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_pos)
+
+    if grabbed == 0 or keyframes == 0:
+        return None
+    # A single keyframe means the GOP is at least as long as the probe window
+    return max(1, grabbed // keyframes)
+
+
+def estimate_keyframe_interval(cap):
+    """Estimate the number of frames between keyframes for an open capture"""
+    codec = fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC))
+    if codec in INTRA_ONLY_CODECS:
+        return 1
+
+    probed = probe_keyframe_interval(cap)
+    if probed is not None:
+        return probed
+
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    if video_fps <= 0:
+        video_fps = 30.0
+    return max(1, int(round(video_fps * DEFAULT_KEYFRAME_SECONDS)))
+
+
+def choose_strategy(frame_interval, keyframe_interval):
+    """Pick seek or sequential decoding for a given sampling interval
+
+    A seek lands on the previous keyframe and decodes forward, costing on
+    average half a GOP plus a fixed overhead. Sequential decoding costs one
+    grab per skipped frame. Seeking only wins when samples are further apart
+    than that.
+    """
+    seek_cost = keyframe_interval / 2.0 + SEEK_OVERHEAD_FRAMES
+    if frame_interval > seek_cost:
+        return STRATEGY_SEEK
+    return STRATEGY_SEQUENTIAL
+
+
+def resolve_strategy(cap, frame_interval, strategy=STRATEGY_AUTO):
+    """Turn STRATEGY_AUTO into a concrete strategy for this capture"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+    if strategy != STRATEGY_AUTO:
+        return strategy
+    return choose_strategy(frame_interval, estimate_keyframe_interval(cap))
+
+
+def iter_sampled_frames(cap, frame_indices, strategy=STRATEGY_SEQUENTIAL, out=None):
+    """Yield (frame_idx, frame) for each requested index in ascending order
+
+    The sequential strategy decodes the stream once, calling grab() for the
+    frames in between and retrieve() only for the requested ones. The seek
+    strategy positions the capture before every sample, matching the
+    original behaviour. Frames the backend fails to return are skipped.
+
+    frame_indices may be a FrameSampler: decoded sequentially, each grabbed
+    frame is then picked by its timestamp; seeking goes to its indices.
+
+    out, if given, is called before each decode for an array to decode into
+    (image=, as cv2.VideoCapture.read takes it); it may return None.
+    """
+    def read():
+        return cap.read() if out is None else cap.read(image=out())
+
+    def retrieve():
+        return cap.retrieve() if out is None else cap.retrieve(image=out())
+
+    if strategy == STRATEGY_SEEK:
+        for frame_idx in frame_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = read()
+            if ret:
+                yield frame_idx, frame
+        return
+
+    if strategy != STRATEGY_SEQUENTIAL:
+        raise ValueError(f"Unknown sampling strategy: {strategy}")
+
+    if isinstance(frame_indices, FrameSampler):
+        yield from _iter_timed_frames(cap, frame_indices, retrieve)
+        return
+
+    position = None
+    for frame_idx in frame_indices:
+        if position is None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            position = frame_idx
+
+        # Decode but don't convert the frames we are not sampling
+        while position < frame_idx:
+            if not cap.grab():
+                return
+            position += 1
+
+        ret = cap.grab()
+        position += 1
+        if not ret:
+            return
+        ret, frame = retrieve()
+        if ret:
+            yield frame_idx, frame
+
+
+def _iter_timed_frames(cap, sampler, retrieve):
+    """Sequential decoding picking frames by sampler.wants()"""
+    position = sampler.start
+    if position > 0:
+        # Whether the first frame is sampled depends on the one before it
+        cap.set(cv2.CAP_PROP_POS_FRAMES, position - 1)
+        if not cap.grab():
+            return
+        sampler.wants(position - 1, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    else:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    while sampler.stop is None or position < sampler.stop:
+        if not cap.grab():
+            return
+        if sampler.wants(position, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0):
+            ret, frame = retrieve()
+            if ret:
+                yield position, frame
+        position += 1
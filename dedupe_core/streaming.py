@@ -0,0 +1,159 @@
+"""Deduplication of unbounded streams: cameras, RTSP/HTTP feeds and very long recordings
+
+Nothing here needs the frame count or the end of the stream. Frames are
+sampled by stream time, compared only with a RecentHashWindow of recently
+kept frames, and saved as they arrive, so memory stays constant however
+long the stream runs. Progress reports frames processed without a total.
+"""
+import time
+from pathlib import Path
+
+import cv2
+
+from .buffer_pool import PooledOutput
+from .frame_hash import hash_frame
+from .frame_source import open_source
+from .hash_index import DEFAULT_WINDOW_FRAMES, RecentHashWindow
+from .metrics import STAGE_HASH, STAGE_LOOKUP, STAGE_PREFILTER, RunMetrics, TimedCapture
+from .pipeline import PHASE_DONE, ProcessingOptions, ProcessingStats
+from .prefilter import SCENE_STATIC, SceneFilter
+from .roi import CropPlan
+from .sampling import FrameSampler
+from .writer import FrameWriter, frame_path
+
+# Frames without a usable position from the backend before falling back to the wall clock
+POSITION_PROBE_FRAMES = 2
+
+class _StreamClock:
+    """Stream time in seconds for each grabbed frame
+
+    Files and most network streams report a presentation timestamp; live
+    devices often report 0. When the position hasn't started moving after
+    the first frames, wall-clock time since the start is used instead.
+    """
+
+    def __init__(self, cap):
+        self._cap = cap
+        self._frames = 0
+        self._use_position = None
+        self._start = time.monotonic()
+
+    def now(self):
+        position = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        self._frames += 1
+        if self._use_position is None and (position > 0 or self._frames > POSITION_PROBE_FRAMES):
+            self._use_position = position > 0
+        if self._use_position is False:
+            return time.monotonic() - self._start
+        return position
+
+
+def process_stream(source, output_dir, options=None, window_frames=DEFAULT_WINDOW_FRAMES,
+                   window_seconds=None, should_stop=None, progress=None, max_seconds=None):
+    """Extract the unique frames of a stream into output_dir until it ends or is stopped
+
+    Each sampled frame is compared with the last window_frames kept frames
+    and/or those kept in the last window_seconds of stream time. A frame
+    that repeats something older than the window is kept again. max_seconds
+    ends the run after that much stream time. options.hash_cache,
+    options.global_index, options.best_frame, options.manifest and
+    options.export don't apply to streams, and options.prefilter skips
+    unchanged frames but never changes the sampling rate.
+    Returns a ProcessingStats. Errors are raised to the caller.
+    """
+    options = options or ProcessingOptions()
+    output_dir = Path(output_dir)
+    stats = ProcessingStats(source if isinstance(source, (str, int)) else type(source).__name__,
+                            output_dir, options.region)
+    should_stop = should_stop or (lambda: False)
+    start_time = time.perf_counter()
+
+    metrics = stats.metrics = RunMetrics(options.trace)
+    cap = TimedCapture(open_source(source, options.decoder), metrics)
+    window = RecentHashWindow(options.max_distance, window_frames, window_seconds)
+    plan = CropPlan(options.region)
+    scene_filter = SceneFilter(options.prefilter) if options.prefilter is not None else None
+    pool = options.buffer_pool()
+    output = PooledOutput(pool) if pool is not None else None
+    held = None  # Pooled buffer of the current frame
+    writer = None
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open stream: {source}")
+        if not options.dry_run:
+            output_dir.mkdir(parents=True, exist_ok=True)
+        stats.video_fps = cap.get(cv2.CAP_PROP_FPS)
+        writer = FrameWriter(options.image_format, options.quality, options.writer_threads,
+                             dry_run=options.dry_run, metrics=metrics)
+
+        clock = _StreamClock(cap)
+        # Without a frame rate to fall back on: the clock already stands in for missing timestamps
+        sampler = FrameSampler(options.fps, 0.0)
+        frame_idx = -1
+        while True:
+            if should_stop():
+                stats.stopped = True
+                break
+            if not cap.grab():
+                break  # End of file, or the stream dropped
+            timestamp = clock.now()
+            if max_seconds is not None and timestamp >= max_seconds:
+                break
+            frame_idx += 1
+            stats.total_frames = frame_idx + 1
+            # Skip frames before the next sample time without converting them
+            if not sampler.wants(frame_idx, timestamp):
+                continue
+
+            if held is not None:
+                held.release()  # Free for reuse unless the writer still holds it
+                held = None
+            ok, frame = cap.retrieve() if output is None else cap.retrieve(image=output())
+            if not ok:
+                continue
+            if output is not None:
+                held = output.claim(frame)
+            region_frame = plan.crop(frame)
+            if region_frame is None:
+                continue
+
+            stats.processed_frames += 1
+            static = False
+            if scene_filter is not None:
+                start = time.perf_counter()
+                static = scene_filter.check(region_frame) == SCENE_STATIC
+                metrics.record(STAGE_PREFILTER, start)
+            if static:
+                stats.prefiltered_frames += 1
+            else:
+                start = time.perf_counter()
+                frame_hash = hash_frame(region_frame, options.hash_algorithm, options.hash_plane_size)
+                hashed = time.perf_counter()
+                metrics.record(STAGE_HASH, start, hashed)
+                unique = window.check_and_add(frame_hash, timestamp, frame_idx) is None
+                metrics.record(STAGE_LOOKUP, hashed)
+                if unique:
+                    # Blocks while the writer queue is full
+                    writer.submit(frame_path(output_dir, stats.saved_frames, options.image_format), region_frame,
+                                  pool.retain(region_frame) if pool is not None else None)
+                    stats.saved_frames += 1
+
+            if progress is not None:
+                progress(stats)
+    finally:
+        if held is not None:
+            held.release()
+        if output is not None:
+            output.discard()
+        if writer is not None:
+            # Frames already judged unique are flushed even when stopping early
+            writer.close()
+            stats.bytes_written = writer.bytes_written
+        cap.release()
+        stats.elapsed = time.perf_counter() - start_time
+
+    if not stats.stopped:
+        stats.phase = PHASE_DONE
+    if progress is not None:
+        progress(stats)
+    return stats
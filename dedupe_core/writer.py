@@ -0,0 +1,181 @@
+"""Background image writer so encoding and disk I/O overlap with decoding"""
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+from .metrics import GAUGE_WRITER_QUEUE, STAGE_ENCODE, STAGE_WRITE, STAGE_WRITER_WAIT
+
+FORMAT_JPEG = "jpg"
+FORMAT_PNG = "png"
+FORMAT_WEBP = "webp"
+OUTPUT_FORMATS = (FORMAT_JPEG, FORMAT_PNG, FORMAT_WEBP)
+DEFAULT_OUTPUT_FORMAT = FORMAT_JPEG
+
+# OpenCV's own default JPEG quality
+DEFAULT_QUALITY = 95
+
+# PNG is lossless; this only trades encode time for file size (0-9)
+PNG_COMPRESSION = 3
+
+DEFAULT_WRITER_THREADS = 2
+
+# Frames allowed to wait for an encoder before submit() blocks the decoder
+DEFAULT_QUEUE_SIZE = 16
+
+
+def encode_params(image_format, quality=DEFAULT_QUALITY):
+    """cv2.imencode parameters for an output format"""
+    if image_format == FORMAT_JPEG:
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if image_format == FORMAT_WEBP:
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    if image_format == FORMAT_PNG:
+        return [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+    raise ValueError(f"Unknown output format: {image_format}")
+
+
+def encode_image(path, frame, image_format=DEFAULT_OUTPUT_FORMAT, quality=DEFAULT_QUALITY):
+    """Encode a frame in memory; path is only used in the error message"""
+    ok, buffer = cv2.imencode("." + image_format, frame, encode_params(image_format, quality))
+    if not ok:
+        raise IOError(f"Could not encode frame as {image_format}: {path}")
+    return buffer
+
+
+def write_image(path, frame, image_format=DEFAULT_OUTPUT_FORMAT, quality=DEFAULT_QUALITY):
+    """Encode a frame and write it to path; returns the number of bytes written
+
+    Encoding in memory and writing with Python file I/O also handles
+    non-ASCII paths on Windows, which cv2.imwrite does not.
+    """
+    buffer = encode_image(path, frame, image_format, quality)
+    with open(path, "wb") as handle:
+        handle.write(buffer.tobytes())
+    return len(buffer)
+
+
+class FrameWriter:
+    """Bounded queue of frames drained by a pool of encoder threads
+
+    submit() blocks once queue_size frames are waiting, so a slow disk
+    throttles decoding instead of growing memory. cv2.imencode releases the
+    GIL, so the encoder threads run alongside decoding. close() writes
+    everything still queued and re-raises the first encoder error.
+    With dry_run=True frames are counted but never encoded or written.
+    Frames are not copied, so a frame's buffer must not be reused until its
+    release callback has run. With a RunMetrics, encoding, disk writes, time
+    spent blocked in submit() and the queue depth are recorded.
+    """
+
+    def __init__(self, image_format=DEFAULT_OUTPUT_FORMAT, quality=DEFAULT_QUALITY,
+                 threads=DEFAULT_WRITER_THREADS, queue_size=DEFAULT_QUEUE_SIZE, dry_run=False, metrics=None):
+        if image_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {image_format}")
+        self.image_format = image_format
+        self.quality = quality
+        self.dry_run = dry_run
+        self.metrics = metrics
+        self.frames_written = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._error = None
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = []
+        if not dry_run:
+            for i in range(max(1, threads)):
+                thread = threading.Thread(target=self._run, name=f"FrameWriter-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+
+    @property
+    def pending(self):
+        """Frames queued but not yet picked up by an encoder"""
+        return self._queue.qsize()
+
+    def submit(self, path, frame, release=None):
+        """Queue a frame for writing, blocking while the queue is full
+
+        release, if given, is called once the frame's pixels are no longer
+        needed: after encoding, or straight away when nothing is written.
+        """
+        if self._error is not None:
+            if release is not None:
+                release()
+            raise self._error
+        if self.dry_run:
+            self.frames_written += 1
+            if release is not None:
+                release()
+            return
+        if self.metrics is None:
+            self._queue.put((str(path), frame, release))
+            return
+        self.metrics.observe(GAUGE_WRITER_QUEUE, self._queue.qsize())
+        start = time.perf_counter()
+        self._queue.put((str(path), frame, release))
+        self.metrics.record(STAGE_WRITER_WAIT, start)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            release = None
+            try:
+                if item is None:
+                    return
+                path, frame, release = item
+                if self._error is not None:
+                    continue  # Drain without writing after a failure
+                size = self._write(path, frame)
+                with self._lock:
+                    self.frames_written += 1
+                    self.bytes_written += size
+            except Exception as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                if release is not None:
+                    release()
+                self._queue.task_done()
+
+    def _write(self, path, frame):
+        if self.metrics is None:
+            return write_image(path, frame, self.image_format, self.quality)
+        start = time.perf_counter()
+        buffer = encode_image(path, frame, self.image_format, self.quality)
+        encoded = time.perf_counter()
+        with open(path, "wb") as handle:
+            handle.write(buffer.tobytes())
+        self.metrics.record(STAGE_ENCODE, start, encoded)
+        self.metrics.record(STAGE_WRITE, encoded)
+        return len(buffer)
+
+    def flush(self):
+        """Block until every queued frame has been written; raises the first encoder error"""
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self, raise_errors=True):
+        """Write all queued frames, stop the encoder threads and report errors"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if raise_errors and self._error is not None:
+            raise self._error
+
+
+def frame_path(output_dir, index, image_format=DEFAULT_OUTPUT_FORMAT):
+    """Output path of the index-th saved frame"""
+    return Path(output_dir) / f"frame_{index:06d}.{image_format}"